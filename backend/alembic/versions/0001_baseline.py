@@ -0,0 +1,180 @@
+"""基线：引入 alembic 时的表结构
+
+此前表结构由 Base.metadata.create_all 创建（开发环境启动时或 scripts/sync_data.py --init），
+基线按当时的结构显式建表，已存在的表跳过，已有数据库可直接 alembic upgrade head。
+之后的结构变更全部由后续迁移完成，本文件不随模型变化
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# 建表顺序（外键依赖在前），降级时倒序删除
+TABLES = (
+    'users', 'stocks', 'articles', 'stock_daily_data', 'stock_financials',
+    'stock_sync_state', 'trade_calendar', 'stock_valuation_snapshot', 'user_alerts',
+)
+
+
+def _existing_tables() -> set:
+    if context.is_offline_mode():
+        return set()
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    existing = _existing_tables()
+    
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('email', sa.String(), nullable=False),
+            sa.Column('password_hash', sa.String(), nullable=False),
+            sa.Column('name', sa.String()),
+            sa.Column('avatar_url', sa.String()),
+            sa.Column('phone', sa.String()),
+            sa.Column('role', sa.String()),
+            sa.Column('is_active', sa.Boolean()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    
+    if 'stocks' not in existing:
+        op.create_table(
+            'stocks',
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('code', sa.String(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('market', sa.String(), nullable=False),
+            sa.Column('industry', sa.String()),
+            sa.Column('sector', sa.String()),
+            sa.Column('listed_date', sa.Date()),
+            sa.Column('status', sa.String()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+        op.create_index('ix_stocks_code', 'stocks', ['code'], unique=True)
+    
+    if 'articles' not in existing:
+        op.create_table(
+            'articles',
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('title', sa.String(500), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('summary', sa.Text()),
+            sa.Column('author', sa.String()),
+            sa.Column('source_url', sa.String()),
+            sa.Column('published_at', sa.DateTime()),
+            sa.Column('series', sa.String()),
+            sa.Column('view_count', sa.Integer()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+    
+    if 'stock_daily_data' not in existing:
+        op.create_table(
+            'stock_daily_data',
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('stock_id', sa.String(), sa.ForeignKey('stocks.id'), nullable=False),
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('open', sa.Numeric(12, 4)),
+            sa.Column('high', sa.Numeric(12, 4)),
+            sa.Column('low', sa.Numeric(12, 4)),
+            sa.Column('close', sa.Numeric(12, 4)),
+            sa.Column('volume', sa.Numeric()),
+            sa.Column('amount', sa.Numeric(20, 4)),
+            sa.Column('pe_ttm', sa.Numeric(12, 4)),
+            sa.Column('pb', sa.Numeric(12, 4)),
+            sa.Column('dividend_yield', sa.Numeric(8, 4)),
+            sa.Column('total_mv', sa.Numeric(20, 4)),
+            sa.UniqueConstraint('stock_id', 'date', name='uq_stock_date'),
+        )
+        op.create_index('ix_stock_daily_data_date', 'stock_daily_data', ['date'])
+    
+    if 'stock_financials' not in existing:
+        op.create_table(
+            'stock_financials',
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('stock_id', sa.String(), sa.ForeignKey('stocks.id'), nullable=False),
+            sa.Column('report_date', sa.Date(), nullable=False),
+            sa.Column('report_type', sa.String()),
+            sa.Column('revenue', sa.Numeric(20, 4)),
+            sa.Column('net_profit', sa.Numeric(20, 4)),
+            sa.Column('operating_cash_flow', sa.Numeric(20, 4)),
+            sa.Column('total_assets', sa.Numeric(20, 4)),
+            sa.Column('total_liabilities', sa.Numeric(20, 4)),
+            sa.Column('equity', sa.Numeric(20, 4)),
+            sa.Column('roe', sa.Numeric(8, 4)),
+            sa.UniqueConstraint('stock_id', 'report_date', 'report_type', name='uq_stock_report'),
+        )
+    
+    if 'stock_sync_state' not in existing:
+        op.create_table(
+            'stock_sync_state',
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('stock_id', sa.String(), sa.ForeignKey('stocks.id'), nullable=False),
+            sa.Column('dataset', sa.String(), nullable=False),
+            sa.Column('last_trade_date', sa.Date()),
+            sa.Column('last_report_date', sa.Date()),
+            sa.Column('updated_at', sa.DateTime()),
+            sa.UniqueConstraint('stock_id', 'dataset', name='uq_sync_state_stock_dataset'),
+        )
+    
+    if 'trade_calendar' not in existing:
+        op.create_table(
+            'trade_calendar',
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('exchange', sa.String(), nullable=False),
+            sa.Column('cal_date', sa.Date(), nullable=False),
+            sa.Column('is_open', sa.Boolean(), nullable=False),
+            sa.UniqueConstraint('exchange', 'cal_date', name='uq_trade_calendar_date'),
+        )
+    
+    if 'stock_valuation_snapshot' not in existing:
+        op.create_table(
+            'stock_valuation_snapshot',
+            sa.Column('stock_id', sa.String(), sa.ForeignKey('stocks.id'), primary_key=True),
+            sa.Column('trade_date', sa.Date(), nullable=False),
+            sa.Column('close', sa.Numeric(12, 4)),
+            sa.Column('pe_ttm', sa.Numeric(12, 4)),
+            sa.Column('pb', sa.Numeric(12, 4)),
+            sa.Column('dividend_yield', sa.Numeric(8, 4)),
+            sa.Column('pe_percentile', sa.Numeric(5, 2)),
+            sa.Column('pb_percentile', sa.Numeric(5, 2)),
+            sa.Column('dividend_yield_percentile', sa.Numeric(5, 2)),
+            sa.Column('total_mv', sa.Numeric(20, 4)),
+            sa.Column('roe', sa.Numeric(8, 4)),
+            sa.Column('revenue_growth', sa.Numeric(12, 4)),
+            sa.Column('profit_growth', sa.Numeric(12, 4)),
+            sa.Column('true_money_index', sa.Numeric(12, 4)),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+    
+    if 'user_alerts' not in existing:
+        op.create_table(
+            'user_alerts',
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('user_id', sa.String(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('stock_id', sa.String(), sa.ForeignKey('stocks.id'), nullable=False),
+            sa.Column('alert_type', sa.String(), nullable=False),
+            sa.Column('condition', sa.String(), nullable=False),
+            sa.Column('threshold', sa.Numeric(12, 4), nullable=False),
+            sa.Column('enabled', sa.Boolean()),
+            sa.Column('notify_channel', sa.String()),
+            sa.Column('last_triggered', sa.DateTime()),
+            sa.Column('created_at', sa.DateTime()),
+        )
+
+
+def downgrade() -> None:
+    for name in reversed(TABLES):
+        op.drop_table(name)
@@ -0,0 +1,71 @@
+"""SQL 选股：最新指标视图和索引
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# 最新指标视图（与本迁移时的模型定义一致，不随模型变化）
+STOCK_LATEST_METRICS_SQL = """
+SELECT
+    s.id AS stock_id, s.code, s.name, s.market, s.industry, s.status,
+    d.date AS trade_date,
+    d.close AS current_price, d.pe_ttm, d.pb, d.dividend_yield,
+    d.total_mv / 10000 AS market_cap,
+    f.report_date, f.roe,
+    CASE WHEN p.revenue > 0
+         THEN (f.revenue - p.revenue) * 100 / p.revenue END AS revenue_growth,
+    CASE WHEN p.net_profit <> 0
+         THEN (f.net_profit - p.net_profit) * 100 / abs(p.net_profit) END AS profit_growth,
+    v.pe_percentile, v.pb_percentile, v.dividend_yield_percentile
+FROM stocks s
+JOIN LATERAL (
+    SELECT date, close, pe_ttm, pb, dividend_yield, total_mv
+    FROM stock_daily_data
+    WHERE stock_id = s.id
+    ORDER BY date DESC
+    LIMIT 1
+) d ON true
+LEFT JOIN LATERAL (
+    SELECT report_date, revenue, net_profit, roe
+    FROM stock_financials
+    WHERE stock_id = s.id
+    ORDER BY report_date DESC
+    LIMIT 1
+) f ON true
+LEFT JOIN stock_financials p
+    ON p.stock_id = s.id AND p.report_date = f.report_date - INTERVAL '1 year'
+LEFT JOIN stock_valuation_snapshot v ON v.stock_id = s.id
+"""
+
+
+
+def upgrade() -> None:
+    # 基线之前由 create_all 创建的库缺少市值/财务字段
+    op.execute("ALTER TABLE stock_daily_data ADD COLUMN IF NOT EXISTS total_mv NUMERIC(20, 4)")
+    op.execute(
+        "ALTER TABLE stock_valuation_snapshot "
+        "ADD COLUMN IF NOT EXISTS total_mv NUMERIC(20, 4), "
+        "ADD COLUMN IF NOT EXISTS roe NUMERIC(8, 4), "
+        "ADD COLUMN IF NOT EXISTS revenue_growth NUMERIC(12, 4), "
+        "ADD COLUMN IF NOT EXISTS profit_growth NUMERIC(12, 4)"
+    )
+    
+    op.create_index(
+        'ix_stocks_active_market_industry', 'stocks', ['market', 'industry'],
+        postgresql_where=sa.text("status <> 'delisted'"),
+        if_not_exists=True,
+    )
+    op.execute(f"CREATE OR REPLACE VIEW stock_latest_metrics AS {STOCK_LATEST_METRICS_SQL}")
+
+
+def downgrade() -> None:
+    op.execute("DROP VIEW IF EXISTS stock_latest_metrics")
+    op.drop_index('ix_stocks_active_market_industry', table_name='stocks', if_exists=True)
@@ -0,0 +1,48 @@
+"""股票搜索：pg_trgm 索引和拼音首字母
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # 已有股票的拼音首字母在下次同步股票列表时补齐
+    op.execute("ALTER TABLE stocks ADD COLUMN IF NOT EXISTS pinyin_abbr VARCHAR")
+    
+    op.create_index(
+        'ix_stocks_name_trgm', 'stocks', ['name'],
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+        if_not_exists=True,
+    )
+    op.create_index(
+        'ix_stocks_code_trgm', 'stocks', ['code'],
+        postgresql_using='gin', postgresql_ops={'code': 'gin_trgm_ops'},
+        if_not_exists=True,
+    )
+    op.create_index(
+        'ix_stocks_code_prefix', 'stocks', ['code'],
+        postgresql_ops={'code': 'text_pattern_ops'},
+        if_not_exists=True,
+    )
+    op.create_index(
+        'ix_stocks_pinyin_abbr_prefix', 'stocks', ['pinyin_abbr'],
+        postgresql_ops={'pinyin_abbr': 'text_pattern_ops'},
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    for name in (
+        'ix_stocks_pinyin_abbr_prefix', 'ix_stocks_code_prefix',
+        'ix_stocks_code_trgm', 'ix_stocks_name_trgm',
+    ):
+        op.drop_index(name, table_name='stocks', if_exists=True)
+    op.drop_column('stocks', 'pinyin_abbr')
@@ -0,0 +1,50 @@
+"""日线覆盖索引：(stock_id, date DESC) INCLUDE 估值列
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_stock_daily_stock_date_covering'
+
+
+def _is_partitioned(bind) -> bool:
+    relkind = bind.execute(sa.text(
+        "SELECT relkind::text FROM pg_class WHERE oid = to_regclass('stock_daily_data')"
+    )).scalar()
+    return relkind == 'p'
+
+
+def upgrade() -> None:
+    # 由 create_all 按当前模型建成的库已是分区表（不支持 CONCURRENTLY），
+    # 其覆盖主键（见 0007）已服务同一访问路径
+    if _is_partitioned(op.get_bind()):
+        return
+    
+    # 大表在线建索引，不阻塞同步写入（CONCURRENTLY 不能在事务内执行）
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX_NAME, 'stock_daily_data', ['stock_id', sa.text('date DESC')],
+            postgresql_include=['close', 'pe_ttm', 'pb', 'dividend_yield', 'total_mv'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    if _is_partitioned(op.get_bind()):
+        op.drop_index(INDEX_NAME, table_name='stock_daily_data', if_exists=True)
+        return
+    
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            INDEX_NAME, table_name='stock_daily_data',
+            postgresql_concurrently=True, if_exists=True,
+        )
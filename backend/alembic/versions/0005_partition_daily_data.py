@@ -0,0 +1,176 @@
+"""日线表按年范围分区
+
+原表改名后按模型新建分区表（主键改为 (id, date)），按数据覆盖的年份建分区并复制数据，
+最后重建依赖日线表的 stock_latest_metrics 视图。数据量大时需在维护窗口执行
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+# 以下 DDL 为本迁移时的表结构，不随模型变化
+COLUMNS = (
+    'id, stock_id, date, open, high, low, close, volume, amount, '
+    'pe_ttm, pb, dividend_yield, total_mv'
+)
+
+CREATE_PARTITIONED_TABLE = """
+CREATE TABLE stock_daily_data (
+    id VARCHAR NOT NULL,
+    stock_id VARCHAR NOT NULL REFERENCES stocks (id),
+    date DATE NOT NULL,
+    open NUMERIC(12, 4),
+    high NUMERIC(12, 4),
+    low NUMERIC(12, 4),
+    close NUMERIC(12, 4),
+    volume NUMERIC,
+    amount NUMERIC(20, 4),
+    pe_ttm NUMERIC(12, 4),
+    pb NUMERIC(12, 4),
+    dividend_yield NUMERIC(8, 4),
+    total_mv NUMERIC(20, 4),
+    CONSTRAINT stock_daily_data_pkey PRIMARY KEY (id, date),
+    CONSTRAINT uq_stock_date UNIQUE (stock_id, date)
+) PARTITION BY RANGE (date)
+"""
+
+CREATE_INDEXES = (
+    "CREATE INDEX ix_stock_daily_data_date ON stock_daily_data (date)",
+    "CREATE INDEX ix_stock_daily_stock_date_covering ON stock_daily_data (stock_id, date DESC) "
+    "INCLUDE (close, pe_ttm, pb, dividend_yield, total_mv)",
+)
+
+# 降级时恢复的普通表（0004 时的结构）
+CREATE_HEAP_TABLE = """
+CREATE TABLE stock_daily_data (
+    id VARCHAR NOT NULL,
+    stock_id VARCHAR NOT NULL REFERENCES stocks (id),
+    date DATE NOT NULL,
+    open NUMERIC(12, 4),
+    high NUMERIC(12, 4),
+    low NUMERIC(12, 4),
+    close NUMERIC(12, 4),
+    volume NUMERIC,
+    amount NUMERIC(20, 4),
+    pe_ttm NUMERIC(12, 4),
+    pb NUMERIC(12, 4),
+    dividend_yield NUMERIC(8, 4),
+    total_mv NUMERIC(20, 4),
+    CONSTRAINT stock_daily_data_pkey PRIMARY KEY (id),
+    CONSTRAINT uq_stock_date UNIQUE (stock_id, date)
+)
+"""
+
+CREATE_DEFAULT_PARTITION = "CREATE TABLE stock_daily_data_default PARTITION OF stock_daily_data DEFAULT"
+
+STOCK_LATEST_METRICS_SQL = """
+SELECT
+    s.id AS stock_id, s.code, s.name, s.market, s.industry, s.status,
+    d.date AS trade_date,
+    d.close AS current_price, d.pe_ttm, d.pb, d.dividend_yield,
+    d.total_mv / 10000 AS market_cap,
+    f.report_date, f.roe,
+    CASE WHEN p.revenue > 0
+         THEN (f.revenue - p.revenue) * 100 / p.revenue END AS revenue_growth,
+    CASE WHEN p.net_profit <> 0
+         THEN (f.net_profit - p.net_profit) * 100 / abs(p.net_profit) END AS profit_growth,
+    v.pe_percentile, v.pb_percentile, v.dividend_yield_percentile
+FROM stocks s
+JOIN LATERAL (
+    SELECT date, close, pe_ttm, pb, dividend_yield, total_mv
+    FROM stock_daily_data
+    WHERE stock_id = s.id
+    ORDER BY date DESC
+    LIMIT 1
+) d ON true
+LEFT JOIN LATERAL (
+    SELECT report_date, revenue, net_profit, roe
+    FROM stock_financials
+    WHERE stock_id = s.id
+    ORDER BY report_date DESC
+    LIMIT 1
+) f ON true
+LEFT JOIN stock_financials p
+    ON p.stock_id = s.id AND p.report_date = f.report_date - INTERVAL '1 year'
+LEFT JOIN stock_valuation_snapshot v ON v.stock_id = s.id
+"""
+
+
+# 原表上的索引/约束，改名以释放名称给新表（升级和降级共用）
+LEGACY_INDEXES = (
+    'stock_daily_data_pkey', 'uq_stock_date',
+    'ix_stock_daily_data_date', 'ix_stock_daily_stock_date_covering',
+)
+
+
+def _create_partition_sql(year: int) -> str:
+    return (
+        f"CREATE TABLE stock_daily_data_y{year} PARTITION OF stock_daily_data "
+        f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+    )
+
+
+def _relkind(bind) -> str:
+    return bind.execute(sa.text(
+        "SELECT relkind::text FROM pg_class WHERE oid = to_regclass('stock_daily_data')"
+    )).scalar()
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # 由 create_all 按当前模型建成的库已是分区表
+    if _relkind(bind) == 'p':
+        return
+    
+    op.execute("DROP VIEW IF EXISTS stock_latest_metrics")
+    op.execute("ALTER TABLE stock_daily_data RENAME TO stock_daily_data_heap")
+    for name in LEGACY_INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_heap")
+    
+    op.execute(CREATE_PARTITIONED_TABLE)
+    for ddl in CREATE_INDEXES:
+        op.execute(ddl)
+    op.execute(CREATE_DEFAULT_PARTITION)
+    
+    years = bind.execute(sa.text(
+        "SELECT DISTINCT extract(year FROM date)::int FROM stock_daily_data_heap"
+    )).scalars().all()
+    this_year = date.today().year
+    for year in sorted(set(years) | {this_year, this_year + 1}):
+        op.execute(_create_partition_sql(year))
+    
+    op.execute(
+        f"INSERT INTO stock_daily_data ({COLUMNS}) SELECT {COLUMNS} FROM stock_daily_data_heap"
+    )
+    op.execute("DROP TABLE stock_daily_data_heap")
+    op.execute(f"CREATE OR REPLACE VIEW stock_latest_metrics AS {STOCK_LATEST_METRICS_SQL}")
+    op.execute("ANALYZE stock_daily_data")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if _relkind(bind) != 'p':
+        return
+    
+    op.execute("DROP VIEW IF EXISTS stock_latest_metrics")
+    op.execute("ALTER TABLE stock_daily_data RENAME TO stock_daily_data_partitioned")
+    for name in LEGACY_INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_partitioned")
+    
+    op.execute(CREATE_HEAP_TABLE)
+    for ddl in CREATE_INDEXES:
+        op.execute(ddl)
+    op.execute(
+        f"INSERT INTO stock_daily_data ({COLUMNS}) SELECT {COLUMNS} FROM stock_daily_data_partitioned"
+    )
+    op.execute("DROP TABLE stock_daily_data_partitioned CASCADE")
+    op.execute(f"CREATE OR REPLACE VIEW stock_latest_metrics AS {STOCK_LATEST_METRICS_SQL}")
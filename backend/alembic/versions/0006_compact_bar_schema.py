@@ -0,0 +1,107 @@
+"""紧凑日线表结构：(stock_id, date) 主键、float8 数值列
+
+去掉 UUID 主键列和与之重复的 uq_stock_date，数值列由 Numeric 改为 float8。
+数值列改类型会重写整张表，需在维护窗口执行。存储和读取延迟对比见 docs/BAR-SCHEMA-BENCHMARK.md
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# 数值列及原 Numeric 类型（降级时恢复）
+LEGACY_TYPES = {
+    'open': 'NUMERIC(12, 4)',
+    'high': 'NUMERIC(12, 4)',
+    'low': 'NUMERIC(12, 4)',
+    'close': 'NUMERIC(12, 4)',
+    'volume': 'NUMERIC',
+    'amount': 'NUMERIC(20, 4)',
+    'pe_ttm': 'NUMERIC(12, 4)',
+    'pb': 'NUMERIC(12, 4)',
+    'dividend_yield': 'NUMERIC(8, 4)',
+    'total_mv': 'NUMERIC(20, 4)',
+}
+
+# 最新指标视图（依赖日线表，转换前后重建）
+STOCK_LATEST_METRICS_SQL = """
+SELECT
+    s.id AS stock_id, s.code, s.name, s.market, s.industry, s.status,
+    d.date AS trade_date,
+    d.close AS current_price, d.pe_ttm, d.pb, d.dividend_yield,
+    d.total_mv / 10000 AS market_cap,
+    f.report_date, f.roe,
+    CASE WHEN p.revenue > 0
+         THEN (f.revenue - p.revenue) * 100 / p.revenue END AS revenue_growth,
+    CASE WHEN p.net_profit <> 0
+         THEN (f.net_profit - p.net_profit) * 100 / abs(p.net_profit) END AS profit_growth,
+    v.pe_percentile, v.pb_percentile, v.dividend_yield_percentile
+FROM stocks s
+JOIN LATERAL (
+    SELECT date, close, pe_ttm, pb, dividend_yield, total_mv
+    FROM stock_daily_data
+    WHERE stock_id = s.id
+    ORDER BY date DESC
+    LIMIT 1
+) d ON true
+LEFT JOIN LATERAL (
+    SELECT report_date, revenue, net_profit, roe
+    FROM stock_financials
+    WHERE stock_id = s.id
+    ORDER BY report_date DESC
+    LIMIT 1
+) f ON true
+LEFT JOIN stock_financials p
+    ON p.stock_id = s.id AND p.report_date = f.report_date - INTERVAL '1 year'
+LEFT JOIN stock_valuation_snapshot v ON v.stock_id = s.id
+"""
+
+
+def _is_compact(bind) -> bool:
+    """日线表已没有 UUID 主键列（由 create_all 按当前模型建成的库）"""
+    return not bind.execute(sa.text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'stock_daily_data' AND column_name = 'id'"
+    )).scalar()
+
+
+def _alter_types(types: dict) -> None:
+    op.execute(
+        "ALTER TABLE stock_daily_data "
+        + ", ".join(f"ALTER COLUMN {name} TYPE {type_}" for name, type_ in types.items())
+    )
+
+
+def upgrade() -> None:
+    if _is_compact(op.get_bind()):
+        return
+    
+    op.execute("DROP VIEW IF EXISTS stock_latest_metrics")
+    op.execute("ALTER TABLE stock_daily_data DROP CONSTRAINT stock_daily_data_pkey")
+    op.execute("ALTER TABLE stock_daily_data DROP CONSTRAINT uq_stock_date")
+    op.execute("ALTER TABLE stock_daily_data DROP COLUMN id")
+    _alter_types({name: 'DOUBLE PRECISION' for name in LEGACY_TYPES})
+    op.execute("ALTER TABLE stock_daily_data ADD PRIMARY KEY (stock_id, date)")
+    op.execute(f"CREATE OR REPLACE VIEW stock_latest_metrics AS {STOCK_LATEST_METRICS_SQL}")
+    op.execute("ANALYZE stock_daily_data")
+
+
+def downgrade() -> None:
+    if not _is_compact(op.get_bind()):
+        return
+    
+    op.execute("DROP VIEW IF EXISTS stock_latest_metrics")
+    op.execute("ALTER TABLE stock_daily_data DROP CONSTRAINT stock_daily_data_pkey")
+    _alter_types(LEGACY_TYPES)
+    op.execute("ALTER TABLE stock_daily_data ADD COLUMN id VARCHAR")
+    op.execute("UPDATE stock_daily_data SET id = gen_random_uuid()::text")
+    op.execute("ALTER TABLE stock_daily_data ALTER COLUMN id SET NOT NULL")
+    op.execute("ALTER TABLE stock_daily_data ADD PRIMARY KEY (id, date)")
+    op.execute("ALTER TABLE stock_daily_data ADD CONSTRAINT uq_stock_date UNIQUE (stock_id, date)")
+    op.execute(f"CREATE OR REPLACE VIEW stock_latest_metrics AS {STOCK_LATEST_METRICS_SQL}")
@@ -0,0 +1,40 @@
+"""日线主键改为覆盖主键：PRIMARY KEY (stock_id, date) INCLUDE 估值列
+
+0006 之后主键与 ix_stock_daily_stock_date_covering 的键列相同，同一键上维护两棵 B 树。
+把估值列 INCLUDE 进主键并删除覆盖索引，热点查询改为倒序扫描主键（仍为仅索引扫描）。
+重建主键会锁表并重写索引，需在维护窗口执行
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+INCLUDE_COLUMNS = 'close, pe_ttm, pb, dividend_yield, total_mv'
+
+
+def upgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_stock_daily_stock_date_covering")
+    op.execute("ALTER TABLE stock_daily_data DROP CONSTRAINT stock_daily_data_pkey")
+    op.execute(
+        "ALTER TABLE stock_daily_data ADD CONSTRAINT stock_daily_data_pkey "
+        f"PRIMARY KEY (stock_id, date) INCLUDE ({INCLUDE_COLUMNS})"
+    )
+    op.execute("ANALYZE stock_daily_data")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE stock_daily_data DROP CONSTRAINT stock_daily_data_pkey")
+    op.execute(
+        "ALTER TABLE stock_daily_data ADD CONSTRAINT stock_daily_data_pkey "
+        "PRIMARY KEY (stock_id, date)"
+    )
+    op.execute(
+        "CREATE INDEX ix_stock_daily_stock_date_covering ON stock_daily_data (stock_id, date DESC) "
+        f"INCLUDE ({INCLUDE_COLUMNS})"
+    )
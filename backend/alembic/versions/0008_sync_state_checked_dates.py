@@ -0,0 +1,32 @@
+"""同步水位增加日线确认日期和财务公告日期
+
+last_checked_date：日线已向 Tushare 确认到的日期，停牌无数据的交易日不再反复当作缺口回补；
+last_ann_date：财务最后同步的公告日期，fina_indicator 的 start_date 按公告日期过滤
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 由 create_all 或 0001 基线按当前模型建成的库已有这两列
+    op.execute(
+        "ALTER TABLE stock_sync_state "
+        "ADD COLUMN IF NOT EXISTS last_checked_date DATE, "
+        "ADD COLUMN IF NOT EXISTS last_ann_date DATE"
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        "ALTER TABLE stock_sync_state "
+        "DROP COLUMN IF EXISTS last_ann_date, "
+        "DROP COLUMN IF EXISTS last_checked_date"
+    )
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
 from app.core.database import get_db
 from app.schemas.screener import ScreenerRequest, ScreenerResponse
-from app.services.screener_service import ScreenerService
+from app.services.screener_service import (
+    ScreenerService, SCREENER_PRESETS, PRESETS_BY_ID, PRESET_RESULT_LIMIT,
+)
 
 router = APIRouter()
 
@@ -16,10 +18,12 @@ async def screen_stocks(
 ):
     """选股器 - 多条件筛选股票"""
     screener_service = ScreenerService(db)
-    results = await screener_service.screen(request)
+    results, total = await screener_service.screen(request)
     return ScreenerResponse(
         data=results,
-        total=len(results),
+        total=total,
+        page=request.page,
+        page_size=request.page_size,
         conditions=request.dict(),
     )
 
@@ -27,33 +31,27 @@ async def screen_stocks(
 @router.get("/presets")
 async def get_screener_presets():
     """获取预设选股模板"""
-    presets = [
-        {
-            "id": "high_dividend",
-            "name": "高股息策略",
-            "description": "股息率 > 5%, PE < 20, 连续 3 年分红",
-            "conditions": {
-                "dividend_yield_min": 5,
-                "pe_max": 20,
-            }
-        },
-        {
-            "id": "low_valuation",
-            "name": "低估值策略",
-            "description": "PE 百分位 < 20%, PB 百分位 < 20%",
-            "conditions": {
-                "pe_percentile_max": 20,
-                "pb_percentile_max": 20,
-            }
-        },
-        {
-            "id": "quality_growth",
-            "name": "优质成长策略",
-            "description": "ROE > 15%, 营收增长率 > 20%",
-            "conditions": {
-                "roe_min": 15,
-                "revenue_growth_min": 20,
-            }
-        },
-    ]
-    return {"presets": presets}
+    return {"presets": SCREENER_PRESETS}
+
+
+@router.get("/presets/{preset_id}", response_model=ScreenerResponse)
+async def screen_by_preset(
+    preset_id: str,
+    page: int = Query(1, ge=1, description="页码"),
+    page_size: int = Query(50, ge=1, le=PRESET_RESULT_LIMIT, description="每页数量"),
+    db: AsyncSession = Depends(get_db),
+):
+    """按预设模板选股（结果按数据版本缓存）"""
+    screener_service = ScreenerService(db)
+    result = await screener_service.screen_preset(preset_id, page=page, page_size=page_size)
+    if result is None:
+        raise HTTPException(status_code=404, detail="预设模板不存在")
+    
+    results, total = result
+    return ScreenerResponse(
+        data=results,
+        total=total,
+        page=page,
+        page_size=page_size,
+        conditions=PRESETS_BY_ID[preset_id]["conditions"],
+    )
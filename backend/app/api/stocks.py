@@ -1,35 +1,77 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
+from app.core.cache import response_cache, stock_namespace
+from app.core.config import settings
 from app.core.database import get_db
-from app.schemas.stock import StockResponse, StockListResponse
+from app.schemas.stock import StockResponse, StockListResponse, StockIndicatorsBatchRequest
+from app.services.bar_resampler import downsample_lttb, resample_ohlc
 from app.services.stock_service import StockService
+from app.services.stock_suggest import stock_suggest_index
+from app.utils.columnar import (
+    ARROW_MEDIA_TYPE, arrow_available, columns_to_arrow_ipc, columns_to_rows,
+)
 
 router = APIRouter()
 
 
 @router.get("", response_model=StockListResponse)
 async def get_stocks(
-    q: Optional[str] = Query(None, description="搜索关键词（代码/名称）"),
+    q: Optional[str] = Query(None, description="搜索关键词（代码/名称/拼音首字母）"),
     market: Optional[str] = Query(None, description="市场：A 股/港股/美股"),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor），传入时忽略 page"),
     db: AsyncSession = Depends(get_db),
 ):
-    """获取股票列表"""
+    """获取股票列表 / 搜索股票"""
     stock_service = StockService(db)
-    stocks, total = await stock_service.list_stocks(
-        search=q, market=market, page=page, page_size=page_size
+    try:
+        stocks, total, next_cursor = await stock_service.list_stocks(
+            search=q, market=market, page=page, page_size=page_size, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StockListResponse(
+        data=stocks, total=total, page=page, page_size=page_size, next_cursor=next_cursor
     )
-    return StockListResponse(data=stocks, total=total, page=page, page_size=page_size)
+
+
+@router.get("/suggest")
+async def suggest_stocks(
+    q: str = Query(..., min_length=1, max_length=20, description="代码/名称/拼音首字母前缀"),
+    limit: int = Query(10, ge=1, le=50, description="最多返回条数"),
+    db: AsyncSession = Depends(get_db),
+):
+    """搜索联想（进程内前缀索引，不查询数据库）"""
+    await stock_suggest_index.ensure_fresh(db)
+    return {"data": stock_suggest_index.search(q, limit)}
+
+
+@router.post("/indicators/batch")
+async def get_stock_indicators_batch(
+    request: StockIndicatorsBatchRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """批量获取核心指标（自选股列表），返回 代码 -> 指标，不存在的代码不包含在内"""
+    indicators = await StockService(db).get_indicators_batch(request.codes)
+    return {"data": indicators}
 
 
 @router.get("/{code}", response_model=StockResponse)
 async def get_stock(code: str, db: AsyncSession = Depends(get_db)):
     """获取股票详情"""
-    stock_service = StockService(db)
-    stock = await stock_service.get_stock_by_code(code)
+    async def _load():
+        stock = await StockService(db).get_stock_by_code(code)
+        return StockResponse.model_validate(stock) if stock else None
+    
+    stock = await response_cache.get_or_set(
+        response_cache.build_key(stock_namespace(code), "stock"),
+        _load,
+        ttl=settings.CACHE_ROUTE_TTLS["stock"],
+    )
     if not stock:
         raise HTTPException(status_code=404, detail="股票不存在")
     return stock
@@ -40,19 +82,70 @@ async def get_stock_daily_data(
     code: str,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    format: str = Query(
+        "rows", pattern="^(rows|columnar|arrow)$",
+        description="响应格式：rows 逐行对象（日期倒序）；columnar 按字段并列数组；arrow Arrow IPC stream（均为日期升序）",
+    ),
+    freq: Optional[str] = Query(None, pattern="^(W|M)$", description="聚合周期：W 周线 / M 月线"),
+    points: Optional[int] = Query(None, ge=10, le=5000, description="LTTB 降采样目标点数（按收盘价形状）"),
     db: AsyncSession = Depends(get_db),
 ):
-    """获取股票日线数据"""
-    stock_service = StockService(db)
-    data = await stock_service.get_daily_data(code, start_date, end_date)
-    return {"data": data}
+    """获取股票日线数据（可在服务端聚合为周/月线或降采样到固定点数）"""
+    params = {"start_date": start_date, "end_date": end_date}
+    resampled = freq is not None or points is not None
+    
+    if format == "rows" and not resampled:
+        async def _load():
+            data = await StockService(db).get_daily_data(code, start_date, end_date)
+            return {"data": data}
+        
+        payload = await response_cache.get_or_set(
+            response_cache.build_key(stock_namespace(code), "daily", params),
+            _load,
+            ttl=settings.CACHE_ROUTE_TTLS["daily"],
+        )
+        # 缓存值已是 JSON 兼容数据，直接输出，跳过 FastAPI 的逐字段编码
+        return JSONResponse(payload)
+    
+    if format == "arrow" and not arrow_available():
+        raise HTTPException(status_code=501, detail="服务器未安装 pyarrow，不支持 Arrow 格式")
+    
+    async def _load_columns():
+        columns = await StockService(db).get_daily_columns(code, start_date, end_date)
+        if columns is None:
+            return None
+        if freq:
+            columns = resample_ohlc(columns, freq)
+        if points:
+            columns = downsample_lttb(columns, points)
+        return {"data": columns}
+    
+    # 各格式共用同一份列式缓存，按 (股票, 周期, 点数, 区间) 区分
+    payload = await response_cache.get_or_set(
+        response_cache.build_key(
+            stock_namespace(code), "daily_columns", {**params, "freq": freq, "points": points},
+        ),
+        _load_columns,
+        ttl=settings.CACHE_ROUTE_TTLS["daily"],
+    )
+    if payload is None:
+        raise HTTPException(status_code=404, detail="股票不存在")
+    
+    if format == "arrow":
+        return Response(columns_to_arrow_ipc(payload["data"]), media_type=ARROW_MEDIA_TYPE)
+    if format == "rows":
+        return JSONResponse({"data": columns_to_rows(payload["data"])})
+    return JSONResponse(payload)
 
 
 @router.get("/{code}/indicators")
 async def get_stock_indicators(code: str, db: AsyncSession = Depends(get_db)):
     """获取股票核心指标（PE/PB/股息率等）"""
-    stock_service = StockService(db)
-    indicators = await stock_service.get_indicators(code)
+    indicators = await response_cache.get_or_set(
+        response_cache.build_key(stock_namespace(code), "indicators"),
+        lambda: StockService(db).get_indicators(code),
+        ttl=settings.CACHE_ROUTE_TTLS["indicators"],
+    )
     if not indicators:
         raise HTTPException(status_code=404, detail="股票不存在")
     return indicators
@@ -61,6 +154,12 @@ async def get_stock_indicators(code: str, db: AsyncSession = Depends(get_db)):
 @router.get("/{code}/financials")
 async def get_stock_financials(code: str, db: AsyncSession = Depends(get_db)):
     """获取股票财务数据"""
-    stock_service = StockService(db)
-    financials = await stock_service.get_financials(code)
-    return {"data": financials}
+    async def _load():
+        financials = await StockService(db).get_financials(code)
+        return {"data": financials}
+    
+    return await response_cache.get_or_set(
+        response_cache.build_key(stock_namespace(code), "financials"),
+        _load,
+        ttl=settings.CACHE_ROUTE_TTLS["financials"],
+    )
@@ -1,6 +1,8 @@
 # Celery 配置
 
+import asyncio
 from celery import Celery
+from celery.signals import worker_process_shutdown
 from app.core.config import settings
 
 
@@ -12,6 +14,7 @@ celery_app = Celery(
     include=[
         'app.tasks.stock_tasks',
         'app.tasks.data_sync_tasks',
+        'app.tasks.alert_tasks',
     ]
 )
 
@@ -30,15 +33,27 @@ celery_app.conf.update(
 
 # 定时任务配置
 celery_app.conf.beat_schedule = {
-    # 每天收盘后同步日线数据（A 股 15:30）
+    # 每天收盘后按交易日同步全市场日线数据（A 股 15:30）
     'sync-daily-data': {
-        'task': 'app.tasks.data_sync_tasks.sync_all_daily_data',
+        'task': 'tasks.data_sync_tasks.sync_market_daily_data',
         'schedule': 0,  # 手动触发
     },
     
     # 每周一同步股票列表
     'sync-stock-list': {
-        'task': 'app.tasks.data_sync_tasks.sync_stock_list_weekly',
+        'task': 'tasks.data_sync_tasks.sync_stock_list_weekly',
+        'schedule': 0,  # 手动触发
+    },
+    
+    # 每月刷新交易日历（本年和下一年）
+    'refresh-trade-calendar': {
+        'task': 'tasks.data_sync_tasks.refresh_trade_calendar',
+        'schedule': 0,  # 手动触发
+    },
+    
+    # 每月预建当年和下一年的日线分区
+    'ensure-daily-partitions': {
+        'task': 'tasks.data_sync_tasks.ensure_daily_partitions',
         'schedule': 0,  # 手动触发
     },
     
@@ -48,3 +63,17 @@ celery_app.conf.beat_schedule = {
         'schedule': 0,  # 手动触发
     },
 }
+
+
+@worker_process_shutdown.connect
+def close_http_clients(**kwargs):
+    """Worker 进程退出时关闭 Tushare 连接池和 Redis 缓存连接"""
+    from app.core.cache import response_cache
+    from app.services.data_sources.tushare_service import tushare_service
+    
+    try:
+        tushare_service.close_all()
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(response_cache.close())
+    except Exception:
+        pass
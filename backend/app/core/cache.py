@@ -0,0 +1,239 @@
+# Redis 响应缓存
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from urllib.parse import urlencode
+
+from fastapi.encoders import jsonable_encoder
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "cache"
+
+# Redis 连接失败后暂停使用的时间（秒），避免每个请求都等待连接超时
+UNAVAILABLE_BACKOFF = 30
+
+
+class ResponseCache:
+    """
+    接口响应缓存
+    
+    值以 JSON 存入 Redis，按路由设置 TTL；同一 key 的并发未命中只回源一次（single-flight）：
+    进程内共享同一个 Future，跨进程通过 SET NX 锁协调，拿不到锁的请求短暂轮询缓存。
+    Redis 不可用时直接回源，不影响接口可用性
+    """
+    
+    def __init__(self):
+        self._client: Optional[aioredis.Redis] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._unavailable_until = 0.0
+        # Redis 不可用期间跳过的清除，恢复后下一次 purge 时补做
+        self._pending_purges: Set[str] = set()
+    
+    def _get_client(self) -> Optional[aioredis.Redis]:
+        """获取 Redis 客户端（事件循环变化时重建）"""
+        if not settings.CACHE_ENABLED or time.monotonic() < self._unavailable_until:
+            return None
+        
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = aioredis.from_url(
+                settings.REDIS_URL,
+                password=settings.REDIS_PASSWORD or None,
+                socket_timeout=settings.CACHE_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.CACHE_SOCKET_TIMEOUT,
+            )
+            self._loop = loop
+            self._inflight = {}
+        return self._client
+    
+    def _mark_unavailable(self, error: Exception) -> None:
+        logger.warning(f"Redis 不可用，{UNAVAILABLE_BACKOFF} 秒内跳过缓存：{error}")
+        self._unavailable_until = time.monotonic() + UNAVAILABLE_BACKOFF
+    
+    @staticmethod
+    def build_key(namespace: str, route: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        构建缓存 key
+        
+        Args:
+            namespace: 数据归属，如 stock:600519（同步时按此前缀清除）
+            route: 路由名
+            params: 查询参数（忽略空值，按名称排序）
+        """
+        query = urlencode(sorted((k, v) for k, v in (params or {}).items() if v is not None))
+        return f"{KEY_PREFIX}:{namespace}:{route}" + (f"?{query}" if query else "")
+    
+    async def get(self, key: str) -> Optional[Any]:
+        client = self._get_client()
+        if client is None:
+            return None
+        
+        try:
+            raw = await client.get(key)
+        except (RedisError, OSError) as e:
+            self._mark_unavailable(e)
+            return None
+        return json.loads(raw) if raw is not None else None
+    
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        client = self._get_client()
+        if client is None:
+            return
+        
+        try:
+            await client.set(key, json.dumps(value, ensure_ascii=False), ex=ttl)
+        except (RedisError, OSError) as e:
+            self._mark_unavailable(e)
+    
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int
+    ) -> Any:
+        """
+        读取缓存，未命中时调用 loader 回源并写入
+        
+        loader 返回 None 时不缓存（如股票不存在）
+        
+        Args:
+            key: 缓存 key
+            loader: 回源函数
+            ttl: 过期时间（秒）
+        
+        Returns:
+            JSON 兼容的数据
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+        
+        # 进程内 single-flight：等待正在进行的回源
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load_once(key, loader, ttl)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+    
+    async def _load_once(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> Any:
+        """
+        跨进程 single-flight：持锁者回源，其他进程轮询缓存直到写入或锁释放
+        
+        持锁者回源结果为 None（不缓存）或失败时会删除锁，等待者看到锁不存在即停止轮询、自行回源，
+        不必等满 CACHE_LOCK_TIMEOUT_MS
+        """
+        client = self._get_client()
+        lock_key = f"{key}:lock"
+        locked = False
+        
+        if client is not None:
+            try:
+                locked = await client.set(lock_key, 1, nx=True, px=settings.CACHE_LOCK_TIMEOUT_MS)
+                waiting = not locked
+            except (RedisError, OSError) as e:
+                self._mark_unavailable(e)
+                waiting = False
+            
+            if waiting:
+                deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT_MS / 1000
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(0.05)
+                    cached = await self.get(key)
+                    if cached is not None:
+                        return cached
+                    try:
+                        if not await client.exists(lock_key):
+                            break
+                    except (RedisError, OSError) as e:
+                        self._mark_unavailable(e)
+                        break
+        
+        try:
+            value = jsonable_encoder(await loader())
+            if value is not None:
+                await self.set(key, value, ttl)
+            return value
+        finally:
+            if locked:
+                try:
+                    await client.delete(lock_key)
+                except (RedisError, OSError):
+                    pass
+    
+    async def purge(self, namespace: str) -> int:
+        """
+        清除某个数据归属下的全部缓存（如同步重写了某只股票的数据）
+        
+        Redis 不可用时记录警告并暂存该归属，本进程下一次 purge 时一并补做；
+        在此之前已写入的缓存会保留到 TTL 过期
+        
+        Returns:
+            删除的 key 数量
+        """
+        if not settings.CACHE_ENABLED:
+            return 0
+        
+        namespaces = self._pending_purges | {namespace}
+        client = self._get_client()
+        if client is None:
+            logger.warning(f"Redis 不可用，跳过清除缓存 {sorted(namespaces)}，TTL 到期前可能返回旧数据")
+            self._pending_purges = namespaces
+            return 0
+        
+        deleted = 0
+        try:
+            for name in sorted(namespaces):
+                keys = []
+                async for key in client.scan_iter(match=f"{KEY_PREFIX}:{name}:*", count=500):
+                    keys.append(key)
+                    if len(keys) >= 500:
+                        deleted += await client.unlink(*keys)
+                        keys = []
+                if keys:
+                    deleted += await client.unlink(*keys)
+                namespaces.discard(name)
+        except (RedisError, OSError) as e:
+            self._mark_unavailable(e)
+            logger.warning(f"清除缓存 {sorted(namespaces)} 失败，恢复后补做")
+        self._pending_purges = namespaces
+        return deleted
+    
+    async def close(self) -> None:
+        """关闭 Redis 连接"""
+        if self._client is not None:
+            try:
+                await self._client.aclose()
+            except Exception:
+                pass
+            self._client = None
+            self._loop = None
+
+
+def stock_namespace(code: str) -> str:
+    """单只股票的缓存归属"""
+    return f"stock:{code}"
+
+
+# 全局实例
+response_cache = ResponseCache()
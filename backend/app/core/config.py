@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Dict
 import os
 
 
@@ -27,6 +27,21 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379/0"
     REDIS_PASSWORD: str = ""
     
+    # 接口响应缓存（Redis）
+    CACHE_ENABLED: bool = True
+    CACHE_SOCKET_TIMEOUT: float = 0.5  # Redis 读写超时（秒），超时即回源
+    CACHE_LOCK_TIMEOUT_MS: int = 5000  # 回源锁超时，其他进程最多等待这么久
+    CACHE_ROUTE_TTLS: Dict[str, int] = {
+        "stock": 86400,
+        "daily": 3600,
+        "indicators": 3600,
+        "financials": 86400,
+        "search_count": 300,
+    }
+    
+    # 响应压缩：小于该字节数的响应不压缩
+    COMPRESSION_MINIMUM_SIZE: int = 1000
+    
     # Celery
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/1"
@@ -40,8 +55,37 @@ class Settings(BaseSettings):
     
     # 数据源 API
     TUSHARE_TOKEN: str = ""  # Tushare API Token
+    TUSHARE_TIMEOUT: float = 30.0
+    TUSHARE_MAX_CONNECTIONS: int = 10  # 连接池大小
+    TUSHARE_RATE_LIMIT_PER_MINUTE: int = 200  # 每个接口每分钟请求数（按账户积分调整）
+    TUSHARE_API_RATE_LIMITS: Dict[str, int] = {}  # 按接口覆盖，如 {"daily_basic": 100}
+    TUSHARE_MAX_RETRIES: int = 3
+    TUSHARE_RETRY_BACKOFF: float = 1.0  # 重试退避基数（秒）
+    SYNC_CONCURRENCY: int = 8  # 逐只股票同步的并发数（需小于数据库连接池大小）
+    SYNC_GAP_LOOKBACK_DAYS: int = 30  # 增量同步时检查水位前多少天内的缺失交易日
+    TRADE_CALENDAR_FALLBACK_TTL: int = 300  # 交易日历不可用时工作日兜底的缓存时间（秒），到期后重试加载
     AKSHARE_ENABLED: bool = True
     
+    # 日线 Parquet 存储（分析型批量读取）
+    BAR_STORE_ENABLED: bool = True  # 同步任务写库后导出当年 Parquet（需要 pyarrow）
+    BAR_STORE_DIR: str = "data/bars"
+    BAR_STORE_SERVE_READS: bool = False  # 日线列式接口优先读取 Parquet（单只股票同步后到下次导出前可能滞后）
+    
+    # 全市场日线面板（日期 × 股票 float32 矩阵，np.memmap 共享读取）
+    PRICE_PANEL_ENABLED: bool = True  # 同步任务写库后增量更新
+    PRICE_PANEL_DIR: str = "data/panel"
+    PRICE_PANEL_YEARS: int = 10  # 全量重建时覆盖的年数
+    
+    # 股票代码注册表（进程内 LRU）
+    STOCK_REGISTRY_SIZE: int = 10000
+    STOCK_REGISTRY_TTL: int = 600  # 秒
+    STOCK_REGISTRY_VERSION_CHECK: int = 30  # 注册表检查股票列表版本的间隔（秒），其他进程的变更据此失效
+    SUGGEST_INDEX_TTL: int = 300  # 搜索联想索引检查股票列表版本的间隔（秒）
+    
+    # 选股器
+    SCREENER_MODE: str = "memory"  # memory: 进程内列式快照；sql: 下推到数据库（多节点无需各自加载快照）
+    SCREENER_SNAPSHOT_TTL: int = 60  # 内存快照检查数据版本的间隔（秒）
+    
     # AI 配置
     OPENAI_API_KEY: str = ""
     OPENAI_BASE_URL: str = "https://api.openai.com/v1"
@@ -1,11 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
 import sentry_sdk
 
 from app.core.config import settings
 from app.api import stocks, articles, auth, alerts, ai, screener
-from app.core.database import engine, Base
+from app.core.database import engine, Base, async_session_maker
+from app.core.cache import response_cache
+from app.services.data_sources.tushare_service import tushare_service
+from app.services.stock_registry import stock_registry
+from app.services.stock_suggest import stock_suggest_index
 
 
 @asynccontextmanager
@@ -24,10 +29,20 @@ async def lifespan(app: FastAPI):
             print(f"⚠️  Database not available: {e}")
             print("📝 API will work but database operations will fail")
     
+    # 预热股票代码注册表和搜索联想索引
+    try:
+        async with async_session_maker() as db:
+            await stock_registry.warm(db)
+            await stock_suggest_index.refresh(db)
+    except Exception as e:
+        print(f"⚠️  Stock registry warm-up skipped: {e}")
+    
     yield
     
     # 关闭时执行
     print(f"👋 Shutting down {settings.PROJECT_NAME}")
+    await tushare_service.close()
+    await response_cache.close()
 
 
 # Sentry 初始化（生产环境）
@@ -58,6 +73,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩（日线等大响应）：安装了 brotli-asgi 时优先 Brotli，客户端不支持时回退 gzip
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
 # 注册路由
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["认证"])
 app.include_router(stocks.router, prefix=f"{settings.API_V1_STR}/stocks", tags=["股票"])
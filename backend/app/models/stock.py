@@ -1,7 +1,10 @@
 import uuid
 from datetime import datetime, date
-from sqlalchemy import Column, String, DateTime, Date, Numeric, ForeignKey, UniqueConstraint, Boolean
-from sqlalchemy.sql import func
+from sqlalchemy import (
+    Column, String, DateTime, Date, Numeric, Float, ForeignKey, UniqueConstraint, Boolean,
+    Index, DDL, event, text,
+)
+from sqlalchemy.sql import func, table, column
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -18,37 +21,66 @@ class Stock(Base):
     sector = Column(String)
     listed_date = Column(Date)
     status = Column(String, default="active")
+    pinyin_abbr = Column(String)  # 名称拼音首字母，如 GZMT
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     daily_data = relationship("StockDailyData", back_populates="stock")
     financials = relationship("StockFinancial", back_populates="stock")
     
+    __table_args__ = (
+        # SQL 选股：只扫描未退市股票，按市场/行业过滤
+        Index(
+            'ix_stocks_active_market_industry', 'market', 'industry',
+            postgresql_where=text("status <> 'delisted'"),
+        ),
+        # 股票搜索：名称/代码子串匹配走 trigram，代码/拼音前缀匹配走 text_pattern_ops
+        Index(
+            'ix_stocks_name_trgm', 'name',
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+        ),
+        Index(
+            'ix_stocks_code_trgm', 'code',
+            postgresql_using='gin', postgresql_ops={'code': 'gin_trgm_ops'},
+        ),
+        Index('ix_stocks_code_prefix', 'code', postgresql_ops={'code': 'text_pattern_ops'}),
+        Index(
+            'ix_stocks_pinyin_abbr_prefix', 'pinyin_abbr',
+            postgresql_ops={'pinyin_abbr': 'text_pattern_ops'},
+        ),
+    )
+    
     def __repr__(self):
         return f"<Stock {self.code} - {self.name}>"
 
 
 class StockDailyData(Base):
-    """股票日线数据模型"""
+    """
+    股票日线数据模型
+    
+    (stock_id, date) 自然主键（迁移 0006），没有 UUID 主键列；数值列为 float8，读取时无需 Decimal 转换。
+    主键 INCLUDE 估值列（迁移 0007），热点查询仅索引扫描主键
+    """
     __tablename__ = "stock_daily_data"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    stock_id = Column(String, ForeignKey("stocks.id"), nullable=False)
-    date = Column(Date, nullable=False, index=True)
-    open = Column(Numeric(12, 4))
-    high = Column(Numeric(12, 4))
-    low = Column(Numeric(12, 4))
-    close = Column(Numeric(12, 4))
-    volume = Column(Numeric)
-    amount = Column(Numeric(20, 4))
-    pe_ttm = Column(Numeric(12, 4))
-    pb = Column(Numeric(12, 4))
-    dividend_yield = Column(Numeric(8, 4))
+    stock_id = Column(String, ForeignKey("stocks.id"), primary_key=True)
+    date = Column(Date, primary_key=True, nullable=False, index=True)  # 分区键，须包含在主键中
+    open = Column(Float(precision=53))
+    high = Column(Float(precision=53))
+    low = Column(Float(precision=53))
+    close = Column(Float(precision=53))
+    volume = Column(Float(precision=53))
+    amount = Column(Float(precision=53))
+    pe_ttm = Column(Float(precision=53))
+    pb = Column(Float(precision=53))
+    dividend_yield = Column(Float(precision=53))
+    total_mv = Column(Float(precision=53))  # 总市值（万元）
     
     stock = relationship("Stock", back_populates="daily_data")
     
     __table_args__ = (
-        UniqueConstraint('stock_id', 'date', name='uq_stock_date'),
+        # 按年范围分区（stock_daily_data_y2024 ...），分区由 partition_manager 随同步自动创建
+        {'postgresql_partition_by': 'RANGE (date)'},
     )
     
     def __repr__(self):
@@ -79,3 +111,159 @@ class StockFinancial(Base):
     
     def __repr__(self):
         return f"<StockFinancial {self.stock_id} {self.report_date}>"
+
+
+class StockSyncState(Base):
+    """股票数据同步水位（按数据集记录，增量同步只拉取缺失区间）"""
+    __tablename__ = "stock_sync_state"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    stock_id = Column(String, ForeignKey("stocks.id"), nullable=False)
+    dataset = Column(String, nullable=False)  # daily/financials
+    last_trade_date = Column(Date)  # 日线：最后同步的交易日
+    last_checked_date = Column(Date)  # 日线：已向 Tushare 确认到的日期（停牌无数据的交易日不再视为缺口）
+    last_report_date = Column(Date)  # 财务：最后同步的报告期（end_date）
+    last_ann_date = Column(Date)  # 财务：最后同步的公告日期（fina_indicator 按公告日期增量拉取）
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint('stock_id', 'dataset', name='uq_sync_state_stock_dataset'),
+    )
+    
+    def __repr__(self):
+        return f"<StockSyncState {self.stock_id} {self.dataset}>"
+
+
+class TradeCalendar(Base):
+    """交易日历（Tushare trade_cal 本地缓存）"""
+    __tablename__ = "trade_calendar"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    exchange = Column(String, nullable=False, default="SSE")  # SSE/SZSE
+    cal_date = Column(Date, nullable=False)
+    is_open = Column(Boolean, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint('exchange', 'cal_date', name='uq_trade_calendar_date'),
+    )
+    
+    def __repr__(self):
+        return f"<TradeCalendar {self.exchange} {self.cal_date} {self.is_open}>"
+
+
+class StockValuationSnapshot(Base):
+    """股票估值快照（每日同步后预计算，每只股票一行）"""
+    __tablename__ = "stock_valuation_snapshot"
+    
+    stock_id = Column(String, ForeignKey("stocks.id"), primary_key=True)
+    trade_date = Column(Date, nullable=False)  # 最新日线日期
+    close = Column(Numeric(12, 4))
+    pe_ttm = Column(Numeric(12, 4))
+    pb = Column(Numeric(12, 4))
+    dividend_yield = Column(Numeric(8, 4))
+    pe_percentile = Column(Numeric(5, 2))  # 近 10 年 PE 百分位
+    pb_percentile = Column(Numeric(5, 2))
+    dividend_yield_percentile = Column(Numeric(5, 2))
+    total_mv = Column(Numeric(20, 4))  # 总市值（万元）
+    roe = Column(Numeric(8, 4))  # 最新报告期 ROE
+    revenue_growth = Column(Numeric(12, 4))  # 营收同比增长率 (%)
+    profit_growth = Column(Numeric(12, 4))  # 净利润同比增长率 (%)
+    true_money_index = Column(Numeric(12, 4))  # 最新报告期真钱指数
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<StockValuationSnapshot {self.stock_id} {self.trade_date}>"
+
+
+# 最新指标视图：每只股票最新一条日线 + 最新一期财务（及上年同期，计算同比增长），
+# 百分位依赖 10 年历史，取自 stock_valuation_snapshot。
+# 两个 LATERAL 子查询分别走日线主键 / uq_stock_report 索引倒序取 1 行
+STOCK_LATEST_METRICS_SQL = """
+SELECT
+    s.id AS stock_id, s.code, s.name, s.market, s.industry, s.status,
+    d.date AS trade_date,
+    d.close AS current_price, d.pe_ttm, d.pb, d.dividend_yield,
+    d.total_mv / 10000 AS market_cap,
+    f.report_date, f.roe,
+    CASE WHEN p.revenue > 0
+         THEN (f.revenue - p.revenue) * 100 / p.revenue END AS revenue_growth,
+    CASE WHEN p.net_profit <> 0
+         THEN (f.net_profit - p.net_profit) * 100 / abs(p.net_profit) END AS profit_growth,
+    v.pe_percentile, v.pb_percentile, v.dividend_yield_percentile
+FROM stocks s
+JOIN LATERAL (
+    SELECT date, close, pe_ttm, pb, dividend_yield, total_mv
+    FROM stock_daily_data
+    WHERE stock_id = s.id
+    ORDER BY date DESC
+    LIMIT 1
+) d ON true
+LEFT JOIN LATERAL (
+    SELECT report_date, revenue, net_profit, roe
+    FROM stock_financials
+    WHERE stock_id = s.id
+    ORDER BY report_date DESC
+    LIMIT 1
+) f ON true
+LEFT JOIN stock_financials p
+    ON p.stock_id = s.id AND p.report_date = f.report_date - INTERVAL '1 year'
+LEFT JOIN stock_valuation_snapshot v ON v.stock_id = s.id
+"""
+
+stock_latest_metrics = table(
+    'stock_latest_metrics',
+    column('stock_id', String),
+    column('code', String),
+    column('name', String),
+    column('market', String),
+    column('industry', String),
+    column('status', String),
+    column('trade_date', Date),
+    column('current_price', Numeric),
+    column('pe_ttm', Numeric),
+    column('pb', Numeric),
+    column('dividend_yield', Numeric),
+    column('market_cap', Numeric),
+    column('report_date', Date),
+    column('roe', Numeric),
+    column('revenue_growth', Numeric),
+    column('profit_growth', Numeric),
+    column('pe_percentile', Numeric),
+    column('pb_percentile', Numeric),
+    column('dividend_yield_percentile', Numeric),
+)
+
+# 分区表建表后创建默认分区，接收尚未建分区年份的数据
+event.listen(
+    StockDailyData.__table__, 'after_create',
+    DDL("CREATE TABLE IF NOT EXISTS stock_daily_data_default PARTITION OF stock_daily_data DEFAULT")
+    .execute_if(dialect='postgresql'),
+)
+
+# 覆盖主键（迁移 0007）：最新一条 / 窗口历史倒序扫描主键，INCLUDE 估值列以便仅索引扫描，
+# 不再单独建 (stock_id, date) 覆盖索引。SQLAlchemy 主键约束不支持 INCLUDE，建表后重建主键
+event.listen(
+    StockDailyData.__table__, 'after_create',
+    DDL(
+        "ALTER TABLE stock_daily_data DROP CONSTRAINT stock_daily_data_pkey, "
+        "ADD CONSTRAINT stock_daily_data_pkey PRIMARY KEY (stock_id, date) "
+        "INCLUDE (close, pe_ttm, pb, dividend_yield, total_mv)"
+    ).execute_if(dialect='postgresql'),
+)
+
+# trigram 索引依赖 pg_trgm 扩展，create_all 建表前启用
+event.listen(
+    Base.metadata, 'before_create',
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect='postgresql'),
+)
+
+# create_all 建表后创建视图（开发环境），生产环境由 alembic 迁移创建
+event.listen(
+    Base.metadata, 'after_create',
+    DDL(f"CREATE OR REPLACE VIEW stock_latest_metrics AS {STOCK_LATEST_METRICS_SQL}")
+    .execute_if(dialect='postgresql'),
+)
+event.listen(
+    Base.metadata, 'before_drop',
+    DDL("DROP VIEW IF EXISTS stock_latest_metrics").execute_if(dialect='postgresql'),
+)
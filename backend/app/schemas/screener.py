@@ -30,6 +30,17 @@ class ScreenerRequest(BaseModel):
     
     # 行业
     industries: Optional[List[str]] = Field(None, description="行业列表")
+    
+    # 排序和分页
+    sort_by: Optional[str] = Field(
+        None,
+        pattern="^(code|current_price|pe_ttm|pb|dividend_yield|pe_percentile|pb_percentile"
+                "|roe|revenue_growth|profit_growth|market_cap)$",
+        description="排序字段"
+    )
+    sort_order: str = Field("desc", pattern="^(asc|desc)$", description="排序方向：asc/desc")
+    page: int = Field(1, ge=1, description="页码")
+    page_size: int = Field(50, ge=1, le=500, description="每页数量")
 
 
 class ScreenerResult(BaseModel):
@@ -42,11 +53,18 @@ class ScreenerResult(BaseModel):
     pe_ttm: Optional[Decimal] = None
     pb: Optional[Decimal] = None
     dividend_yield: Optional[Decimal] = None
+    pe_percentile: Optional[Decimal] = None
+    pb_percentile: Optional[Decimal] = None
     roe: Optional[Decimal] = None
+    revenue_growth: Optional[Decimal] = None
+    profit_growth: Optional[Decimal] = None
+    market_cap: Optional[Decimal] = None  # 总市值（亿）
 
 
 class ScreenerResponse(BaseModel):
     """选股器响应"""
     data: List[ScreenerResult]
     total: int
+    page: int = 1
+    page_size: int = 50
     conditions: dict
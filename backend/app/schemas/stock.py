@@ -28,9 +28,10 @@ class StockResponse(StockBase):
 class StockListResponse(BaseModel):
     """股票列表响应"""
     data: list[StockResponse]
-    total: int
+    total: int  # 缓存的总数，股票列表同步后刷新
     page: int
     page_size: int
+    next_cursor: Optional[str] = None  # 键集分页游标，无下一页时为空
 
 
 class StockDailyData(BaseModel):
@@ -56,4 +57,10 @@ class StockIndicators(BaseModel):
     pb: Optional[Decimal] = None
     pe_percentile: Optional[Decimal] = None
     pb_percentile: Optional[Decimal] = None
+    dividend_yield_percentile: Optional[Decimal] = None
     true_money_index: Optional[Decimal] = None  # 真钱指数
+
+
+class StockIndicatorsBatchRequest(BaseModel):
+    """批量指标请求"""
+    codes: list[str] = Field(..., min_length=1, max_length=200, description="股票代码列表")
@@ -24,3 +24,8 @@ class AlertService:
         """删除预警"""
         # TODO: 实现
         return False
+    
+    async def check_all_alerts(self):
+        """检查全部启用的预警，返回触发数量"""
+        # TODO: 实现
+        return 0
@@ -0,0 +1,131 @@
+# 日线重采样（图表降采样）
+
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.utils.columnar import DAILY_COLUMNS
+
+# 收盘价及估值指标取周期内最后一个有效值
+LAST_VALUE_FIELDS = ('close', 'pe_ttm', 'pb', 'dividend_yield')
+
+
+def _to_array(values: List[Optional[float]]) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _period_key(day: str, freq: str) -> str:
+    if freq == 'M':
+        return day[:7]
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-{week:02d}"
+
+
+def resample_ohlc(columns: Dict[str, list], freq: str) -> Dict[str, list]:
+    """
+    将日线聚合为周线/月线
+    
+    开盘取周期内第一个有效值，最高/最低取极值，收盘及估值指标取最后一个有效值，
+    日期为周期内最后一个交易日
+    
+    Args:
+        columns: 按日期升序的列式日线（StockService.get_daily_columns）
+        freq: W 周线 / M 月线
+    
+    Returns:
+        同结构的列式数据
+    """
+    if freq not in ('W', 'M'):
+        raise ValueError(f"不支持的周期: {freq}")
+    
+    dates = columns['date']
+    if not dates:
+        return {name: [] for name in DAILY_COLUMNS}
+    
+    keys = [_period_key(d, freq) for d in dates]
+    starts = [0] + [i for i in range(1, len(keys)) if keys[i] != keys[i - 1]]
+    ends = starts[1:] + [len(keys)]
+    
+    result = {'date': [dates[end - 1] for end in ends]}
+    arrays = {name: _to_array(columns[name]) for name in DAILY_COLUMNS[1:]}
+    
+    def _reduce(name: str, pick) -> List[Optional[float]]:
+        values = []
+        for start, end in zip(starts, ends):
+            segment = arrays[name][start:end]
+            valid = segment[~np.isnan(segment)]
+            values.append(float(pick(valid)) if len(valid) else None)
+        return values
+    
+    result['open'] = _reduce('open', lambda v: v[0])
+    result['high'] = _reduce('high', np.max)
+    result['low'] = _reduce('low', np.min)
+    for name in LAST_VALUE_FIELDS:
+        result[name] = _reduce(name, lambda v: v[-1])
+    return result
+
+
+def lttb_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的下标
+    
+    以下标为横轴（交易日等距），首尾点固定保留，中间每个桶选取与前一选中点、
+    下一桶均值构成三角形面积最大的点。缺失值按前后值线性插值后参与计算
+    
+    Args:
+        y: 纵轴数值
+        threshold: 目标点数
+    
+    Returns:
+        升序下标数组
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    
+    # 缺失值线性插值，避免 NaN 参与面积比较
+    y = y.copy()
+    mask = np.isnan(y)
+    if mask.all():
+        return np.linspace(0, n - 1, threshold).astype(np.int64)
+    if mask.any():
+        valid = np.flatnonzero(~mask)
+        y[mask] = np.interp(np.flatnonzero(mask), valid, y[valid])
+    
+    x = np.arange(n, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 下一桶的均值点（最后一个桶使用终点）
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_lttb(columns: Dict[str, list], points: int, field: str = 'close') -> Dict[str, list]:
+    """
+    按 LTTB 将列式日线降到目标点数（以 field 为形状依据，其余字段取相同的日期）
+    
+    Args:
+        columns: 按日期升序的列式日线
+        points: 目标点数
+        field: 决定保留哪些点的字段
+    
+    Returns:
+        同结构的列式数据
+    """
+    indices = lttb_indices(_to_array(columns[field]), points)
+    return {name: [columns[name][i] for i in indices] for name in DAILY_COLUMNS}
@@ -0,0 +1,295 @@
+# 日线 Parquet 存储（分析型读取）
+
+import logging
+import os
+import uuid
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import select, cast, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.stock import Stock, StockDailyData
+from app.utils.columnar import DAILY_COLUMNS, arrow_available
+
+logger = logging.getLogger(__name__)
+
+# 数值列（Parquet 中为 float64，空值为 null）
+VALUE_COLUMNS = (
+    'open', 'high', 'low', 'close', 'volume', 'amount',
+    'pe_ttm', 'pb', 'dividend_yield', 'total_mv',
+)
+STORE_COLUMNS = ('code', 'stock_id', 'date') + VALUE_COLUMNS
+
+# 市场 -> 目录名
+MARKET_DIRS = {
+    'A 股': 'cn',
+    '港股': 'hk',
+    '美股': 'us',
+}
+
+# 按代码排序后每个行组约 200 只股票一年的数据，按代码过滤时只解码命中的行组
+ROW_GROUP_SIZE = 50000
+
+
+def market_dir(market: str) -> str:
+    return MARKET_DIRS.get(market) or ''.join(ch for ch in market if ch.isalnum()) or 'other'
+
+
+def _arrow_schema():
+    import pyarrow as pa
+    
+    return pa.schema(
+        [('code', pa.string()), ('stock_id', pa.string()), ('date', pa.date32())]
+        + [(name, pa.float64()) for name in VALUE_COLUMNS]
+    )
+
+
+class PartitionWriter:
+    """
+    单个年份文件的写入器
+    
+    写入同目录下唯一命名的临时文件，commit 时原子替换目标文件；
+    并发导出同一文件时各写各的临时文件，后提交者生效，不会互相覆盖写到一半的文件
+    """
+    
+    def __init__(self, path: Path):
+        import pyarrow.parquet as pq
+        
+        self.path = path
+        self.rows = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = path.with_name(f".{path.stem}.{uuid.uuid4().hex}.parquet.tmp")
+        self._schema = _arrow_schema()
+        self._writer = pq.ParquetWriter(self._tmp, self._schema, compression='zstd')
+    
+    def write(self, columns: Dict[str, Sequence]) -> None:
+        """追加一批行（STORE_COLUMNS，需接在上一批之后保持 (code, date) 有序）"""
+        import pyarrow as pa
+        
+        table = pa.table(
+            [pa.array(columns[field.name], type=field.type) for field in self._schema],
+            schema=self._schema,
+        )
+        self._writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+        self.rows += table.num_rows
+    
+    def commit(self) -> int:
+        """关闭文件并替换目标文件，返回写入行数"""
+        self._writer.close()
+        os.replace(self._tmp, self.path)
+        return self.rows
+    
+    def abort(self) -> None:
+        """放弃写入，删除临时文件"""
+        try:
+            self._writer.close()
+        finally:
+            self._tmp.unlink(missing_ok=True)
+
+
+class BarStore:
+    """
+    日线 Parquet 存储：{BAR_STORE_DIR}/{市场}/{年份}.parquet
+    
+    每个文件按 (code, date) 排序，由同步任务在写库后整年重写（先写临时文件再原子替换）；
+    读取时通过 pyarrow 内存映射按列加载，并用行组统计信息下推代码/日期过滤，
+    百分位回补、全市场筛选等批量任务可替代逐行 ORM 查询
+    """
+    
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.BAR_STORE_DIR)
+    
+    def path(self, market: str, year: int) -> Path:
+        return self.root / market_dir(market) / f"{year}.parquet"
+    
+    def files(
+        self,
+        markets: Optional[Sequence[str]] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> List[Path]:
+        """列出覆盖指定市场和日期区间的文件"""
+        dirs = (
+            [self.root / market_dir(m) for m in markets] if markets
+            else [d for d in self.root.iterdir() if d.is_dir()] if self.root.exists()
+            else []
+        )
+        paths = []
+        for directory in dirs:
+            for path in sorted(directory.glob('*.parquet')):
+                year = int(path.stem)
+                if (start is None or year >= start.year) and (end is None or year <= end.year):
+                    paths.append(path)
+        return paths
+    
+    def covers(self, market: str, start: date, end: date) -> bool:
+        """
+        [start, end] 涉及的年份是否都已导出该市场的文件
+        
+        只导出了部分年份时（如日常同步只导出当年），读取整段历史会缺少早年数据，调用方应回退数据库
+        """
+        return all(self.path(market, year).exists() for year in range(start.year, end.year + 1))
+    
+    def open_writer(self, market: str, year: int) -> PartitionWriter:
+        """打开一个市场一年的文件写入器（分批写入，commit 时整文件替换）"""
+        return PartitionWriter(self.path(market, year))
+    
+    def write_partition(self, market: str, year: int, columns: Dict[str, list]) -> int:
+        """
+        写入一个市场一年的日线（整文件替换）
+        
+        Args:
+            market: 市场
+            year: 年份
+            columns: 列名 -> 值数组（STORE_COLUMNS），需已按 (code, date) 排序
+        
+        Returns:
+            写入行数
+        """
+        writer = self.open_writer(market, year)
+        try:
+            writer.write(columns)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+    
+    async def export_year(self, db: AsyncSession, year: int) -> int:
+        """
+        从数据库导出某一年全部市场的日线（按市场分文件）
+        
+        每个市场一次查询，服务端游标按 ROW_GROUP_SIZE 分批读取，每批写成一个行组，
+        内存中最多只有一批数据
+        
+        Returns:
+            导出行数
+        """
+        result = await db.execute(select(Stock.market).distinct())
+        markets = sorted(result.scalars().all())
+        
+        total = 0
+        for market in markets:
+            query = (
+                select(
+                    Stock.code, StockDailyData.stock_id, StockDailyData.date,
+                    *(cast(getattr(StockDailyData, name), Float).label(name) for name in VALUE_COLUMNS),
+                )
+                .join(Stock, Stock.id == StockDailyData.stock_id)
+                .where(
+                    Stock.market == market,
+                    StockDailyData.date >= date(year, 1, 1),
+                    StockDailyData.date < date(year + 1, 1, 1),
+                )
+                .order_by(Stock.code, StockDailyData.date)
+                .execution_options(yield_per=ROW_GROUP_SIZE)
+            )
+            writer = self.open_writer(market, year)
+            try:
+                result = await db.stream(query)
+                async for rows in result.partitions():
+                    writer.write(dict(zip(STORE_COLUMNS, zip(*rows))))
+            except BaseException:
+                writer.abort()
+                raise
+            
+            # 没有数据的市场不生成空文件
+            if writer.rows:
+                total += writer.commit()
+            else:
+                writer.abort()
+        
+        logger.info(f"导出 {year} 年日线 Parquet 完成，共 {total} 条")
+        return total
+    
+    def read(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        markets: Optional[Sequence[str]] = None,
+        codes: Optional[Sequence[str]] = None,
+    ):
+        """
+        内存映射读取日线
+        
+        Args:
+            columns: 需要的列（默认全部）
+            start: 开始日期（含）
+            end: 结束日期（含）
+            markets: 市场过滤
+            codes: 股票代码过滤
+        
+        Returns:
+            pyarrow.Table（无数据时为空表）
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        filters = []
+        if start is not None:
+            filters.append(('date', '>=', start))
+        if end is not None:
+            filters.append(('date', '<=', end))
+        if codes is not None:
+            filters.append(('code', 'in', list(codes)))
+        
+        tables = [
+            pq.read_table(
+                path, columns=list(columns) if columns else None,
+                filters=filters or None, memory_map=True,
+            )
+            for path in self.files(markets, start, end)
+        ]
+        if not tables:
+            return pa.table({name: [] for name in (columns or STORE_COLUMNS)})
+        return pa.concat_tables(tables)
+    
+    def read_stock(
+        self,
+        code: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> Optional[Dict[str, list]]:
+        """
+        读取单只股票的列式日线，格式同 StockService.get_daily_columns
+        
+        Returns:
+            列名 -> 值数组，存储中没有该股票时返回 None
+        """
+        table = self.read(DAILY_COLUMNS, start=start, end=end, codes=[code])
+        if table.num_rows == 0:
+            return None
+        
+        table = table.sort_by('date')
+        columns = {name: table.column(name).to_pylist() for name in DAILY_COLUMNS}
+        columns['date'] = [d.isoformat() for d in columns['date']]
+        return columns
+
+
+async def export_bar_store(db: AsyncSession, years: Sequence[int]) -> int:
+    """
+    同步任务写库后导出涉及年份的 Parquet（未开启或未安装 pyarrow 时跳过，失败不影响同步）
+    
+    Returns:
+        导出行数
+    """
+    if not settings.BAR_STORE_ENABLED:
+        return 0
+    if not arrow_available():
+        logger.warning("未安装 pyarrow，跳过日线 Parquet 导出")
+        return 0
+    
+    total = 0
+    for year in sorted(set(years)):
+        try:
+            total += await bar_store.export_year(db, year)
+        except Exception as e:
+            logger.error(f"导出 {year} 年日线 Parquet 失败：{e}")
+    return total
+
+
+# 全局实例
+bar_store = BarStore()
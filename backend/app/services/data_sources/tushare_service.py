@@ -1,39 +1,149 @@
 # Tushare 数据服务
 # https://tushare.pro/document/2
 
+import asyncio
+import logging
+import random
 import httpx
-from typing import List, Dict, Optional
+from typing import List, Dict
 from datetime import datetime, timedelta
 from app.core.config import settings
+from app.utils.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class TushareAPIError(Exception):
+    """Tushare 接口错误"""
+    pass
+
+
+class TushareRetryableError(TushareAPIError):
+    """可重试的 Tushare 错误（超出频率限制、5xx、网络异常）"""
+    pass
 
 
 class TushareService:
     """Tushare 数据服务"""
     
+    # 日线字段（显式指定，避免按位置解析时错位）
+    DAILY_FIELDS = 'ts_code,trade_date,open,high,low,close,vol,amount'
+    
+    # 超出频率限制时 Tushare 返回的错误信息关键字
+    QUOTA_ERROR_KEYWORDS = ('最多访问', '频率', '每分钟', '每小时')
+    
     def __init__(self):
         self.api_url = "http://api.tushare.pro"
         self.token = settings.TUSHARE_TOKEN
+        # 连接池和限流器绑定创建它们的事件循环，按循环分别保存（Celery 线程池等场景下多个循环并存）
+        self._clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+        self._limiters: Dict[asyncio.AbstractEventLoop, Dict[str, TokenBucket]] = {}
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环的长连接客户端（连接池 + keep-alive）"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            self._discard_closed_loops()
+            client = httpx.AsyncClient(
+                timeout=settings.TUSHARE_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=settings.TUSHARE_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.TUSHARE_MAX_CONNECTIONS,
+                    keepalive_expiry=60.0,
+                ),
+            )
+            self._clients[loop] = client
+        return client
+    
+    def _discard_closed_loops(self) -> None:
+        """丢弃已关闭事件循环的条目（其连接池已无法在原循环内关闭）"""
+        for loop in [loop for loop in self._clients if loop.is_closed()]:
+            if not self._clients.pop(loop).is_closed:
+                logger.warning("事件循环结束前未关闭 Tushare 连接池，应在循环内调用 close()")
+        for loop in [loop for loop in self._limiters if loop.is_closed()]:
+            del self._limiters[loop]
+    
+    def _get_limiter(self, api_name: str) -> TokenBucket:
+        """获取当前事件循环中接口对应的令牌桶（Tushare 按接口计算每分钟访问次数）"""
+        limiters = self._limiters.setdefault(asyncio.get_running_loop(), {})
+        limiter = limiters.get(api_name)
+        if limiter is None:
+            rate = settings.TUSHARE_API_RATE_LIMITS.get(
+                api_name, settings.TUSHARE_RATE_LIMIT_PER_MINUTE
+            )
+            limiter = TokenBucket(rate_per_minute=rate)
+            limiters[api_name] = limiter
+        return limiter
+    
+    def _is_quota_error(self, msg: str) -> bool:
+        return any(keyword in msg for keyword in self.QUOTA_ERROR_KEYWORDS)
     
     async def _request(self, api_name: str, params: dict = None) -> dict:
-        """发送请求到 Tushare API"""
+        """
+        发送请求到 Tushare API
+        
+        请求前按接口限流；超出频率限制、5xx 和网络异常时按指数退避（带随机抖动）重试
+        """
         payload = {
             "api_name": api_name,
             "token": self.token,
             "params": params or {}
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                self.api_url,
-                json=payload,
-                timeout=30.0
-            )
-            result = response.json()
-            
-            if result.get('code') != 0:
-                raise Exception(f"Tushare API Error: {result.get('msg')}")
-            
-            return result
+        max_retries = settings.TUSHARE_MAX_RETRIES
+        for attempt in range(max_retries + 1):
+            await self._get_limiter(api_name).acquire()
+            try:
+                try:
+                    response = await self._get_client().post(self.api_url, json=payload)
+                except httpx.TransportError as e:
+                    raise TushareRetryableError(f"网络异常：{e}") from e
+                
+                if response.status_code >= 500:
+                    raise TushareRetryableError(f"HTTP {response.status_code}")
+                result = response.json()
+                
+                if result.get('code') != 0:
+                    msg = result.get('msg') or ''
+                    if self._is_quota_error(msg):
+                        raise TushareRetryableError(msg)
+                    raise TushareAPIError(f"Tushare API Error: {msg}")
+                
+                return result
+            except TushareRetryableError as e:
+                if attempt >= max_retries:
+                    raise TushareAPIError(f"Tushare API Error: {e}") from e
+                
+                delay = settings.TUSHARE_RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(
+                    f"Tushare {api_name} 请求失败（{e}），{delay:.1f}s 后第 {attempt + 1} 次重试"
+                )
+                await asyncio.sleep(delay)
+    
+    async def close(self) -> None:
+        """关闭当前事件循环的连接池（应用退出或事件循环结束前调用）"""
+        loop = asyncio.get_running_loop()
+        self._limiters.pop(loop, None)
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+    
+    def close_all(self) -> None:
+        """
+        在各自的事件循环内关闭全部连接池（Celery worker 进程退出时调用）
+        
+        须在没有运行中事件循环的线程调用；已关闭或正在运行的循环跳过
+        """
+        for loop, client in list(self._clients.items()):
+            if loop.is_closed() or loop.is_running():
+                continue
+            try:
+                loop.run_until_complete(client.aclose())
+            except Exception as e:
+                logger.warning(f"关闭 Tushare 连接池失败：{e}")
+        self._clients.clear()
+        self._limiters.clear()
     
     async def get_stock_list(self, market: str = 'A') -> List[Dict]:
         """
@@ -85,67 +195,139 @@ class TushareService:
         result = await self._request('daily', {
             'ts_code': ts_code,
             'start_date': start_date,
-            'end_date': end_date
+            'end_date': end_date,
+            'fields': self.DAILY_FIELDS
         })
         
-        daily_data = []
-        for item in result.get('data', {}).get('items', []):
-            daily_data.append({
-                'trade_date': item[1],
-                'open': float(item[3]) if item[3] else None,
-                'high': float(item[4]) if item[4] else None,
-                'low': float(item[5]) if item[5] else None,
-                'close': float(item[6]) if item[6] else None,
-                'vol': float(item[9]) if item[9] else None,
-                'amount': float(item[10]) if item[10] else None
-            })
+        return [self._parse_daily(record) for record in self._records(result)]
+    
+    async def get_market_daily(self, trade_date: str) -> List[Dict]:
+        """
+        获取某个交易日全市场的日线数据
+        
+        只传 trade_date 时 daily 接口一次返回当日全部股票
+        
+        Args:
+            trade_date: 交易日期 (YYYYMMDD)
         
-        return daily_data
+        Returns:
+            日线数据列表（含 ts_code）
+        """
+        result = await self._request('daily', {
+            'trade_date': trade_date,
+            'fields': self.DAILY_FIELDS
+        })
+        
+        return [self._parse_daily(record) for record in self._records(result)]
+    
+    @staticmethod
+    def _records(result: dict) -> List[Dict]:
+        """按返回的 fields 把 items 转换为字典列表"""
+        data = result.get('data') or {}
+        fields = data.get('fields') or []
+        return [dict(zip(fields, item)) for item in data.get('items', [])]
+    
+    @staticmethod
+    def _parse_daily(record: Dict) -> Dict:
+        """解析 daily 接口的一行数据"""
+        return {
+            'ts_code': record['ts_code'],
+            'trade_date': record['trade_date'],
+            'open': float(record['open']) if record['open'] else None,
+            'high': float(record['high']) if record['high'] else None,
+            'low': float(record['low']) if record['low'] else None,
+            'close': float(record['close']) if record['close'] else None,
+            'vol': float(record['vol']) if record['vol'] else None,
+            'amount': float(record['amount']) if record['amount'] else None
+        }
     
     async def get_daily_basic(
         self,
-        trade_date: str,
-        ts_code: str = None
+        trade_date: str = None,
+        ts_code: str = None,
+        start_date: str = None,
+        end_date: str = None
     ) -> List[Dict]:
         """
         获取每日指标（PE/PB/股息率等）
         注意：daily_basic 接口需要 1000 积分
         
+        按 trade_date 查询单日（可不传 ts_code 获取全市场），
+        或按 ts_code + start_date/end_date 查询区间
+        
         Args:
             trade_date: 交易日期 (YYYYMMDD)
             ts_code: 股票代码（可选）
-            
+            start_date: 开始日期 (YYYYMMDD)
+            end_date: 结束日期 (YYYYMMDD)
+        
         Returns:
             每日指标数据
+        
+        Raises:
+            TushareAPIError: 接口不可用或重试耗尽。不返回空列表，以免调用方写入缺少 PE/PB 的日线
         """
-        try:
-            params = {'trade_date': trade_date}
-            if ts_code:
-                params['ts_code'] = ts_code
-            
-            result = await self._request('daily_basic', {
-                **params,
-                'fields': 'ts_code,trade_date,close,pe_ttm,pb,dv_ratio,total_mv'
+        params = {}
+        if trade_date:
+            params['trade_date'] = trade_date
+        if ts_code:
+            params['ts_code'] = ts_code
+        if start_date:
+            params['start_date'] = start_date
+        if end_date:
+            params['end_date'] = end_date
+        
+        result = await self._request('daily_basic', {
+            **params,
+            'fields': 'ts_code,trade_date,close,pe_ttm,pb,dv_ratio,total_mv'
+        })
+        
+        indicators = []
+        for item in result.get('data', {}).get('items', []):
+            indicators.append({
+                'ts_code': item[0],
+                'trade_date': item[1],
+                'close': float(item[2]) if item[2] else None,
+                'pe_ttm': float(item[3]) if item[3] else None,
+                'pb': float(item[4]) if item[4] else None,
+                'dv_ratio': float(item[5]) if item[5] else None,
+                'total_mv': float(item[6]) if item[6] else None
             })
-            
-            indicators = []
-            for item in result.get('data', {}).get('items', []):
-                indicators.append({
-                    'ts_code': item[0],
-                    'trade_date': item[1],
-                    'close': float(item[2]) if item[2] else None,
-                    'pe_ttm': float(item[3]) if item[3] else None,
-                    'pb': float(item[4]) if item[4] else None,
-                    'dv_ratio': float(item[5]) if item[5] else None,
-                    'total_mv': float(item[6]) if item[6] else None
-                })
-            
-            return indicators
-        except Exception as e:
-            # 如果 daily_basic 不可用，返回空列表
-            # PE/PB 等指标将通过其他方式计算
-            print(f"⚠️  daily_basic 接口不可用：{e}")
-            return []
+        
+        return indicators
+    
+    async def get_trade_cal(
+        self,
+        start_date: str,
+        end_date: str,
+        exchange: str = 'SSE'
+    ) -> List[Dict]:
+        """
+        获取交易日历
+        
+        Args:
+            start_date: 开始日期 (YYYYMMDD)
+            end_date: 结束日期 (YYYYMMDD)
+            exchange: 交易所 SSE-上交所 SZSE-深交所
+        
+        Returns:
+            日历列表（cal_date, is_open）
+        """
+        result = await self._request('trade_cal', {
+            'exchange': exchange,
+            'start_date': start_date,
+            'end_date': end_date,
+            'fields': 'exchange,cal_date,is_open'
+        })
+        
+        return [
+            {
+                'exchange': record['exchange'],
+                'cal_date': record['cal_date'],
+                'is_open': str(record['is_open']) == '1'
+            }
+            for record in self._records(result)
+        ]
     
     async def get_fina_mainbz(self, ts_code: str) -> List[Dict]:
         """
@@ -210,18 +392,23 @@ class TushareService:
         
         return dividends
     
-    async def get_fina_indicator(self, ts_code: str) -> List[Dict]:
+    async def get_fina_indicator(self, ts_code: str, start_date: str = None) -> List[Dict]:
         """
         获取财务指标数据
         
         Args:
             ts_code: 股票代码
+            start_date: 公告开始日期 (YYYYMMDD，可选，用于增量同步)
             
         Returns:
             财务指标数据
         """
+        params = {'ts_code': ts_code}
+        if start_date:
+            params['start_date'] = start_date
+        
         result = await self._request('fina_indicator', {
-            'ts_code': ts_code,
+            **params,
             'fields': 'ts_code,ann_date,end_date,roa,roe,sales_exp,op_profit,n_income,'
                      'operate_cash_invest,operate_cash_finance,operate_cash_oper'
         })
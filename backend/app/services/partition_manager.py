@@ -0,0 +1,132 @@
+# 日线表分区管理
+
+from datetime import date
+from typing import Iterable, List, Optional, Set
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = 'stock_daily_data'
+DEFAULT_PARTITION = 'stock_daily_data_default'
+
+# 分区 DDL 的事务级咨询锁，避免多个同步进程同时创建同一年的分区
+PARTITION_LOCK_SQL = f"SELECT pg_advisory_xact_lock(hashtext('{PARENT_TABLE}_partitions'))"
+
+# 进程内缓存：已确认存在的年份分区
+_known_years: Set[int] = set()
+
+
+def partition_name(year: int) -> str:
+    """年份分区表名"""
+    return f"{PARENT_TABLE}_y{year}"
+
+
+def partition_bounds(year: int) -> str:
+    """年份分区的范围 [当年 1 月 1 日, 次年 1 月 1 日)"""
+    return f"FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+
+
+def create_partition_sql(year: int) -> str:
+    """直接创建年份分区（默认分区中没有该年数据时使用，如迁移时）"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(year)} "
+        f"PARTITION OF {PARENT_TABLE} FOR VALUES {partition_bounds(year)}"
+    )
+
+
+async def list_partitions(db: AsyncSession) -> List[str]:
+    """列出日线表当前挂载的全部分区"""
+    result = await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        f"WHERE i.inhparent = '{PARENT_TABLE}'::regclass "
+        "ORDER BY c.relname"
+    ))
+    return list(result.scalars().all())
+
+
+async def ensure_partitions(db: AsyncSession, years: Iterable[int]) -> List[int]:
+    """
+    确保指定年份的分区存在（不提交事务，DDL 随调用方事务提交）
+    
+    新分区先建为独立表，把默认分区中该年的数据搬入后再 ATTACH，
+    因此即使数据已经落入默认分区也能补建
+    
+    Args:
+        db: 数据库会话
+        years: 年份
+    
+    Returns:
+        本次新建分区的年份
+    """
+    pending = sorted(set(years) - _known_years)
+    if not pending:
+        return []
+    
+    created = []
+    await db.execute(text(PARTITION_LOCK_SQL))
+    for year in pending:
+        name = partition_name(year)
+        exists = await db.scalar(text(f"SELECT to_regclass('{name}') IS NOT NULL"))
+        if not exists:
+            start, end = f"'{year}-01-01'", f"'{year + 1}-01-01'"
+            await db.execute(text(
+                f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            ))
+            await db.execute(text(
+                f"WITH moved AS ("
+                f"DELETE FROM {DEFAULT_PARTITION} WHERE date >= {start} AND date < {end} RETURNING *"
+                f") INSERT INTO {name} SELECT * FROM moved"
+            ))
+            # 分区约束与范围一致，ATTACH 时跳过全表校验
+            await db.execute(text(
+                f"ALTER TABLE {name} ADD CONSTRAINT {name}_range "
+                f"CHECK (date >= {start} AND date < {end})"
+            ))
+            await db.execute(text(
+                f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES {partition_bounds(year)}"
+            ))
+            created.append(year)
+            logger.info(f"创建日线分区 {name}")
+        else:
+            # 已存在的分区才记入缓存；新建的分区等调用方事务提交后下次确认
+            _known_years.add(year)
+    return created
+
+
+async def ensure_upcoming_partitions(db: AsyncSession, ahead_years: int = 1) -> List[int]:
+    """预建当年及之后若干年的分区并提交（定时任务调用，避免新数据落入默认分区）"""
+    this_year = date.today().year
+    created = await ensure_partitions(db, range(this_year, this_year + ahead_years + 1))
+    await db.commit()
+    return created
+
+
+async def detach_partition(
+    db: AsyncSession,
+    year: int,
+    tablespace: Optional[str] = None
+) -> str:
+    """
+    分离旧年份分区（数据保留为独立表，可归档导出或移到低成本表空间后删除）
+    
+    Args:
+        db: 数据库会话
+        year: 年份
+        tablespace: 分离后移动到的表空间（可选）
+    
+    Returns:
+        分离后的表名
+    """
+    name = partition_name(year)
+    await db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+    if tablespace:
+        await db.execute(text(f"ALTER TABLE {name} SET TABLESPACE {tablespace}"))
+    await db.commit()
+    _known_years.discard(year)
+    
+    logger.info(f"已分离日线分区 {name}")
+    return name
@@ -0,0 +1,156 @@
+# 百分位计算引擎
+
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+
+class PercentileEngine:
+    """
+    估值百分位引擎
+    
+    每只股票维护一个升序的历史值数组（只保留大于 0 的有效值），
+    百分位 = 严格小于当前值的数量 / 有效值数量 * 100，
+    与 IndicatorCalculator.calculate_percentile 口径一致，单次查询 O(log n)
+    """
+    
+    def __init__(self):
+        self._series: Dict[str, np.ndarray] = {}
+        # 批量查询用的扁平数组：所有股票的有序历史首尾相接，按偏移量定位
+        self._flat: Optional[np.ndarray] = None
+        self._offsets: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._series)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._series
+    
+    def load(self, key: str, values: Iterable[float]) -> None:
+        """加载一只股票的历史值（无需有序）"""
+        array = np.asarray([v for v in values if v is not None], dtype=np.float64)
+        self._series[key] = np.sort(array[array > 0])
+        self._flat = None
+    
+    def load_many(self, keys: Sequence[str], values: Sequence[float]) -> None:
+        """
+        批量加载历史值（一次排序完成所有股票）
+        
+        Args:
+            keys: 每个值对应的股票标识
+            values: 历史值，与 keys 一一对应
+        """
+        keys = np.asarray(keys)
+        values = np.asarray(values, dtype=np.float64)
+        valid = values > 0
+        keys, values = keys[valid], values[valid]
+        
+        if len(keys) == 0:
+            return
+        
+        # 按连续相同的标识切分；输入未按股票分组时先稳定排序
+        starts = self._group_starts(keys)
+        if len(set(keys[starts].tolist())) < len(starts):
+            order = np.argsort(keys, kind='stable')
+            keys, values = keys[order], values[order]
+            starts = self._group_starts(keys)
+        
+        ends = np.append(starts[1:], len(keys))
+        for start, end in zip(starts, ends):
+            self._series[str(keys[start])] = np.sort(values[start:end])
+        self._flat = None
+    
+    @staticmethod
+    def _group_starts(keys: np.ndarray) -> np.ndarray:
+        """连续相同标识区段的起始位置"""
+        return np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+    
+    def rank(self, key: str, value: Optional[float]) -> Optional[float]:
+        """
+        计算当前值在历史中的百分位
+        
+        Returns:
+            百分位 (0-100)，无历史数据时返回 None
+        """
+        series = self._series.get(key)
+        if series is None or len(series) == 0 or value is None or np.isnan(value):
+            return None
+        
+        lower = np.searchsorted(series, value, side='left')
+        return round(float(lower) / len(series) * 100, 2)
+    
+    def rank_many(self, keys: Sequence[str], values: Sequence[float]) -> np.ndarray:
+        """
+        批量计算百分位（一次向量化调用覆盖所有股票）
+        
+        在扁平数组上对每只股票的区间同时做二分查找，迭代次数为 log2(最长历史)
+        
+        Args:
+            keys: 股票标识
+            values: 当前值，与 keys 一一对应
+        
+        Returns:
+            百分位数组，无历史数据或当前值为空的位置为 NaN
+        """
+        self._build_flat()
+        values = np.asarray(values, dtype=np.float64)
+        
+        lo = np.zeros(len(keys), dtype=np.int64)
+        hi = np.zeros(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            start = self._offsets.get(key)
+            if start is not None:
+                lo[i] = start
+                hi[i] = start + len(self._series[key])
+        base, total = lo.copy(), hi - lo
+        
+        # 二分查找第一个 >= 当前值的位置
+        active = (lo < hi) & ~np.isnan(values)
+        while active.any():
+            mid = (lo + hi) // 2
+            below = np.zeros(len(keys), dtype=bool)
+            below[active] = self._flat[mid[active]] < values[active]
+            lo = np.where(active & below, mid + 1, lo)
+            hi = np.where(active & ~below, mid, hi)
+            active = lo < hi
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentiles = np.round((lo - base) / total * 100, 2)
+        percentiles[(total == 0) | np.isnan(values)] = np.nan
+        return percentiles
+    
+    def insert(self, key: str, value: Optional[float]) -> None:
+        """增量加入新一天的值"""
+        if value is None or not value > 0:
+            return
+        
+        series = self._series.get(key, np.empty(0, dtype=np.float64))
+        index = np.searchsorted(series, value)
+        self._series[key] = np.insert(series, index, value)
+        self._flat = None
+    
+    def evict(self, key: str, value: Optional[float]) -> None:
+        """移除滑出统计窗口的值"""
+        series = self._series.get(key)
+        if series is None or value is None or not value > 0:
+            return
+        
+        index = np.searchsorted(series, value)
+        if index < len(series) and series[index] == value:
+            self._series[key] = np.delete(series, index)
+            self._flat = None
+    
+    def _build_flat(self) -> None:
+        """拼接扁平数组和偏移量（数据变动后惰性重建）"""
+        if self._flat is not None:
+            return
+        
+        offset = 0
+        self._offsets = {}
+        for key, series in self._series.items():
+            self._offsets[key] = offset
+            offset += len(series)
+        self._flat = (
+            np.concatenate(list(self._series.values()))
+            if self._series else np.empty(0, dtype=np.float64)
+        )
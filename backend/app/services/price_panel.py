@@ -0,0 +1,414 @@
+# 全市场日线面板（内存映射 NumPy 矩阵）
+
+import fcntl
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select, cast, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.stock import Stock, StockDailyData
+
+logger = logging.getLogger(__name__)
+
+PANEL_FIELDS = ('close', 'pe_ttm', 'pb', 'dividend_yield')
+PANEL_DTYPE = np.float32
+
+# 日期轴按此步长预留容量，每日追加只写新行，不重写文件
+DATE_CAPACITY_STEP = 256
+
+# 读库时每批行数（服务端游标）
+PANEL_BATCH_SIZE = 50000
+
+
+def _to_dates(values) -> np.ndarray:
+    return np.asarray([str(v) for v in values], dtype='datetime64[D]')
+
+
+def _capacity(rows: int) -> int:
+    return (rows // DATE_CAPACITY_STEP + 1) * DATE_CAPACITY_STEP
+
+
+class PanelWriter:
+    """
+    面板写入器
+    
+    write 把日线批次写入矩阵，commit 落盘并原子替换 meta.json，之后读取方才能看到新日期
+    """
+    
+    def __init__(self, panel: 'PricePanel', meta: dict, matrices: Dict[str, np.memmap],
+                 stale_generation: Optional[int] = None, added_stock_ids: Sequence[str] = ()):
+        self._panel = panel
+        self._meta = meta
+        self._matrices = matrices
+        self._dates = _to_dates(meta['dates'])
+        self._columns = {stock_id: i for i, stock_id in enumerate(meta['stock_ids'])}
+        self._stale_generation = stale_generation
+        # 本次新加入股票轴的股票，需要补写其历史
+        self.added_stock_ids = list(added_stock_ids)
+    
+    @property
+    def first_date(self) -> Optional[date]:
+        return self._dates[0].item() if len(self._dates) else None
+    
+    def write(self, batch: Dict[str, Sequence]) -> int:
+        """
+        写入一批日线
+        
+        Args:
+            batch: 列名 -> 值数组（stock_id、date 及 PANEL_FIELDS），不在面板轴上的行忽略
+        
+        Returns:
+            写入行数
+        """
+        if len(batch['date']) == 0:
+            return 0
+        
+        dates = _to_dates(batch['date'])
+        rows = np.searchsorted(self._dates, dates)
+        cols = np.fromiter((self._columns.get(s, -1) for s in batch['stock_id']),
+                           dtype=np.int64, count=len(dates))
+        valid = (rows < len(self._dates)) & (cols >= 0)
+        valid[valid] = self._dates[rows[valid]] == dates[valid]
+        rows, cols = rows[valid], cols[valid]
+        
+        for field in PANEL_FIELDS:
+            values = np.asarray(batch[field], dtype=np.float64)[valid]
+            self._matrices[field][rows, cols] = values.astype(PANEL_DTYPE)
+        return int(valid.sum())
+    
+    def commit(self) -> None:
+        for matrix in self._matrices.values():
+            matrix.flush()
+        self._panel._write_meta(self._meta)
+        # 已读到旧 meta.json 但尚未映射文件的读取方仍需要上一代文件，保留一个周期，只删除更早的代次
+        if self._stale_generation is not None and self._stale_generation != self._meta['generation']:
+            self._panel._remove_generations_before(self._stale_generation)
+
+
+class PricePanel:
+    """
+    全市场日线面板：每个字段一个 日期 × 股票 的 float32 矩阵（缺失为 NaN）
+    
+    {PRICE_PANEL_DIR}/meta.json 记录日期轴、股票轴（stock_id）、预留容量和文件代次，
+    {字段}.{代次}.f32 为按日期行存放的原始矩阵。每日同步只写入新日期的行再替换 meta.json；
+    回补历史、新股上市或容量不足时写新一代文件（复制已有数据，不重新读库），
+    上一代文件保留到再下一代提交时才删除，旧文件在已打开的进程中仍然有效。
+    读取方以只读 np.memmap 打开，多个 API 进程通过页缓存共享同一份数据
+    """
+    
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.PRICE_PANEL_DIR)
+        self.dates = np.empty(0, dtype='datetime64[D]')
+        self.stock_ids: List[str] = []
+        self._columns: Dict[str, int] = {}
+        self._matrices: Dict[str, np.memmap] = {}
+        self._meta_stat: Optional[Tuple[int, int]] = None
+    
+    def __len__(self) -> int:
+        return len(self.dates)
+    
+    @property
+    def meta_path(self) -> Path:
+        return self.root / 'meta.json'
+    
+    def _data_path(self, field: str, generation: int) -> Path:
+        return self.root / f"{field}.{generation}.f32"
+    
+    def read_meta(self) -> Optional[dict]:
+        if not self.meta_path.exists():
+            return None
+        return json.loads(self.meta_path.read_text())
+    
+    def _write_meta(self, meta: dict) -> None:
+        tmp = self.meta_path.with_suffix('.json.tmp')
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.meta_path)
+    
+    def _remove_generations_before(self, generation: int) -> None:
+        """删除早于指定代次的矩阵文件"""
+        for field in PANEL_FIELDS:
+            for path in self.root.glob(f"{field}.*.f32"):
+                if int(path.suffixes[0][1:]) < generation:
+                    path.unlink(missing_ok=True)
+    
+    def _map(self, field: str, meta: dict, mode: str) -> np.memmap:
+        return np.memmap(
+            self._data_path(field, meta['generation']), dtype=PANEL_DTYPE, mode=mode,
+            shape=(meta['capacity'], len(meta['stock_ids'])),
+        )
+    
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """写入方之间的文件锁（读取方无需加锁）"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / '.lock', 'w') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+    
+    # ===== 读取 =====
+    
+    def open(self) -> bool:
+        """
+        打开（或在 meta.json 变化后重新打开）面板，未变化时不做任何事
+        
+        Returns:
+            面板是否可用
+        """
+        try:
+            stat = os.stat(self.meta_path)
+        except FileNotFoundError:
+            return False
+        if (stat.st_ino, stat.st_mtime_ns) == self._meta_stat:
+            return True
+        
+        meta = self.read_meta()
+        self._matrices = {field: self._map(field, meta, 'r') for field in PANEL_FIELDS}
+        self.dates = _to_dates(meta['dates'])
+        self.stock_ids = meta['stock_ids']
+        self._columns = {stock_id: i for i, stock_id in enumerate(self.stock_ids)}
+        self._meta_stat = (stat.st_ino, stat.st_mtime_ns)
+        return True
+    
+    def matrix(self, field: str) -> np.ndarray:
+        """字段的 日期 × 股票 矩阵（内存映射视图，不拷贝）"""
+        return self._matrices[field][:len(self.dates)]
+    
+    def window(
+        self,
+        field: str,
+        days: Optional[int] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        stock_ids: Optional[Sequence[str]] = None,
+    ) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """
+        按日期区间截取矩阵
+        
+        Args:
+            field: 字段 close/pe_ttm/pb/dividend_yield
+            days: 最近 N 个交易日（与 start 二选一）
+            start: 开始日期（含）
+            end: 结束日期（含）
+            stock_ids: 只取这些股票（会拷贝对应列；不在面板中的股票忽略）
+        
+        Returns:
+            (日期轴, 股票轴, 矩阵)
+        """
+        first = 0
+        last = len(self.dates)
+        if end is not None:
+            last = int(np.searchsorted(self.dates, np.datetime64(end, 'D'), side='right'))
+        if days is not None:
+            first = max(last - days, 0)
+        elif start is not None:
+            first = int(np.searchsorted(self.dates, np.datetime64(start, 'D')))
+        
+        matrix = self._matrices[field][first:last]
+        if stock_ids is None:
+            return self.dates[first:last], self.stock_ids, matrix
+        
+        ids = [stock_id for stock_id in stock_ids if stock_id in self._columns]
+        return self.dates[first:last], ids, matrix[:, [self._columns[i] for i in ids]]
+    
+    # ===== 写入 =====
+    
+    def rebuild(self, dates: Sequence, stock_ids: Sequence[str]) -> PanelWriter:
+        """
+        以新的日期轴和股票轴写一代新文件（首次构建或股票轴变化时使用）
+        
+        Args:
+            dates: 日期轴（升序）
+            stock_ids: 股票轴
+        """
+        previous = self.read_meta()
+        meta = {
+            'generation': previous['generation'] + 1 if previous else 1,
+            'capacity': _capacity(len(dates)),
+            'dates': [str(d) for d in _to_dates(dates)],
+            'stock_ids': list(stock_ids),
+        }
+        self.root.mkdir(parents=True, exist_ok=True)
+        matrices = {}
+        for field in PANEL_FIELDS:
+            matrices[field] = self._map(field, meta, 'w+')
+            matrices[field][:] = np.nan
+        return PanelWriter(self, meta, matrices, previous['generation'] if previous else None)
+    
+    def update(self, dates: Sequence, stock_ids: Sequence[str]) -> PanelWriter:
+        """
+        按需扩展日期轴和股票轴，返回写入器
+        
+        只在最后一天之后追加交易日且容量足够时原地写入（已有日期的行直接重写）；
+        日期早于或插入到已有日期之间、新增股票或容量不足时写新一代文件，
+        已有数据按新轴位置复制，新增的行列填 NaN。新股票追加在股票轴末尾，已有列位置不变
+        
+        Args:
+            dates: 需要写入的交易日
+            stock_ids: 当前全部股票（不在轴上的追加为新列）
+        """
+        previous = self.read_meta()
+        if previous is None:
+            return self.rebuild(dates, stock_ids)
+        
+        existing = _to_dates(previous['dates'])
+        merged = np.union1d(existing, _to_dates(dates))
+        known = set(previous['stock_ids'])
+        added = [stock_id for stock_id in dict.fromkeys(stock_ids) if stock_id not in known]
+        meta = dict(
+            previous,
+            dates=[str(d) for d in merged],
+            stock_ids=previous['stock_ids'] + added,
+        )
+        
+        appended_only = bool((merged[:len(existing)] == existing).all())
+        if not added and appended_only and len(merged) <= previous['capacity']:
+            matrices = {field: self._map(field, meta, 'r+') for field in PANEL_FIELDS}
+            return PanelWriter(self, meta, matrices)
+        
+        meta.update(generation=previous['generation'] + 1, capacity=_capacity(len(merged)))
+        rows = np.searchsorted(merged, existing)
+        width = len(previous['stock_ids'])
+        matrices = {}
+        for field in PANEL_FIELDS:
+            matrices[field] = self._map(field, meta, 'w+')
+            matrices[field][:] = np.nan
+            old = self._map(field, previous, 'r')[:len(existing)]
+            if appended_only:
+                matrices[field][:len(existing), :width] = old
+            else:
+                matrices[field][rows, :width] = old
+        return PanelWriter(self, meta, matrices, previous['generation'], added)
+
+
+def _bar_query(start: date, end: Optional[date] = None, stock_ids: Optional[Sequence[str]] = None):
+    query = select(
+        StockDailyData.stock_id, StockDailyData.date,
+        *(cast(getattr(StockDailyData, field), Float).label(field) for field in PANEL_FIELDS),
+    ).where(StockDailyData.date >= start)
+    if end is not None:
+        query = query.where(StockDailyData.date <= end)
+    if stock_ids is not None:
+        query = query.where(StockDailyData.stock_id.in_(stock_ids))
+    return query.execution_options(yield_per=PANEL_BATCH_SIZE)
+
+
+async def _write_bars(
+    db: AsyncSession,
+    writer: PanelWriter,
+    start: date,
+    end: Optional[date] = None,
+    stock_ids: Optional[Sequence[str]] = None,
+) -> int:
+    """服务端游标分批读取日线写入面板，不一次性加载全部行"""
+    result = await db.stream(_bar_query(start, end, stock_ids))
+    count = 0
+    async for rows in result.partitions():
+        count += writer.write(dict(zip(('stock_id', 'date') + PANEL_FIELDS, zip(*rows))))
+    return count
+
+
+async def _trade_dates(db: AsyncSession, start: date, end: Optional[date] = None) -> List[date]:
+    query = select(StockDailyData.date).where(StockDailyData.date >= start)
+    if end is not None:
+        query = query.where(StockDailyData.date <= end)
+    result = await db.execute(query.distinct().order_by(StockDailyData.date))
+    return list(result.scalars().all())
+
+
+async def update_price_panel(
+    db: AsyncSession,
+    panel: Optional['PricePanel'] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> int:
+    """
+    同步任务写库后更新面板
+    
+    面板不存在时按 PRICE_PANEL_YEARS 全量构建；否则只重读 [start, end] 内的日线
+    （已在轴上的日期原地重写，轴外的日期并入日期轴），再补写新上市股票的历史。
+    未指定 start 时从面板最后一天开始；区间不早于面板最后一天时一直读到最新
+    
+    Args:
+        db: 数据库会话
+        panel: 面板（默认全局实例）
+        start: 本次同步/回补的开始日期（含）
+        end: 结束日期（含）
+    
+    Returns:
+        写入行数
+    """
+    if panel is None:
+        panel = price_panel
+    
+    result = await db.execute(select(Stock.id).order_by(Stock.code))
+    stock_ids = [str(stock_id) for stock_id in result.scalars().all()]
+    if not stock_ids:
+        return 0
+    
+    floor = date(date.today().year - settings.PRICE_PANEL_YEARS + 1, 1, 1)
+    with panel.lock():
+        meta = panel.read_meta()
+        if meta is None or not meta['dates']:
+            writer = panel.rebuild(await _trade_dates(db, floor), stock_ids)
+            count = await _write_bars(db, writer, floor)
+            writer.commit()
+            logger.info(f"日线面板构建完成，{len(stock_ids)} 只股票，写入 {count} 条")
+            return count
+        
+        last = date.fromisoformat(meta['dates'][-1])
+        start = max(min(start or last, last), floor)
+        if end is not None and end >= last:
+            end = None
+        
+        writer = panel.update(await _trade_dates(db, start, end), stock_ids)
+        count = await _write_bars(db, writer, start, end)
+        if writer.added_stock_ids:
+            count += await _write_bars(db, writer, writer.first_date, stock_ids=writer.added_stock_ids)
+        writer.commit()
+        
+        logger.info(
+            f"日线面板更新完成：{start} ~ {end or '最新'}，"
+            f"新增 {len(writer.added_stock_ids)} 只股票，写入 {count} 条"
+        )
+        return count
+
+
+async def sync_price_panel(
+    db: AsyncSession,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> int:
+    """同步任务调用的入口（未开启时跳过，失败不影响同步）"""
+    if not settings.PRICE_PANEL_ENABLED:
+        return 0
+    try:
+        return await update_price_panel(db, start=start, end=end)
+    except Exception as e:
+        logger.error(f"更新日线面板失败：{e}")
+        return 0
+
+
+def get_price_panel() -> Optional['PricePanel']:
+    """
+    读取入口：返回已打开的全局面板（meta.json 变化时自动重新映射），面板不存在时返回 None
+    
+    用法：dates, stock_ids, matrix = get_price_panel().window('close', days=250)
+    """
+    if not settings.PRICE_PANEL_ENABLED or not price_panel.open():
+        return None
+    return price_panel
+
+
+# 全局实例
+price_panel = PricePanel()
@@ -1,11 +1,275 @@
-# Placeholder for screener service
+# 选股器服务
+
+import asyncio
+import logging
+import operator
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.stock import stock_latest_metrics
+from app.schemas.screener import ScreenerRequest, ScreenerResult
+from app.services.screener_snapshot import (
+    ScreenerSnapshot, NUMERIC_FIELDS, get_screener_snapshot, get_cached_data_version,
+)
+
+logger = logging.getLogger(__name__)
+
+# 区间条件：请求字段 -> (快照字段, 比较函数)，同时作用于 NumPy 数组和 SQL 列
+RANGE_FILTERS = {
+    'pe_min': ('pe_ttm', operator.ge),
+    'pe_max': ('pe_ttm', operator.le),
+    'pb_min': ('pb', operator.ge),
+    'pb_max': ('pb', operator.le),
+    'pe_percentile_max': ('pe_percentile', operator.le),
+    'pb_percentile_max': ('pb_percentile', operator.le),
+    'dividend_yield_min': ('dividend_yield', operator.ge),
+    'roe_min': ('roe', operator.ge),
+    'revenue_growth_min': ('revenue_growth', operator.ge),
+    'profit_growth_min': ('profit_growth', operator.ge),
+    'market_cap_min': ('market_cap', operator.ge),
+    'market_cap_max': ('market_cap', operator.le),
+}
+
+# 预设选股模板（结果按数据版本预计算并缓存）
+SCREENER_PRESETS = [
+    {
+        "id": "high_dividend",
+        "name": "高股息策略",
+        "description": "股息率 > 5%, PE < 20, 连续 3 年分红",
+        "conditions": {
+            "dividend_yield_min": 5,
+            "pe_max": 20,
+        },
+        "sort_by": "dividend_yield",
+    },
+    {
+        "id": "low_valuation",
+        "name": "低估值策略",
+        "description": "PE 百分位 < 20%, PB 百分位 < 20%",
+        "conditions": {
+            "pe_percentile_max": 20,
+            "pb_percentile_max": 20,
+        },
+        "sort_by": "pe_percentile",
+        "sort_order": "asc",
+    },
+    {
+        "id": "quality_growth",
+        "name": "优质成长策略",
+        "description": "ROE > 15%, 营收增长率 > 20%",
+        "conditions": {
+            "roe_min": 15,
+            "revenue_growth_min": 20,
+        },
+        "sort_by": "roe",
+    },
+]
+
+PRESETS_BY_ID = {preset["id"]: preset for preset in SCREENER_PRESETS}
+
+# 每个预设缓存的结果数量（分页在缓存结果内进行）
+PRESET_RESULT_LIMIT = 500
+
+# 预设结果缓存：预设 ID -> (数据版本, 结果, 总数)
+_preset_cache: Dict[str, Tuple[str, List[ScreenerResult], int]] = {}
+_preset_lock = asyncio.Lock()
+
+
 class ScreenerService:
     """选股器服务"""
     
-    def __init__(self, db):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    async def screen(self, request):
-        """多条件筛选股票"""
-        # TODO: 实现选股逻辑
-        return []
+    async def screen(self, request: ScreenerRequest) -> Tuple[List[ScreenerResult], int]:
+        """
+        多条件筛选股票
+        
+        SCREENER_MODE=memory 时基于内存列式快照，所有条件合成布尔掩码后排序分页；
+        SCREENER_MODE=sql 时编译为一条查询在 stock_latest_metrics 视图上执行
+        
+        Returns:
+            (当前页结果, 符合条件的总数)
+        """
+        if settings.SCREENER_MODE == 'sql':
+            return await self._screen_sql(request)
+        
+        snapshot = await get_screener_snapshot(self.db)
+        return screen_snapshot(snapshot, request)
+    
+    async def screen_preset(
+        self,
+        preset_id: str,
+        page: int = 1,
+        page_size: int = 50
+    ) -> Optional[Tuple[List[ScreenerResult], int]]:
+        """
+        获取预设模板的选股结果
+        
+        数据版本（估值快照刷新时间）变化后，首个请求一次算出全部预设并缓存；
+        同一版本内的请求直接命中缓存，新交易日数据同步后自动失效。
+        内存模式的版本和结果取自同一个快照对象；SQL 模式的版本按 SCREENER_SNAPSHOT_TTL 间隔检查
+        
+        Returns:
+            (当前页结果, 符合条件的总数)，预设不存在时返回 None
+        """
+        if preset_id not in PRESETS_BY_ID:
+            return None
+        
+        snapshot = None
+        if settings.SCREENER_MODE == 'sql':
+            version = await get_cached_data_version(self.db)
+        else:
+            snapshot = await get_screener_snapshot(self.db)
+            version = snapshot.version
+        
+        cached = _preset_cache.get(preset_id)
+        if not cached or cached[0] != version:
+            async with _preset_lock:
+                cached = _preset_cache.get(preset_id)
+                if not cached or cached[0] != version:
+                    await self._compute_presets(version, snapshot)
+                    cached = _preset_cache[preset_id]
+        
+        _, results, total = cached
+        start = (page - 1) * page_size
+        return results[start:start + page_size], total
+    
+    async def _compute_presets(self, version: str, snapshot: Optional[ScreenerSnapshot]) -> None:
+        """按当前数据版本计算全部预设的结果（内存模式在给定快照上计算，SQL 模式查询数据库）"""
+        for preset in SCREENER_PRESETS:
+            request = ScreenerRequest(
+                **preset["conditions"],
+                sort_by=preset.get("sort_by"),
+                sort_order=preset.get("sort_order", "desc"),
+                page_size=PRESET_RESULT_LIMIT,
+            )
+            if snapshot is not None:
+                results, total = screen_snapshot(snapshot, request)
+            else:
+                results, total = await self._screen_sql(request)
+            _preset_cache[preset["id"]] = (version, results, total)
+        logger.info(f"预设选股结果已更新（数据版本 {version}）")
+    
+    async def _screen_sql(self, request: ScreenerRequest) -> Tuple[List[ScreenerResult], int]:
+        """在数据库中筛选（总数通过窗口函数随结果一起返回）"""
+        result = await self.db.execute(build_screener_query(request))
+        rows = result.mappings().all()
+        if not rows:
+            total = await self._count_sql(request) if request.page > 1 else 0
+            return [], total
+        
+        total = rows[0]['total']
+        return [
+            ScreenerResult(**{k: v for k, v in row.items() if k != 'total'})
+            for row in rows
+        ], total
+    
+    async def _count_sql(self, request: ScreenerRequest) -> int:
+        """超出最后一页时单独统计总数"""
+        query = build_screener_query(request, paginate=False)
+        result = await self.db.execute(select(func.count()).select_from(query.subquery()))
+        return result.scalar()
+
+
+def build_screener_query(request: ScreenerRequest, paginate: bool = True):
+    """
+    把选股条件编译为 stock_latest_metrics 视图上的查询
+    
+    Args:
+        request: 选股条件
+        paginate: 是否排序分页（False 时只保留过滤条件，用于计数）
+    """
+    view = stock_latest_metrics
+    conditions = [view.c.status != 'delisted']
+    
+    for field, (column, compare) in RANGE_FILTERS.items():
+        value = getattr(request, field)
+        if value is not None:
+            conditions.append(compare(view.c[column], value))
+    
+    if request.markets:
+        conditions.append(view.c.market.in_(request.markets))
+    if request.industries:
+        conditions.append(view.c.industry.in_(request.industries))
+    
+    columns = [view.c[name] for name in ('code', 'name', 'market', 'industry', *NUMERIC_FIELDS)]
+    if not paginate:
+        return select(*columns).where(*conditions)
+    
+    order_by = []
+    if request.sort_by:
+        sort_column = view.c[request.sort_by]
+        sort_column = sort_column.asc() if request.sort_order == 'asc' else sort_column.desc()
+        order_by.append(sort_column.nulls_last())
+    order_by.append(view.c.code)
+    
+    return (
+        select(*columns, func.count().over().label('total'))
+        .where(*conditions)
+        .order_by(*order_by)
+        .offset((request.page - 1) * request.page_size)
+        .limit(request.page_size)
+    )
+
+
+def screen_snapshot(
+    snapshot: ScreenerSnapshot,
+    request: ScreenerRequest
+) -> Tuple[List[ScreenerResult], int]:
+    """在列式快照上执行筛选、排序和分页"""
+    mask = build_mask(snapshot, request)
+    indices = np.flatnonzero(mask)
+    total = len(indices)
+    
+    if request.sort_by and total:
+        values = snapshot[request.sort_by][indices]
+        if request.sort_by in NUMERIC_FIELDS:
+            # 空值（NaN）始终排在最后
+            keys = values if request.sort_order == 'asc' else -values
+            order = np.argsort(keys, kind='stable')
+        else:
+            order = np.argsort(values, kind='stable')
+            if request.sort_order == 'desc':
+                order = order[::-1]
+        indices = indices[order]
+    
+    start = (request.page - 1) * request.page_size
+    page = indices[start:start + request.page_size]
+    return [_build_result(snapshot, i) for i in page], total
+
+
+def build_mask(snapshot: ScreenerSnapshot, request: ScreenerRequest) -> np.ndarray:
+    """把筛选条件合成为布尔掩码（空值不满足任何区间条件）"""
+    mask = np.ones(len(snapshot), dtype=bool)
+    
+    with np.errstate(invalid='ignore'):
+        for field, (column, compare) in RANGE_FILTERS.items():
+            value = getattr(request, field)
+            if value is not None:
+                mask &= compare(snapshot[column], float(value))
+    
+    if request.markets:
+        mask &= np.isin(snapshot['market'], request.markets)
+    if request.industries:
+        mask &= np.isin(snapshot['industry'], request.industries)
+    
+    return mask
+
+
+def _build_result(snapshot: ScreenerSnapshot, index: int) -> ScreenerResult:
+    """取出一行构建结果"""
+    data = {
+        'code': snapshot['code'][index],
+        'name': snapshot['name'][index],
+        'market': snapshot['market'][index],
+        'industry': snapshot['industry'][index],
+    }
+    for name in NUMERIC_FIELDS:
+        value = snapshot[name][index]
+        data[name] = None if np.isnan(value) else round(float(value), 4)
+    return ScreenerResult(**data)
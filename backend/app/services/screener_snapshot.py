@@ -0,0 +1,132 @@
+# 选股器内存快照
+
+import asyncio
+import time
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.stock import Stock, StockValuationSnapshot
+
+# 文本字段（object 数组）
+TEXT_FIELDS = ('code', 'name', 'market', 'industry')
+
+# 数值字段（float64 数组，缺失为 NaN）
+NUMERIC_FIELDS = (
+    'current_price', 'pe_ttm', 'pb', 'dividend_yield',
+    'pe_percentile', 'pb_percentile', 'roe',
+    'revenue_growth', 'profit_growth', 'market_cap',
+)
+
+
+class ScreenerSnapshot:
+    """全市场最新指标的列式快照（每个字段一个 NumPy 数组，按股票代码排序）"""
+    
+    def __init__(self, columns: Dict[str, np.ndarray], version: str):
+        self.columns = columns
+        self.version = version
+        self.size = len(columns['code'])
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+    
+    @classmethod
+    def from_rows(cls, rows: List[Mapping], version: str = '') -> 'ScreenerSnapshot':
+        """由查询结果构建列式快照"""
+        columns = {}
+        for name in TEXT_FIELDS:
+            columns[name] = np.array([row[name] for row in rows], dtype=object)
+        for name in NUMERIC_FIELDS:
+            columns[name] = np.array(
+                [np.nan if row[name] is None else float(row[name]) for row in rows],
+                dtype=np.float64
+            )
+        return cls(columns, version)
+
+
+async def load_screener_snapshot(db: AsyncSession, version: str = '') -> ScreenerSnapshot:
+    """从 stock_valuation_snapshot 加载全市场最新指标（一次查询）"""
+    snapshot = StockValuationSnapshot
+    result = await db.execute(
+        select(
+            Stock.code, Stock.name, Stock.market, Stock.industry,
+            snapshot.close.label('current_price'),
+            snapshot.pe_ttm, snapshot.pb, snapshot.dividend_yield,
+            snapshot.pe_percentile, snapshot.pb_percentile, snapshot.roe,
+            snapshot.revenue_growth, snapshot.profit_growth,
+            (snapshot.total_mv / 10000).label('market_cap'),  # 万元 -> 亿
+        )
+        .join(snapshot, snapshot.stock_id == Stock.id)
+        .where(Stock.status != 'delisted', snapshot.close.isnot(None))
+        .order_by(Stock.code)
+    )
+    return ScreenerSnapshot.from_rows(result.mappings().all(), version)
+
+
+async def get_data_version(db: AsyncSession) -> str:
+    """估值快照的数据版本（最后刷新时间 + 行数），快照刷新后随之变化"""
+    result = await db.execute(
+        select(func.max(StockValuationSnapshot.updated_at), func.count())
+    )
+    updated_at, count = result.one()
+    return f"{updated_at.isoformat() if updated_at else ''}:{count}"
+
+
+_snapshot: Optional[ScreenerSnapshot] = None
+_checked_at: float = 0.0
+_lock = asyncio.Lock()
+
+
+async def get_screener_snapshot(db: AsyncSession) -> ScreenerSnapshot:
+    """
+    获取进程内的选股快照
+    
+    每隔 SCREENER_SNAPSHOT_TTL 秒检查一次数据版本，版本变化（同步后刷新了估值快照）才重新加载；
+    其余请求直接使用内存中的数组，不访问数据库
+    """
+    global _snapshot, _checked_at
+    
+    if _snapshot is not None and time.monotonic() - _checked_at < settings.SCREENER_SNAPSHOT_TTL:
+        return _snapshot
+    
+    async with _lock:
+        if _snapshot is not None and time.monotonic() - _checked_at < settings.SCREENER_SNAPSHOT_TTL:
+            return _snapshot
+        
+        version = await get_data_version(db)
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = await load_screener_snapshot(db, version)
+        _checked_at = time.monotonic()
+    
+    return _snapshot
+
+
+_version: Optional[str] = None
+_version_checked_at: float = 0.0
+
+
+async def get_cached_data_version(db: AsyncSession) -> str:
+    """
+    进程内缓存的数据版本（SQL 模式用，不加载快照）
+    
+    与快照相同，每隔 SCREENER_SNAPSHOT_TTL 秒才查询一次，其余请求直接返回上次的版本
+    """
+    global _version, _version_checked_at
+    
+    if _version is None or time.monotonic() - _version_checked_at >= settings.SCREENER_SNAPSHOT_TTL:
+        _version = await get_data_version(db)
+        _version_checked_at = time.monotonic()
+    return _version
+
+
+def invalidate_screener_snapshot() -> None:
+    """使快照和缓存的数据版本在下次请求时重新检查"""
+    global _checked_at, _version_checked_at
+    _checked_at = 0.0
+    _version_checked_at = 0.0
@@ -1,24 +1,79 @@
 # 股票数据同步服务
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from typing import List, Optional, Dict
-from datetime import datetime, timedelta
+from sqlalchemy import select, insert, update, and_, func, bindparam, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import List, Optional, Dict, Tuple
+from datetime import date, datetime, timedelta
 import logging
+import uuid
 
-from app.models.stock import Stock, StockDailyData, StockFinancial
+from app.core.cache import response_cache, stock_namespace
+from app.core.config import settings
+from app.models.stock import Stock, StockDailyData, StockFinancial, StockSyncState
 from app.services.data_sources.tushare_service import tushare_service
 from app.services.data_sources.akshare_service import akshare_service
 from app.services.indicator_calculator import indicator_calculator
+from app.services.partition_manager import ensure_partitions
+from app.services.stock_registry import StockRef, stock_registry
+from app.services.stock_suggest import stock_suggest_index
+from app.services.trading_calendar import TradingCalendar
+from app.utils.pinyin import pinyin_abbr
 
 logger = logging.getLogger(__name__)
 
+# 批量 upsert 每批行数（每行 12 个参数，需低于 PostgreSQL 单语句 32767 个参数上限）
+UPSERT_BATCH_SIZE = 1000
+
+# 冲突时需要更新的日线字段
+DAILY_UPDATE_COLUMNS = (
+    'open', 'high', 'low', 'close', 'volume', 'amount',
+    'pe_ttm', 'pb', 'dividend_yield', 'total_mv',
+)
+
+# 每日指标字段：新值为空时保留已有值（daily_basic 不可用时不覆盖历史指标）
+DAILY_INDICATOR_COLUMNS = ('pe_ttm', 'pb', 'dividend_yield', 'total_mv')
+
+# 同步水位数据集 -> 水位字段
+WATERMARK_COLUMNS = {
+    'daily': 'last_trade_date',
+    'financials': 'last_report_date',
+}
+
+
+def build_daily_upsert(rows: List[Dict]):
+    """
+    构建日线数据批量 upsert 语句
+    
+    INSERT ... ON CONFLICT (stock_id, date) DO UPDATE（冲突目标为 (stock_id, date) 主键），
+    RETURNING (xmax = 0) 用于区分新增行（True）和更新行（False）
+    
+    Args:
+        rows: 日线数据行（字段与 stock_daily_data 表一致）
+    
+    Returns:
+        upsert 语句
+    """
+    table = StockDailyData.__table__
+    stmt = pg_insert(table).values(rows)
+    set_ = {}
+    for col in DAILY_UPDATE_COLUMNS:
+        if col in DAILY_INDICATOR_COLUMNS:
+            set_[col] = func.coalesce(stmt.excluded[col], table.c[col])
+        else:
+            set_[col] = stmt.excluded[col]
+    stmt = stmt.on_conflict_do_update(index_elements=['stock_id', 'date'], set_=set_)
+    return stmt.returning(literal_column('(xmax = 0)'))
+
 
 class StockDataSyncService:
     """股票数据同步服务"""
     
     def __init__(self, db: AsyncSession):
         self.db = db
+        self.calendar = TradingCalendar()
+        # 最近一次 backfill_daily_indicators 修复的日期区间
+        self.repaired_range: Tuple[Optional[date], Optional[date]] = (None, None)
     
     async def sync_stock_list(self) -> int:
         """
@@ -28,38 +83,79 @@ class StockDataSyncService:
             同步的股票数量
         """
         try:
-            # 从 Tushare 获取股票列表
+            # 从 Tushare 获取股票列表（仅上市状态）
             stock_list = await tushare_service.get_stock_list()
+            if not stock_list:
+                # 空列表多半是接口异常，不能据此把全部股票标记为退市
+                logger.warning("Tushare 返回的股票列表为空，跳过同步")
+                return 0
             
-            count = 0
+            # 一次查询加载全部已有股票
+            result = await self.db.execute(
+                select(
+                    Stock.id, Stock.code, Stock.name, Stock.market,
+                    Stock.industry, Stock.listed_date, Stock.status, Stock.pinyin_abbr,
+                )
+            )
+            existing = {row.code: row for row in result.all()}
+            
+            feed = {}
             for stock_data in stock_list:
-                # 检查是否已存在
-                result = await self.db.execute(
-                    select(Stock).where(Stock.code == stock_data['symbol'])
+                listed_date = self._parse_date(stock_data['list_date'])
+                feed[stock_data['symbol']] = {
+                    'code': stock_data['symbol'],
+                    'name': stock_data['name'],
+                    'market': self._convert_market(stock_data['market']),
+                    'industry': stock_data['industry'],
+                    'listed_date': listed_date.date() if listed_date else None,
+                    'status': 'active',
+                }
+                # 未安装 pypinyin 时不覆盖已有的拼音首字母
+                abbr = pinyin_abbr(stock_data['name'])
+                if abbr:
+                    feed[stock_data['symbol']]['pinyin_abbr'] = abbr
+            
+            # 在内存中计算新增、更新、退市集合
+            to_insert = [
+                {'id': str(uuid.uuid4()), **values}
+                for code, values in feed.items() if code not in existing
+            ]
+            to_update = [
+                {'id': existing[code].id, **values}
+                for code, values in feed.items()
+                if code in existing and any(
+                    getattr(existing[code], field) != value
+                    for field, value in values.items()
+                )
+            ]
+            delisted_codes = [
+                code for code, row in existing.items()
+                if code not in feed and row.status != 'delisted'
+            ]
+            
+            if to_insert:
+                await self.db.execute(insert(Stock), to_insert)
+            if to_update:
+                # 按主键批量更新（executemany）
+                await self.db.execute(update(Stock), to_update)
+            if delisted_codes:
+                await self.db.execute(
+                    update(Stock)
+                    .where(Stock.code.in_(delisted_codes))
+                    .values(status='delisted')
                 )
-                stock = result.scalar_one_or_none()
-                
-                if stock:
-                    # 更新
-                    stock.name = stock_data['name']
-                    stock.industry = stock_data['industry']
-                    stock.listed_date = self._parse_date(stock_data['list_date'])
-                    stock.market = self._convert_market(stock_data['market'])
-                else:
-                    # 创建
-                    stock = Stock(
-                        code=stock_data['symbol'],
-                        name=stock_data['name'],
-                        market=self._convert_market(stock_data['market']),
-                        industry=stock_data['industry'],
-                        listed_date=self._parse_date(stock_data['list_date']),
-                    )
-                    self.db.add(stock)
-                
-                count += 1
             
             await self.db.commit()
-            logger.info(f"同步股票列表完成，共 {count} 只股票")
+            if to_insert or to_update or delisted_codes:
+                stock_registry.invalidate()
+                stock_suggest_index.invalidate()
+                await response_cache.purge('stock')
+            
+            count = len(feed)
+            logger.info(
+                f"同步股票列表完成，共 {count} 只股票（新增 {len(to_insert)}，"
+                f"更新 {len(to_update)}，退市 {len(delisted_codes)}）"
+            )
             return count
             
         except Exception as e:
@@ -71,7 +167,8 @@ class StockDataSyncService:
         self,
         stock_code: str,
         start_date: Optional[str] = None,
-        end_date: Optional[str] = None
+        end_date: Optional[str] = None,
+        bulk: bool = True
     ) -> int:
         """
         同步日线数据
@@ -80,26 +177,32 @@ class StockDataSyncService:
             stock_code: 股票代码
             start_date: 开始日期 (YYYY-MM-DD)
             end_date: 结束日期 (YYYY-MM-DD)
-            
+            bulk: 是否使用批量 upsert（False 时逐行写入）
+        
+        未指定 start_date 时按同步水位增量拉取（无水位时拉取最近 1 年）
+        
         Returns:
-            同步的数据条数
+            同步的数据条数（0 表示无新数据）
+        
+        Raises:
+            Exception: 拉取或写入失败（已回滚），并发同步据此计入失败
         """
         try:
             # 获取股票
-            result = await self.db.execute(
-                select(Stock).where(Stock.code == stock_code)
-            )
-            stock = result.scalar_one_or_none()
+            stock = await stock_registry.resolve(self.db, stock_code)
             
             if not stock:
                 logger.warning(f"股票 {stock_code} 不存在")
                 return 0
             
-            # 默认同步最近 1 年数据
             if not end_date:
                 end_date = datetime.now().strftime('%Y%m%d')
-            if not start_date:
-                start_date = (datetime.now() - timedelta(days=365)).strftime('%Y%m%d')
+            incremental = not start_date
+            if incremental:
+                start_date = await self._incremental_start_date(stock, end_date)
+                if not start_date:
+                    logger.info(f"{stock_code} 日线数据已是最新")
+                    return 0
             
             # 从 Tushare 获取日线数据
             daily_data = await tushare_service.get_daily_data(
@@ -108,10 +211,11 @@ class StockDataSyncService:
                 end_date=end_date
             )
             
-            # 获取每日指标数据
+            # 获取整个区间的每日指标数据（与日线按 trade_date 合并）
             indicators = await tushare_service.get_daily_basic(
-                trade_date=end_date,
-                ts_code=self._convert_ts_code(stock_code)
+                ts_code=self._convert_ts_code(stock_code),
+                start_date=start_date,
+                end_date=end_date
             )
             
             # 构建指标映射
@@ -119,61 +223,432 @@ class StockDataSyncService:
             for ind in indicators:
                 indicator_map[ind['trade_date']] = ind
             
-            count = 0
-            for data in daily_data:
-                # 检查是否已存在
-                result = await self.db.execute(
-                    select(StockDailyData).where(
-                        and_(
-                            StockDailyData.stock_id == stock.id,
-                            StockDailyData.date == self._parse_date(data['trade_date'])
-                        )
+            rows = [
+                self._build_daily_row(stock.id, data, indicator_map.get(data['trade_date'], {}))
+                for data in daily_data
+            ]
+            
+            if bulk:
+                inserted, updated = await self.upsert_daily_rows(rows)
+            else:
+                inserted, updated = await self._save_daily_rows_per_row(rows)
+            
+            if rows:
+                await self._advance_watermarks(
+                    'daily', {stock.id: max(row['date'] for row in rows)}
+                )
+            if incremental:
+                # 增量区间已完整拉取：区间内没有数据的交易日（停牌）确认为无数据。
+                # 当天数据可能尚未发布，最多确认到昨天
+                checked = min(self._parse_date(end_date).date(), date.today() - timedelta(days=1))
+                await self._advance_watermarks(
+                    'daily', {stock.id: checked}, column='last_checked_date'
+                )
+            
+            await self.db.commit()
+            if rows:
+                await response_cache.purge(stock_namespace(stock_code))
+            
+            logger.info(f"同步 {stock_code} 日线数据完成，新增 {inserted} 条，更新 {updated} 条")
+            return inserted + updated
+        
+        except Exception as e:
+            logger.error(f"同步 {stock_code} 日线数据失败：{e}")
+            await self.db.rollback()
+            raise
+    
+    async def upsert_daily_rows(self, rows: List[Dict]) -> Tuple[int, int]:
+        """
+        批量 upsert 日线数据（不提交事务）
+        
+        每批一条 INSERT ... ON CONFLICT (stock_id, date) DO UPDATE，
+        替代逐行 SELECT 再更新 ORM 对象的写法
+        
+        Args:
+            rows: 日线数据行
+        
+        Returns:
+            (新增条数, 更新条数)
+        """
+        # 同一语句内不能两次命中同一冲突键，按 (stock_id, date) 去重并保留最后一条
+        rows = list({(row['stock_id'], row['date']): row for row in rows}.values())
+        await ensure_partitions(self.db, {row['date'].year for row in rows})
+        
+        inserted = 0
+        updated = 0
+        for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[i:i + UPSERT_BATCH_SIZE]
+            result = await self.db.execute(build_daily_upsert(batch))
+            flags = result.scalars().all()
+            batch_inserted = sum(1 for flag in flags if flag)
+            inserted += batch_inserted
+            updated += len(flags) - batch_inserted
+        
+        return inserted, updated
+    
+    async def _save_daily_rows_per_row(self, rows: List[Dict]) -> Tuple[int, int]:
+        """
+        逐行写入日线数据（不提交事务）
+        
+        每条数据一次 SELECT，保留用于基准对比
+        
+        Returns:
+            (新增条数, 更新条数)
+        """
+        inserted = 0
+        updated = 0
+        for row in rows:
+            # 检查是否已存在
+            result = await self.db.execute(
+                select(StockDailyData).where(
+                    and_(
+                        StockDailyData.stock_id == row['stock_id'],
+                        StockDailyData.date == row['date']
                     )
                 )
-                daily = result.scalar_one_or_none()
-                
-                # 获取当日指标
-                ind = indicator_map.get(data['trade_date'], {})
-                
-                if daily:
-                    # 更新
-                    daily.open = data['open']
-                    daily.high = data['high']
-                    daily.low = data['low']
-                    daily.close = data['close']
-                    daily.volume = data['vol']
-                    daily.amount = data['amount']
-                    daily.pe_ttm = ind.get('pe_ttm')
-                    daily.pb = ind.get('pb')
-                    daily.dividend_yield = ind.get('dv_ratio')
-                else:
-                    # 创建
-                    daily = StockDailyData(
-                        stock_id=stock.id,
-                        date=self._parse_date(data['trade_date']),
-                        open=data['open'],
-                        high=data['high'],
-                        low=data['low'],
-                        close=data['close'],
-                        volume=data['vol'],
-                        amount=data['amount'],
-                        pe_ttm=ind.get('pe_ttm'),
-                        pb=ind.get('pb'),
-                        dividend_yield=ind.get('dv_ratio'),
+            )
+            daily = result.scalar_one_or_none()
+            
+            if daily:
+                # 更新
+                for col in DAILY_UPDATE_COLUMNS:
+                    setattr(daily, col, row[col])
+                updated += 1
+            else:
+                # 创建
+                self.db.add(StockDailyData(**row))
+                inserted += 1
+        
+        return inserted, updated
+    
+    def _build_daily_row(self, stock_id: str, data: Dict, ind: Dict) -> Dict:
+        """合并 Tushare 日线数据和当日指标为一行"""
+        return {
+            'stock_id': stock_id,
+            'date': self._parse_date(data['trade_date']).date(),
+            'open': data['open'],
+            'high': data['high'],
+            'low': data['low'],
+            'close': data['close'],
+            'volume': data['vol'],
+            'amount': data['amount'],
+            'pe_ttm': ind.get('pe_ttm'),
+            'pb': ind.get('pb'),
+            'dividend_yield': ind.get('dv_ratio'),
+            'total_mv': ind.get('total_mv'),
+        }
+    
+    async def _incremental_start_date(self, stock: StockRef, end_date: str) -> Optional[str]:
+        """
+        根据同步水位计算日线增量同步的开始日期
+        
+        无水位时回退为最近 1 年；有水位时从最后同步日和最后确认日中较晚者的次日开始
+        （停牌期间没有数据，不会反复请求同一段区间），
+        并对照交易日历检查水位前 SYNC_GAP_LOOKBACK_DAYS 天内、尚未确认过的缺口，有缺口则从最早的缺口开始
+        
+        Returns:
+            开始日期 (YYYYMMDD)，已是最新时返回 None
+        """
+        end = self._parse_date(end_date).date()
+        watermark = await self._get_watermark(stock.id, 'daily')
+        last = watermark.last_trade_date if watermark else None
+        checked = watermark.last_checked_date if watermark else None
+        if not last and not checked:
+            return (end - timedelta(days=365)).strftime('%Y%m%d')
+        
+        start = max(day for day in (last, checked) if day) + timedelta(days=1)
+        
+        if last:
+            window_start = last - timedelta(days=settings.SYNC_GAP_LOOKBACK_DAYS)
+            if checked:
+                window_start = max(window_start, checked + timedelta(days=1))
+            if stock.listed_date:
+                window_start = max(window_start, stock.listed_date)
+            gaps = await self._find_daily_gaps(stock.id, window_start, last) if window_start <= last else []
+            if gaps:
+                logger.info(f"{stock.code} 发现 {len(gaps)} 个缺失交易日，从 {gaps[0]} 开始回补")
+                start = gaps[0]
+        
+        # 区间内没有交易日（周末、节假日）时无需请求
+        if start > end or not await self.calendar.trading_days(start, end):
+            return None
+        return start.strftime('%Y%m%d')
+    
+    async def _find_daily_gaps(self, stock_id: str, start: date, end: date) -> List[date]:
+        """对照交易日历找出区间内缺失日线数据的交易日"""
+        trade_days = await self.calendar.trading_days(start, end)
+        if not trade_days:
+            return []
+        
+        result = await self.db.execute(
+            select(StockDailyData.date).where(
+                StockDailyData.stock_id == stock_id,
+                StockDailyData.date >= start,
+                StockDailyData.date <= end,
+            )
+        )
+        existing = set(result.scalars().all())
+        return [day for day in trade_days if day not in existing]
+    
+    async def _get_watermark(self, stock_id: str, dataset: str) -> Optional[StockSyncState]:
+        """获取同步水位"""
+        result = await self.db.execute(
+            select(StockSyncState).where(
+                StockSyncState.stock_id == stock_id,
+                StockSyncState.dataset == dataset,
+            )
+        )
+        return result.scalar_one_or_none()
+    
+    async def _advance_watermarks(
+        self,
+        dataset: str,
+        marks: Dict[str, date],
+        column: Optional[str] = None,
+    ) -> None:
+        """
+        批量推进同步水位（不提交事务）
+        
+        使用 GREATEST 保证水位只前进不后退（如回补历史区间时）
+        
+        Args:
+            dataset: 数据集 daily/financials
+            marks: 股票 ID -> 本次同步到的最新日期
+            column: 水位字段，默认 WATERMARK_COLUMNS[dataset]
+        """
+        if not marks:
+            return
+        
+        column = column or WATERMARK_COLUMNS[dataset]
+        table = StockSyncState.__table__
+        rows = [
+            {'id': str(uuid.uuid4()), 'stock_id': stock_id, 'dataset': dataset, column: day}
+            for stock_id, day in marks.items()
+        ]
+        for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+            stmt = pg_insert(table).values(rows[i:i + UPSERT_BATCH_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                constraint='uq_sync_state_stock_dataset',
+                set_={
+                    column: func.greatest(table.c[column], stmt.excluded[column]),
+                    'updated_at': func.now(),
+                },
+            )
+            await self.db.execute(stmt)
+    
+    async def sync_market_daily(self, trade_date: str) -> int:
+        """
+        按交易日同步全市场日线数据（截面模式）
+        
+        daily 和 daily_basic 接口只传 trade_date 时各返回当日全部股票，
+        两次请求即可替代逐只股票的循环
+        
+        Args:
+            trade_date: 交易日期 (YYYYMMDD)
+        
+        Returns:
+            同步的数据条数（0 表示非交易日或当日数据尚未发布）
+        
+        Raises:
+            Exception: 拉取或写入失败（已回滚），定时任务据此重试
+        """
+        try:
+            if not await self.calendar.is_trading_day(self._parse_date(trade_date).date()):
+                logger.info(f"{trade_date} 非交易日，跳过")
+                return 0
+            
+            daily_data = await tushare_service.get_market_daily(trade_date)
+            if not daily_data:
+                logger.info(f"{trade_date} 无日线数据（尚未更新）")
+                return 0
+            
+            indicators = await tushare_service.get_daily_basic(trade_date=trade_date)
+            indicator_map = {ind['ts_code']: ind for ind in indicators}
+            
+            stock_ids = await self._load_stock_id_map()
+            
+            rows = []
+            unknown = 0
+            for data in daily_data:
+                stock_id = stock_ids.get(data['ts_code'].split('.')[0])
+                if not stock_id:
+                    # 股票列表中不存在（如新股尚未同步），跳过
+                    unknown += 1
+                    continue
+                rows.append(
+                    self._build_daily_row(stock_id, data, indicator_map.get(data['ts_code'], {}))
+                )
+            
+            inserted, updated = await self.upsert_daily_rows(rows)
+            await self._advance_watermarks(
+                'daily', {row['stock_id']: row['date'] for row in rows}
+            )
+            await self.db.commit()
+            if rows:
+                await response_cache.purge('stock')
+            
+            logger.info(
+                f"同步 {trade_date} 全市场日线数据完成，新增 {inserted} 条，更新 {updated} 条，"
+                f"未知股票 {unknown} 只"
+            )
+            return inserted + updated
+        
+        except Exception as e:
+            logger.error(f"同步 {trade_date} 全市场日线数据失败：{e}")
+            await self.db.rollback()
+            raise
+    
+    async def backfill_market_daily(self, start_date: str, end_date: str) -> int:
+        """
+        按日期循环回补全市场日线数据
+        
+        每个交易日两次请求，回补 N 天只需 2N 次请求（与股票数量无关）
+        
+        Args:
+            start_date: 开始日期 (YYYYMMDD)
+            end_date: 结束日期 (YYYYMMDD)
+        
+        Returns:
+            同步的数据条数
+        
+        Raises:
+            Exception: 任一交易日同步失败（之前的交易日已提交，重跑时按 upsert 覆盖）
+        """
+        trade_days = await self.calendar.trading_days(
+            self._parse_date(start_date).date(),
+            self._parse_date(end_date).date()
+        )
+        
+        total = 0
+        for day in trade_days:
+            total += await self.sync_market_daily(day.strftime('%Y%m%d'))
+        
+        logger.info(f"回补 {start_date} - {end_date} 全市场日线数据完成，共 {total} 条")
+        return total
+    
+    async def backfill_daily_indicators(
+        self,
+        stock_code: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> int:
+        """
+        回补日线数据中缺失的 PE/PB/股息率（不重新拉取行情）
+        
+        以 pb 为空作为缺失标记：指定股票时按区间请求一次 daily_basic，
+        否则按缺失日期逐日请求全市场 daily_basic
+        
+        Args:
+            stock_code: 股票代码（可选，默认全市场）
+            start_date: 开始日期 (YYYYMMDD)
+            end_date: 结束日期 (YYYYMMDD)
+        
+        Returns:
+            修复的数据条数
+        """
+        try:
+            conditions = [StockDailyData.pb.is_(None)]
+            if start_date:
+                conditions.append(StockDailyData.date >= self._parse_date(start_date).date())
+            if end_date:
+                conditions.append(StockDailyData.date <= self._parse_date(end_date).date())
+            
+            stock_ids = await self._load_stock_id_map()
+            if stock_code:
+                if stock_code not in stock_ids:
+                    logger.warning(f"股票 {stock_code} 不存在")
+                    return 0
+                conditions.append(StockDailyData.stock_id == stock_ids[stock_code])
+            
+            # 一次查询加载全部缺失指标的 (stock_id, date)
+            result = await self.db.execute(
+                select(StockDailyData.stock_id, StockDailyData.date).where(*conditions)
+            )
+            missing = set(result.all())
+            if not missing:
+                return 0
+            
+            repaired = 0
+            if stock_code:
+                dates = [day for _, day in missing]
+                indicators = await tushare_service.get_daily_basic(
+                    ts_code=self._convert_ts_code(stock_code),
+                    start_date=min(dates).strftime('%Y%m%d'),
+                    end_date=max(dates).strftime('%Y%m%d')
+                )
+                repaired = await self._update_daily_indicators(indicators, stock_ids, missing)
+            else:
+                for day in sorted({day for _, day in missing}):
+                    indicators = await tushare_service.get_daily_basic(
+                        trade_date=day.strftime('%Y%m%d')
                     )
-                    self.db.add(daily)
-                
-                count += 1
+                    repaired += await self._update_daily_indicators(indicators, stock_ids, missing)
             
             await self.db.commit()
-            logger.info(f"同步 {stock_code} 日线数据完成，共 {count} 条")
-            return count
+            if repaired:
+                self.repaired_range = (min(day for _, day in missing), max(day for _, day in missing))
+                await response_cache.purge(stock_namespace(stock_code) if stock_code else 'stock')
             
+            logger.info(f"回补每日指标完成，共修复 {repaired} 条")
+            return repaired
+        
         except Exception as e:
-            logger.error(f"同步 {stock_code} 日线数据失败：{e}")
+            logger.error(f"回补每日指标失败：{e}")
             await self.db.rollback()
             return 0
     
+    async def _update_daily_indicators(
+        self,
+        indicators: List[Dict],
+        stock_ids: Dict[str, str],
+        missing: set
+    ) -> int:
+        """按 (stock_id, date) 批量更新缺失指标的日线数据（executemany）"""
+        params = []
+        for ind in indicators:
+            stock_id = stock_ids.get(ind['ts_code'].split('.')[0])
+            trade_date = self._parse_date(ind['trade_date']).date()
+            if (stock_id, trade_date) not in missing:
+                continue
+            params.append({
+                'b_stock_id': stock_id,
+                'b_date': trade_date,
+                'b_pe_ttm': ind.get('pe_ttm'),
+                'b_pb': ind.get('pb'),
+                'b_dividend_yield': ind.get('dv_ratio'),
+                'b_total_mv': ind.get('total_mv'),
+            })
+        
+        if not params:
+            return 0
+        
+        table = StockDailyData.__table__
+        stmt = (
+            update(table)
+            .where(
+                and_(
+                    table.c.stock_id == bindparam('b_stock_id'),
+                    table.c.date == bindparam('b_date'),
+                    table.c.pb.is_(None),
+                )
+            )
+            .values(
+                pe_ttm=bindparam('b_pe_ttm'),
+                pb=bindparam('b_pb'),
+                dividend_yield=bindparam('b_dividend_yield'),
+                total_mv=bindparam('b_total_mv'),
+            )
+        )
+        for i in range(0, len(params), UPSERT_BATCH_SIZE):
+            await self.db.execute(stmt, params[i:i + UPSERT_BATCH_SIZE])
+        
+        return len(params)
+    
+    async def _load_stock_id_map(self) -> Dict[str, str]:
+        """一次查询加载 股票代码 -> 股票 ID 映射"""
+        result = await self.db.execute(select(Stock.code, Stock.id))
+        return {code: stock_id for code, stock_id in result.all()}
+    
     async def sync_financials(self, stock_code: str) -> int:
         """
         同步财务数据
@@ -182,22 +657,31 @@ class StockDataSyncService:
             stock_code: 股票代码
             
         Returns:
-            同步的数据条数
+            同步的数据条数（0 表示无新数据）
+        
+        Raises:
+            Exception: 拉取或写入失败（已回滚），并发同步据此计入失败
         """
         try:
             # 获取股票
-            result = await self.db.execute(
-                select(Stock).where(Stock.code == stock_code)
-            )
-            stock = result.scalar_one_or_none()
+            stock = await stock_registry.resolve(self.db, stock_code)
             
             if not stock:
                 logger.warning(f"股票 {stock_code} 不存在")
                 return 0
             
+            # fina_indicator 的 start_date 按公告日期过滤：有水位时从最后同步的公告日（含当天的更正公告）开始。
+            # 旧水位只有报告期时以报告期为下界（公告日总晚于报告期末）
+            watermark = await self._get_watermark(stock.id, 'financials')
+            start_date = None
+            if watermark:
+                since = watermark.last_ann_date or watermark.last_report_date
+                start_date = since.strftime('%Y%m%d') if since else None
+            
             # 从 Tushare 获取财务指标
             fina_indicators = await tushare_service.get_fina_indicator(
-                ts_code=self._convert_ts_code(stock_code)
+                ts_code=self._convert_ts_code(stock_code),
+                start_date=start_date
             )
             
             count = 0
@@ -234,14 +718,29 @@ class StockDataSyncService:
                 
                 count += 1
             
+            if fina_indicators:
+                await self._advance_watermarks('financials', {
+                    stock.id: max(self._parse_date(ind['end_date']).date() for ind in fina_indicators)
+                })
+                ann_dates = [
+                    self._parse_date(ind['ann_date']).date() for ind in fina_indicators if ind['ann_date']
+                ]
+                if ann_dates:
+                    await self._advance_watermarks(
+                        'financials', {stock.id: max(ann_dates)}, column='last_ann_date'
+                    )
+            
             await self.db.commit()
+            if count:
+                await response_cache.purge(stock_namespace(stock_code))
+            
             logger.info(f"同步 {stock_code} 财务数据完成，共 {count} 条")
             return count
             
         except Exception as e:
             logger.error(f"同步 {stock_code} 财务数据失败：{e}")
             await self.db.rollback()
-            return 0
+            raise
     
     def _convert_market(self, market: str) -> str:
         """转换市场类型"""
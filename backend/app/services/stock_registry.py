@@ -0,0 +1,161 @@
+# 股票代码注册表（进程内 LRU）
+
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.stock import Stock
+from app.services.stock_suggest import get_stock_list_version
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StockRef:
+    """股票基础信息（代码解析结果）"""
+    id: str
+    code: str
+    name: str
+    market: str
+    industry: Optional[str]
+    listed_date: Optional[date]
+    status: str
+
+
+STOCK_REF_COLUMNS = (
+    Stock.id, Stock.code, Stock.name, Stock.market,
+    Stock.industry, Stock.listed_date, Stock.status,
+)
+
+
+class StockRegistry:
+    """
+    股票代码 -> ID/基础信息 的有界 LRU 缓存（带 TTL）
+    
+    启动时预热，本进程 sync_stock_list 变更后立即失效；其他进程（如 Celery worker）的变更
+    通过股票列表版本（与搜索联想索引相同）传播：resolve 时每隔 STOCK_REGISTRY_VERSION_CHECK 秒
+    查询一次版本，变化时清空缓存
+    """
+    
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        ttl: Optional[float] = None,
+        version_check: Optional[float] = None,
+    ):
+        self.maxsize = maxsize or settings.STOCK_REGISTRY_SIZE
+        self.ttl = ttl or settings.STOCK_REGISTRY_TTL
+        self.version_check = (
+            settings.STOCK_REGISTRY_VERSION_CHECK if version_check is None else version_check
+        )
+        self._entries: "OrderedDict[str, Tuple[float, StockRef]]" = OrderedDict()
+        self.version: Optional[str] = None
+        self._checked_at = 0.0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, code: str) -> Optional[StockRef]:
+        """读取缓存（过期返回 None）"""
+        entry = self._entries.get(code)
+        if entry is None:
+            return None
+        
+        expires_at, ref = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[code]
+            return None
+        
+        self._entries.move_to_end(code)
+        return ref
+    
+    def put(self, ref: StockRef) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        self._entries[ref.code] = (time.monotonic() + self.ttl, ref)
+        self._entries.move_to_end(ref.code)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        """到检查间隔时比较股票列表版本，其他进程修改过股票列表则清空缓存"""
+        if time.monotonic() - self._checked_at < self.version_check:
+            return
+        
+        version = await get_stock_list_version(db)
+        if version != self.version:
+            if self.version is not None:
+                logger.info("股票列表版本变化，清空股票注册表")
+            self._entries.clear()
+            self.version = version
+        self._checked_at = time.monotonic()
+    
+    async def resolve(self, db: AsyncSession, code: str) -> Optional[StockRef]:
+        """按代码解析股票，未命中时查询数据库（股票不存在不缓存）"""
+        await self.ensure_fresh(db)
+        ref = self.get(code)
+        if ref is not None:
+            return ref
+        
+        result = await db.execute(select(*STOCK_REF_COLUMNS).where(Stock.code == code))
+        row = result.one_or_none()
+        if row is None:
+            return None
+        
+        ref = StockRef(*row)
+        self.put(ref)
+        return ref
+    
+    async def resolve_many(self, db: AsyncSession, codes: List[str]) -> Dict[str, StockRef]:
+        """批量解析股票，未命中的代码合并为一次查询"""
+        await self.ensure_fresh(db)
+        refs = {}
+        missing = []
+        for code in dict.fromkeys(codes):
+            ref = self.get(code)
+            if ref is not None:
+                refs[code] = ref
+            else:
+                missing.append(code)
+        
+        if missing:
+            result = await db.execute(select(*STOCK_REF_COLUMNS).where(Stock.code.in_(missing)))
+            for row in result.all():
+                ref = StockRef(*row)
+                self.put(ref)
+                refs[ref.code] = ref
+        return refs
+    
+    async def warm(self, db: AsyncSession) -> int:
+        """预热：一次查询加载全部未退市股票"""
+        await self.ensure_fresh(db)
+        result = await db.execute(
+            select(*STOCK_REF_COLUMNS)
+            .where(Stock.status != 'delisted')
+            .limit(self.maxsize)
+        )
+        count = 0
+        for row in result.all():
+            self.put(StockRef(*row))
+            count += 1
+        
+        logger.info(f"股票注册表预热完成，共 {count} 只股票")
+        return count
+    
+    def invalidate(self, code: Optional[str] = None) -> None:
+        """失效单只股票，默认清空（并在下次 resolve 时重新读取版本）"""
+        if code is None:
+            self._entries.clear()
+            self._checked_at = 0.0
+        else:
+            self._entries.pop(code, None)
+
+
+# 全局实例
+stock_registry = StockRegistry()
@@ -1,10 +1,111 @@
+import base64
+import json
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, cast, case, literal, or_, tuple_, Float
 from typing import Optional, Tuple, List, Dict
-from datetime import datetime, timedelta
-from app.models.stock import Stock, StockDailyData, StockFinancial
+from datetime import date, timedelta
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.models.stock import Stock, StockDailyData, StockFinancial, StockValuationSnapshot
 from app.schemas.stock import StockResponse, StockIndicators
+from app.services.bar_store import bar_store
 from app.services.indicator_calculator import indicator_calculator
+from app.services.stock_registry import StockRef, stock_registry
+from app.services.valuation_snapshot import build_snapshot_select
+from app.utils.columnar import DAILY_COLUMNS, arrow_available
+
+
+def encode_cursor(rank: int, code: str) -> str:
+    """编码分页游标（最后一条的相关度和代码）"""
+    return base64.urlsafe_b64encode(json.dumps([rank, code]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """
+    解码分页游标
+    
+    Raises:
+        ValueError: 游标格式错误
+    """
+    try:
+        rank, code = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(rank), str(code)
+    except (ValueError, TypeError) as e:
+        raise ValueError("无效的分页游标") from e
+
+
+def build_stock_search_query(
+    search: Optional[str] = None,
+    market: Optional[str] = None,
+    after: Optional[Tuple[int, str]] = None,
+):
+    """
+    构建股票搜索查询（按相关度、代码排序）
+    
+    Args:
+        search: 关键词，匹配代码、名称、拼音首字母
+        market: 市场过滤
+        after: 键集分页位置 (相关度, 代码)，只返回排在其后的股票
+    
+    Returns:
+        (查询, 相关度表达式)
+    """
+    if search and search.strip():
+        keyword = search.strip()
+        abbr = keyword.upper()
+        rank = case(
+            (Stock.code == keyword, 0),
+            (Stock.code.startswith(keyword, autoescape=True), 1),
+            (Stock.pinyin_abbr.startswith(abbr, autoescape=True), 2),
+            (Stock.name.startswith(keyword, autoescape=True), 3),
+            else_=4,
+        )
+        condition = or_(
+            Stock.code.contains(keyword, autoescape=True),
+            Stock.name.icontains(keyword, autoescape=True),
+            Stock.pinyin_abbr.startswith(abbr, autoescape=True),
+        )
+    else:
+        rank = literal(0)
+        condition = None
+    
+    query = select(Stock, rank.label('rank'))
+    if condition is not None:
+        query = query.where(condition)
+    if market:
+        query = query.where(Stock.market == market)
+    if after is not None:
+        query = query.where(tuple_(rank, Stock.code) > tuple_(*after))
+    return query.order_by(rank, Stock.code), rank
+
+
+# 单只股票的热点日线查询：只读取覆盖主键 stock_daily_data_pkey 包含的列，
+# 表已 VACUUM 时为仅索引扫描，不回表
+LATEST_BAR_COLUMNS = ('date', 'close', 'pe_ttm', 'pb', 'dividend_yield')
+
+
+def build_latest_bar_query(stock_id: str):
+    """最新一条日线"""
+    return (
+        select(*(getattr(StockDailyData, name) for name in LATEST_BAR_COLUMNS))
+        .where(StockDailyData.stock_id == stock_id)
+        .order_by(StockDailyData.date.desc())
+        .limit(1)
+    )
+
+
+def build_history_query(stock_id: str, column: str, days: int = 3650):
+    """统计窗口内某个估值字段的有效历史值（大于 0）"""
+    field = getattr(StockDailyData, column)
+    return (
+        select(field)
+        .where(
+            StockDailyData.stock_id == stock_id,
+            StockDailyData.date >= date.today() - timedelta(days=days),
+            field > 0,
+        )
+    )
 
 
 class StockService:
@@ -19,29 +120,48 @@ class StockService:
         market: Optional[str] = None,
         page: int = 1,
         page_size: int = 20,
-    ) -> Tuple[List[Stock], int]:
-        """获取股票列表"""
-        query = select(Stock)
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Stock], int, Optional[str]]:
+        """
+        获取股票列表 / 搜索股票
         
-        if search:
-            query = query.where(
-                (Stock.code.ilike(f"%{search}%")) | (Stock.name.ilike(f"%{search}%"))
-            )
+        按相关度排序（代码精确 > 代码前缀 > 拼音首字母前缀 > 名称前缀 > 名称/代码包含），
+        同一相关度内按代码排序。传入 cursor 时按键集分页（不扫描前面的页），否则按 page 偏移
         
-        if market:
-            query = query.where(Stock.market == market)
+        Returns:
+            (股票列表, 总数（缓存值）, 下一页游标)
+        """
+        after = decode_cursor(cursor) if cursor else None
+        query, _ = build_stock_search_query(search, market, after)
         
-        # 获取总数
-        count_query = select(func.count()).select_from(query.subquery())
-        total_result = await self.db.execute(count_query)
-        total = total_result.scalar()
+        if after is None:
+            query = query.offset((page - 1) * page_size)
+        result = await self.db.execute(query.limit(page_size + 1))
+        rows = result.all()
         
-        # 分页
-        query = query.offset((page - 1) * page_size).limit(page_size)
-        result = await self.db.execute(query)
-        stocks = result.scalars().all()
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            next_cursor = encode_cursor(last.rank, last.Stock.code)
         
-        return stocks, total
+        total = await self._count_stocks(search, market)
+        return [row.Stock for row in rows], total, next_cursor
+    
+    async def _count_stocks(self, search: Optional[str], market: Optional[str]) -> int:
+        """总数走响应缓存（股票列表变化时随 stock 命名空间清除），翻页和连续输入不再重复 count"""
+        async def _load():
+            query, _ = build_stock_search_query(search, market)
+            result = await self.db.execute(
+                select(func.count()).select_from(query.order_by(None).subquery())
+            )
+            return result.scalar()
+        
+        return await response_cache.get_or_set(
+            response_cache.build_key("stock", "count", {"q": search, "market": market}),
+            _load,
+            ttl=settings.CACHE_ROUTE_TTLS["search_count"],
+        )
     
     async def get_stock_by_code(self, code: str) -> Optional[Stock]:
         """获取股票详情"""
@@ -55,7 +175,11 @@ class StockService:
         end_date: Optional[str] = None,
     ) -> List[dict]:
         """获取日线数据"""
-        query = select(StockDailyData).join(Stock).where(Stock.code == code)
+        stock = await stock_registry.resolve(self.db, code)
+        if not stock:
+            return []
+        
+        query = select(StockDailyData).where(StockDailyData.stock_id == stock.id)
         
         if start_date:
             query = query.where(StockDailyData.date >= start_date)
@@ -80,20 +204,125 @@ class StockService:
             for d in data
         ]
     
+    async def get_daily_columns(
+        self,
+        code: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+    ) -> Optional[Dict[str, list]]:
+        """
+        获取列式日线数据（图表用）
+        
+        按日期升序返回每个字段一个数组，数值在 SQL 中转为浮点，不逐行构建对象
+        
+        Returns:
+            列名 -> 值数组，股票不存在时返回 None
+        """
+        stock = await stock_registry.resolve(self.db, code)
+        if not stock:
+            return None
+        
+        if settings.BAR_STORE_SERVE_READS and arrow_available():
+            # 未指定开始日期时需要上市以来的全部历史，只有请求区间的年份都已导出才读 Parquet
+            start = date.fromisoformat(start_date) if start_date else stock.listed_date
+            end = min(date.fromisoformat(end_date), date.today()) if end_date else date.today()
+            if start and start <= end and bar_store.covers(stock.market, start, end):
+                columns = bar_store.read_stock(code, start, end)
+                if columns is not None:
+                    return columns
+        
+        query = select(
+            StockDailyData.date,
+            *(cast(getattr(StockDailyData, name), Float) for name in DAILY_COLUMNS[1:]),
+        ).where(StockDailyData.stock_id == stock.id)
+        
+        if start_date:
+            query = query.where(StockDailyData.date >= start_date)
+        if end_date:
+            query = query.where(StockDailyData.date <= end_date)
+        
+        result = await self.db.execute(query.order_by(StockDailyData.date))
+        rows = result.all()
+        
+        columns = [list(values) for values in zip(*rows)] if rows else [[] for _ in DAILY_COLUMNS]
+        columns[0] = [d.isoformat() for d in columns[0]]
+        return dict(zip(DAILY_COLUMNS, columns))
+    
     async def get_indicators(self, code: str) -> Optional[StockIndicators]:
-        """获取核心指标"""
-        stock = await self.get_stock_by_code(code)
+        """获取核心指标（优先读取估值快照，快照未生成时实时计算）"""
+        stock = await stock_registry.resolve(self.db, code)
         if not stock:
             return None
         
-        # 获取最新日线数据
+        snapshot = await self.db.get(StockValuationSnapshot, stock.id)
+        if not snapshot:
+            return await self._compute_indicators(stock)
+        
+        if not snapshot.close:
+            return None
+        
+        return StockIndicators(
+            code=stock.code,
+            name=stock.name,
+            current_price=snapshot.close,
+            pe_ttm=snapshot.pe_ttm or None,
+            pb=snapshot.pb or None,
+            dividend_yield=snapshot.dividend_yield or None,
+            pe_percentile=snapshot.pe_percentile,
+            pb_percentile=snapshot.pb_percentile,
+            dividend_yield_percentile=snapshot.dividend_yield_percentile,
+            true_money_index=snapshot.true_money_index,
+        )
+    
+    async def get_indicators_batch(self, codes: List[str]) -> Dict[str, StockIndicators]:
+        """
+        批量获取核心指标（自选股列表）
+        
+        查询次数与股票数量无关：一次解析代码（注册表未命中时），一次读取估值快照，
+        快照缺失的股票再用快照同一条集合查询实时计算
+        
+        Returns:
+            代码 -> 指标，不存在或无行情的股票不包含在内
+        """
+        refs = await stock_registry.resolve_many(self.db, codes)
+        if not refs:
+            return {}
+        
+        by_id = {ref.id: ref for ref in refs.values()}
         result = await self.db.execute(
-            select(StockDailyData)
-            .where(StockDailyData.stock_id == stock.id)
-            .order_by(StockDailyData.date.desc())
-            .limit(1)
+            select(StockValuationSnapshot).where(StockValuationSnapshot.stock_id.in_(by_id))
         )
-        daily = result.scalar_one_or_none()
+        rows = {snapshot.stock_id: snapshot for snapshot in result.scalars().all()}
+        
+        missing = [stock_id for stock_id in by_id if stock_id not in rows]
+        if missing:
+            result = await self.db.execute(build_snapshot_select(missing))
+            rows.update({row.stock_id: row for row in result.all()})
+        
+        indicators = {}
+        for stock_id, row in rows.items():
+            if not row.close:
+                continue
+            ref = by_id[stock_id]
+            indicators[ref.code] = StockIndicators(
+                code=ref.code,
+                name=ref.name,
+                current_price=row.close,
+                pe_ttm=row.pe_ttm or None,
+                pb=row.pb or None,
+                dividend_yield=row.dividend_yield or None,
+                pe_percentile=row.pe_percentile,
+                pb_percentile=row.pb_percentile,
+                dividend_yield_percentile=row.dividend_yield_percentile,
+                true_money_index=row.true_money_index,
+            )
+        return indicators
+    
+    async def _compute_indicators(self, stock: StockRef) -> Optional[StockIndicators]:
+        """实时计算核心指标（加载近 10 年 PE/PB 历史）"""
+        # 获取最新日线数据
+        result = await self.db.execute(build_latest_bar_query(stock.id))
+        daily = result.one_or_none()
         
         if not daily or not daily.close:
             return None
@@ -133,29 +362,15 @@ class StockService:
     
     async def _get_pe_history(self, stock_id: str, days: int = 3650) -> List[float]:
         """获取历史 PE 数据"""
-        cutoff_date = datetime.now() - timedelta(days=days)
-        result = await self.db.execute(
-            select(StockDailyData.pe_ttm)
-            .where(
-                (StockDailyData.stock_id == stock_id) &
-                (StockDailyData.date >= cutoff_date) &
-                (StockDailyData.pe_ttm.isnot(None))
-            )
-        )
-        return [float(row[0]) for row in result.fetchall() if row[0] and row[0] > 0]
+        return await self._get_history(stock_id, 'pe_ttm', days)
     
     async def _get_pb_history(self, stock_id: str, days: int = 3650) -> List[float]:
         """获取历史 PB 数据"""
-        cutoff_date = datetime.now() - timedelta(days=days)
-        result = await self.db.execute(
-            select(StockDailyData.pb)
-            .where(
-                (StockDailyData.stock_id == stock_id) &
-                (StockDailyData.date >= cutoff_date) &
-                (StockDailyData.pb.isnot(None))
-            )
-        )
-        return [float(row[0]) for row in result.fetchall() if row[0] and row[0] > 0]
+        return await self._get_history(stock_id, 'pb', days)
+    
+    async def _get_history(self, stock_id: str, column: str, days: int) -> List[float]:
+        result = await self.db.execute(build_history_query(stock_id, column, days))
+        return [float(row[0]) for row in result.fetchall()]
     
     async def _calculate_true_money_index(self, stock_id: str) -> Optional[float]:
         """计算真钱指数"""
@@ -177,7 +392,7 @@ class StockService:
     
     async def get_financials(self, code: str) -> List[dict]:
         """获取财务数据"""
-        stock = await self.get_stock_by_code(code)
+        stock = await stock_registry.resolve(self.db, code)
         if not stock:
             return []
         
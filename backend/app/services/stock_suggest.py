@@ -0,0 +1,142 @@
+# 股票搜索联想（进程内前缀索引）
+
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.stock import Stock
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_COLUMNS = (Stock.code, Stock.name, Stock.market, Stock.pinyin_abbr)
+
+
+class StockSuggestIndex:
+    """
+    股票代码/名称/拼音首字母前缀索引
+    
+    三组有序键数组，查询时二分定位前缀区间，按 代码精确 > 代码前缀 > 拼音前缀 > 名称前缀
+    的顺序取前 N 条，与 list_stocks 的相关度口径一致。全部约 5,000 只股票常驻内存
+    """
+    
+    def __init__(self):
+        self._entries: List[dict] = []
+        self._codes: List[Tuple[str, int]] = []
+        self._abbrs: List[Tuple[str, int]] = []
+        self._names: List[Tuple[str, int]] = []
+        self.version: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def build(self, rows: Iterable[Tuple[str, str, str, Optional[str]]]) -> None:
+        """由 (code, name, market, pinyin_abbr) 构建索引"""
+        entries, codes, abbrs, names = [], [], [], []
+        for i, (code, name, market, abbr) in enumerate(rows):
+            entries.append({'code': code, 'name': name, 'market': market, 'pinyin_abbr': abbr})
+            codes.append((code, i))
+            names.append((name.lower(), i))
+            if abbr:
+                abbrs.append((abbr.upper(), i))
+        
+        self._entries = entries
+        self._codes, self._abbrs, self._names = sorted(codes), sorted(abbrs), sorted(names)
+    
+    @staticmethod
+    def _prefix(keys: List[Tuple[str, int]], prefix: str) -> Iterable[Tuple[str, int]]:
+        """依次产出以 prefix 开头的键"""
+        for position in range(bisect_left(keys, (prefix,)), len(keys)):
+            if not keys[position][0].startswith(prefix):
+                break
+            yield keys[position]
+    
+    def search(self, keyword: str, limit: int = 10) -> List[dict]:
+        """
+        前缀联想
+        
+        Args:
+            keyword: 代码、名称或拼音首字母前缀
+            limit: 最多返回条数
+        
+        Returns:
+            股票列表（code/name/market/pinyin_abbr）
+        """
+        keyword = keyword.strip()
+        if not keyword or limit <= 0:
+            return []
+        
+        results, seen = [], set()
+        
+        def _take(matches: Iterable[Tuple[str, int]]) -> bool:
+            for _, i in matches:
+                if i not in seen:
+                    seen.add(i)
+                    results.append(self._entries[i])
+                    if len(results) >= limit:
+                        return True
+            return False
+        
+        exact = [(code, i) for code, i in self._prefix(self._codes, keyword) if code == keyword]
+        for matches in (
+            exact,
+            self._prefix(self._codes, keyword),
+            self._prefix(self._abbrs, keyword.upper()),
+            self._prefix(self._names, keyword.lower()),
+        ):
+            if _take(matches):
+                break
+        return results
+    
+    async def refresh(self, db: AsyncSession) -> int:
+        """从数据库重建索引（只包含未退市股票）"""
+        version = await get_stock_list_version(db)
+        result = await db.execute(
+            select(*SUGGEST_COLUMNS)
+            .where(Stock.status != 'delisted')
+            .order_by(Stock.code)
+        )
+        self.build(result.all())
+        self.version = version
+        self._checked_at = time.monotonic()
+        
+        logger.info(f"股票联想索引构建完成，共 {len(self)} 只股票")
+        return len(self)
+    
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        """
+        每隔 SUGGEST_INDEX_TTL 秒检查一次股票列表版本，变化时重建；
+        其余请求直接查内存，不访问数据库
+        """
+        if self.version is not None and time.monotonic() - self._checked_at < settings.SUGGEST_INDEX_TTL:
+            return
+        
+        async with self._lock:
+            if self.version is not None and time.monotonic() - self._checked_at < settings.SUGGEST_INDEX_TTL:
+                return
+            
+            if self.version is None or await get_stock_list_version(db) != self.version:
+                await self.refresh(db)
+            self._checked_at = time.monotonic()
+    
+    def invalidate(self) -> None:
+        """使索引在下次请求时重新检查版本（本进程同步股票列表后调用）"""
+        self._checked_at = 0.0
+
+
+async def get_stock_list_version(db: AsyncSession) -> str:
+    """股票列表的数据版本（最后更新时间 + 行数）"""
+    result = await db.execute(select(func.max(Stock.updated_at), func.count()))
+    updated_at, count = result.one()
+    return f"{updated_at.isoformat() if updated_at else ''}:{count}"
+
+
+# 全局实例
+stock_suggest_index = StockSuggestIndex()
@@ -0,0 +1,115 @@
+# 并发同步引擎
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+# 单只股票的同步任务：(数据库会话, 股票代码) -> 同步条数，失败时须抛出异常（返回 0 视为无新数据）
+SyncJob = Callable[[AsyncSession, str], Awaitable[int]]
+
+
+@dataclass
+class SyncSummary:
+    """同步结果汇总"""
+    total: int = 0
+    succeeded: int = 0  # 同步到数据
+    empty: int = 0  # 无新数据（停牌、已是最新等）
+    failed: int = 0  # 抛出异常
+    rows: int = 0
+    elapsed: float = 0.0
+    failed_codes: List[str] = field(default_factory=list)
+    
+    @property
+    def processed(self) -> int:
+        return self.succeeded + self.empty + self.failed
+    
+    @property
+    def stocks_per_sec(self) -> float:
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+    
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+    
+    def __str__(self) -> str:
+        return (
+            f"共 {self.total} 只股票，成功 {self.succeeded}，无数据 {self.empty}，"
+            f"失败 {self.failed}，写入 {self.rows} 条，耗时 {self.elapsed:.1f}s，"
+            f"{self.stocks_per_sec:.2f} 只/秒，{self.rows_per_sec:.0f} 条/秒"
+        )
+
+
+async def run_concurrent_sync(
+    codes: List[str],
+    job: SyncJob,
+    concurrency: Optional[int] = None,
+    progress_every: int = 100,
+) -> SyncSummary:
+    """
+    并发执行逐只股票的同步任务
+    
+    固定数量的 worker 从队列取股票代码，每个 worker 使用独立的数据库会话；
+    单只股票失败只回滚该股票，不影响其他股票。
+    Tushare 请求由 tushare_service 的令牌桶统一限流，并发只用于重叠网络和数据库等待。
+    
+    Args:
+        codes: 股票代码列表
+        job: 单只股票的同步任务
+        concurrency: 并发数，默认 settings.SYNC_CONCURRENCY
+        progress_every: 每处理多少只股票输出一次进度
+    
+    Returns:
+        同步结果汇总
+    """
+    concurrency = concurrency or settings.SYNC_CONCURRENCY
+    summary = SyncSummary(total=len(codes))
+    
+    queue: asyncio.Queue = asyncio.Queue()
+    for code in codes:
+        queue.put_nowait(code)
+    
+    started = time.perf_counter()
+    
+    async def worker():
+        async with async_session_maker() as db:
+            while True:
+                try:
+                    code = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                
+                try:
+                    rows = await job(db, code)
+                    summary.rows += rows
+                    if rows > 0:
+                        summary.succeeded += 1
+                    else:
+                        summary.empty += 1
+                except Exception as e:
+                    summary.failed += 1
+                    summary.failed_codes.append(code)
+                    logger.error(f"同步 {code} 失败：{e}")
+                    await db.rollback()
+                
+                if summary.processed % progress_every == 0:
+                    summary.elapsed = time.perf_counter() - started
+                    logger.info(
+                        f"同步进度 {summary.processed}/{summary.total}，"
+                        f"{summary.stocks_per_sec:.2f} 只/秒，{summary.rows_per_sec:.0f} 条/秒"
+                    )
+    
+    workers = min(concurrency, len(codes))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    
+    summary.elapsed = time.perf_counter() - started
+    logger.info(f"并发同步完成（并发数 {workers}）：{summary}")
+    return summary
@@ -0,0 +1,163 @@
+# 交易日历服务
+
+from datetime import date, datetime, timedelta
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import logging
+import time
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.stock import TradeCalendar
+from app.services.data_sources.tushare_service import tushare_service
+
+logger = logging.getLogger(__name__)
+
+# 进程内缓存：(交易所, 年份) -> 开市日期集合
+_open_days_cache: Dict[Tuple[str, int], FrozenSet[date]] = {}
+
+# 日历不可用时的工作日兜底：(交易所, 年份) -> (过期时间, 工作日集合)
+_fallback_cache: Dict[Tuple[str, int], Tuple[float, FrozenSet[date]]] = {}
+
+
+class TradingCalendar:
+    """
+    交易日历
+    
+    按年加载：进程内缓存 -> 数据库 -> Tushare trade_cal（拉取后落库），
+    日历不可用时退化为按工作日判断，兜底结果缓存 TRADE_CALENDAR_FALLBACK_TTL 秒后再重试，
+    避免并发同步中每次判断都访问数据库和 Tushare。
+    读写日历使用独立的数据库会话，不提交或回滚调用方会话中未提交的写入
+    """
+    
+    def __init__(self, exchange: str = 'SSE'):
+        self.exchange = exchange
+    
+    async def is_trading_day(self, day: Optional[date] = None) -> bool:
+        """判断是否为交易日，默认今天"""
+        day = day or date.today()
+        return day in await self._open_days(day.year)
+    
+    async def trading_days(self, start: date, end: date) -> List[date]:
+        """获取区间内（含两端）的全部交易日"""
+        days = []
+        for year in range(start.year, end.year + 1):
+            days.extend(day for day in await self._open_days(year) if start <= day <= end)
+        return sorted(days)
+    
+    async def previous_trading_day(self, day: Optional[date] = None) -> Optional[date]:
+        """获取不晚于指定日期的最近一个交易日"""
+        day = day or date.today()
+        for year in (day.year, day.year - 1):
+            candidates = [d for d in await self._open_days(year) if d <= day]
+            if candidates:
+                return max(candidates)
+        return None
+    
+    async def refresh(self, start_year: int, end_year: Optional[int] = None) -> int:
+        """
+        从 Tushare 拉取交易日历并落库
+        
+        Args:
+            start_year: 开始年份
+            end_year: 结束年份，默认同 start_year
+        
+        Returns:
+            写入的日历条数
+        """
+        end_year = end_year or start_year
+        calendar = await tushare_service.get_trade_cal(
+            f"{start_year}0101", f"{end_year}1231", exchange=self.exchange
+        )
+        if not calendar:
+            return 0
+        
+        table = TradeCalendar.__table__
+        rows = [
+            {
+                'id': str(uuid.uuid4()),
+                'exchange': self.exchange,
+                'cal_date': datetime.strptime(item['cal_date'], '%Y%m%d').date(),
+                'is_open': item['is_open'],
+            }
+            for item in calendar
+        ]
+        stmt = pg_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint='uq_trade_calendar_date',
+            set_={'is_open': stmt.excluded.is_open},
+        )
+        async with async_session_maker() as db:
+            await db.execute(stmt)
+            await db.commit()
+        
+        for year in range(start_year, end_year + 1):
+            _open_days_cache.pop((self.exchange, year), None)
+            _fallback_cache.pop((self.exchange, year), None)
+        
+        logger.info(f"交易日历 {start_year}-{end_year} 更新完成，共 {len(rows)} 条")
+        return len(rows)
+    
+    async def _open_days(self, year: int) -> FrozenSet[date]:
+        """加载某一年的开市日期"""
+        key = (self.exchange, year)
+        if key in _open_days_cache:
+            return _open_days_cache[key]
+        fallback = _fallback_cache.get(key)
+        if fallback and fallback[0] > time.monotonic():
+            return fallback[1]
+        
+        try:
+            days = await self._load_year(year)
+            if days is None:
+                await self.refresh(year)
+                days = await self._load_year(year)
+        except Exception as e:
+            logger.error(f"加载 {year} 年交易日历失败：{e}")
+            days = None
+        
+        if days is None:
+            logger.warning(f"{year} 年交易日历不可用，按工作日判断")
+            days = _weekdays(year)
+            _fallback_cache[key] = (time.monotonic() + settings.TRADE_CALENDAR_FALLBACK_TTL, days)
+            return days
+        
+        _fallback_cache.pop(key, None)
+        _open_days_cache[key] = days
+        return days
+    
+    async def _load_year(self, year: int) -> Optional[FrozenSet[date]]:
+        """从数据库读取某一年的日历，未覆盖整年时返回 None"""
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(TradeCalendar.cal_date, TradeCalendar.is_open).where(
+                    TradeCalendar.exchange == self.exchange,
+                    TradeCalendar.cal_date >= date(year, 1, 1),
+                    TradeCalendar.cal_date <= date(year, 12, 31),
+                )
+            )
+            rows = result.all()
+        # 日历逐日记录（含休市日），整年应有 365/366 条
+        if len(rows) < (date(year, 12, 31) - date(year, 1, 1)).days + 1:
+            return None
+        return frozenset(cal_date for cal_date, is_open in rows if is_open)
+
+
+def _weekdays(year: int) -> FrozenSet[date]:
+    """某一年的全部工作日（日历不可用时的兜底）"""
+    day = date(year, 1, 1)
+    days = set()
+    while day.year == year:
+        if day.weekday() < 5:
+            days.add(day)
+        day += timedelta(days=1)
+    return frozenset(days)
+
+
+def clear_calendar_cache() -> None:
+    """清空进程内交易日历缓存"""
+    _open_days_cache.clear()
+    _fallback_cache.clear()
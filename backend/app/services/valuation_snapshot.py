@@ -0,0 +1,214 @@
+# 估值快照服务
+
+from datetime import date, timedelta
+from typing import List, Optional
+import logging
+
+from sqlalchemy import select, func, and_, case, cast, literal_column, Numeric
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import response_cache, stock_namespace
+from app.models.stock import Stock, StockDailyData, StockFinancial, StockValuationSnapshot
+from app.services.screener_snapshot import invalidate_screener_snapshot
+
+logger = logging.getLogger(__name__)
+
+# 百分位统计窗口（天），与 IndicatorCalculator.calculate_percentile 默认一致
+PERCENTILE_WINDOW_DAYS = 3650
+
+# 需要计算百分位的估值字段
+PERCENTILE_COLUMNS = ('pe_ttm', 'pb', 'dividend_yield')
+
+# 快照字段名（估值字段 -> 百分位字段）
+PERCENTILE_FIELDS = {
+    'pe_ttm': 'pe_percentile',
+    'pb': 'pb_percentile',
+    'dividend_yield': 'dividend_yield_percentile',
+}
+
+
+def build_snapshot_select(
+    stock_ids: Optional[List[str]] = None,
+    window_days: int = PERCENTILE_WINDOW_DAYS
+):
+    """
+    构建估值快照查询（一条 SQL 计算全部股票的最新估值和百分位）
+    
+    百分位口径与 IndicatorCalculator.calculate_percentile 一致：
+    窗口内大于 0 的历史值中，严格小于当前值的占比（保留 2 位小数）
+    
+    Args:
+        stock_ids: 股票 ID 列表（可选，默认全部股票）
+        window_days: 百分位统计窗口（天）
+    
+    Returns:
+        查询语句，字段与 stock_valuation_snapshot 一致
+    """
+    daily = StockDailyData.__table__
+    financial = StockFinancial.__table__
+    
+    # 每只股票最新一条日线
+    latest = (
+        select(
+            daily.c.stock_id, daily.c.date, daily.c.close,
+            daily.c.pe_ttm, daily.c.pb, daily.c.dividend_yield, daily.c.total_mv
+        )
+        .distinct(daily.c.stock_id)
+        .order_by(daily.c.stock_id, daily.c.date.desc())
+    )
+    if stock_ids is not None:
+        latest = latest.where(daily.c.stock_id.in_(stock_ids))
+    latest = latest.cte('latest')
+    
+    # 窗口内有效值数量和小于当前值的数量
+    history = daily.alias('history')
+    counts = []
+    for name in PERCENTILE_COLUMNS:
+        valid = history.c[name] > 0
+        counts.append(func.count().filter(valid).label(f'{name}_total'))
+        counts.append(
+            func.count().filter(and_(valid, history.c[name] < latest.c[name])).label(f'{name}_lower')
+        )
+    stats = (
+        select(latest.c.stock_id, *counts)
+        .select_from(latest.join(
+            history,
+            and_(
+                history.c.stock_id == latest.c.stock_id,
+                history.c.date >= date.today() - timedelta(days=window_days),
+            )
+        ))
+        .group_by(latest.c.stock_id, *(latest.c[name] for name in PERCENTILE_COLUMNS))
+        .subquery('stats')
+    )
+    
+    # 每只股票最新一期财务数据
+    latest_financial = (
+        select(
+            financial.c.stock_id, financial.c.report_date, financial.c.revenue,
+            financial.c.net_profit, financial.c.operating_cash_flow, financial.c.roe
+        )
+        .distinct(financial.c.stock_id)
+        .order_by(financial.c.stock_id, financial.c.report_date.desc())
+    )
+    if stock_ids is not None:
+        latest_financial = latest_financial.where(financial.c.stock_id.in_(stock_ids))
+    latest_financial = latest_financial.subquery('latest_financial')
+    
+    # 上年同期财务数据（计算同比增长）
+    prior = financial.alias('prior_financial')
+    prior_condition = and_(
+        prior.c.stock_id == latest_financial.c.stock_id,
+        prior.c.report_date == latest_financial.c.report_date - literal_column("INTERVAL '1 year'"),
+    )
+    
+    percentiles = []
+    for name in PERCENTILE_COLUMNS:
+        total = stats.c[f'{name}_total']
+        percentiles.append(
+            case(
+                (
+                    and_(latest.c[name].isnot(None), latest.c[name] != 0, total > 0),
+                    func.round(cast(stats.c[f'{name}_lower'], Numeric) * 100 / total, 2)
+                ),
+                else_=None
+            ).label(PERCENTILE_FIELDS[name])
+        )
+    
+    true_money_index = case(
+        (
+            and_(latest_financial.c.net_profit != 0, latest_financial.c.operating_cash_flow != 0),
+            latest_financial.c.operating_cash_flow / latest_financial.c.net_profit
+        ),
+        else_=None
+    ).label('true_money_index')
+    
+    revenue_growth = case(
+        (
+            prior.c.revenue > 0,
+            (latest_financial.c.revenue - prior.c.revenue) * 100 / prior.c.revenue
+        ),
+        else_=None
+    ).label('revenue_growth')
+    
+    # 上年同期亏损时按绝对值计算增长率
+    profit_growth = case(
+        (
+            prior.c.net_profit != 0,
+            (latest_financial.c.net_profit - prior.c.net_profit) * 100 / func.abs(prior.c.net_profit)
+        ),
+        else_=None
+    ).label('profit_growth')
+    
+    return (
+        select(
+            latest.c.stock_id,
+            latest.c.date.label('trade_date'),
+            latest.c.close,
+            latest.c.pe_ttm,
+            latest.c.pb,
+            latest.c.dividend_yield,
+            *percentiles,
+            latest.c.total_mv,
+            latest_financial.c.roe,
+            revenue_growth,
+            profit_growth,
+            true_money_index,
+        )
+        .select_from(
+            latest
+            .outerjoin(stats, stats.c.stock_id == latest.c.stock_id)
+            .outerjoin(latest_financial, latest_financial.c.stock_id == latest.c.stock_id)
+            .outerjoin(prior, prior_condition)
+        )
+    )
+
+
+class ValuationSnapshotService:
+    """估值快照服务"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def refresh(self, stock_ids: Optional[List[str]] = None) -> int:
+        """
+        重新计算估值快照并写入 stock_valuation_snapshot
+        
+        每日同步后执行，/stocks/{code}/indicators 直接读取快照
+        
+        Args:
+            stock_ids: 股票 ID 列表（可选，默认全部股票）
+        
+        Returns:
+            更新的股票数量
+        """
+        query = build_snapshot_select(stock_ids)
+        columns = [column.name for column in query.selected_columns]
+        
+        stmt = pg_insert(StockValuationSnapshot.__table__).from_select(columns, query)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['stock_id'],
+            set_={
+                **{name: stmt.excluded[name] for name in columns if name != 'stock_id'},
+                'updated_at': func.now(),
+            },
+        )
+        
+        result = await self.db.execute(stmt)
+        await self.db.commit()
+        invalidate_screener_snapshot()
+        await self._purge_cache(stock_ids)
+        
+        logger.info(f"估值快照更新完成，共 {result.rowcount} 只股票")
+        return result.rowcount
+    
+    async def _purge_cache(self, stock_ids: Optional[List[str]]) -> None:
+        """清除指标接口缓存"""
+        if stock_ids is None:
+            await response_cache.purge('stock')
+            return
+        
+        result = await self.db.execute(select(Stock.code).where(Stock.id.in_(stock_ids)))
+        for code in result.scalars().all():
+            await response_cache.purge(stock_namespace(code))
@@ -1 +1,41 @@
-# Alert Tasks
+# 预警定时任务
+
+from celery import shared_task
+import logging
+
+from app.core.database import async_session_maker
+from app.services.alert_service import AlertService
+from app.services.trading_calendar import TradingCalendar
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='app.tasks.alert_tasks.check_all_alerts')
+def check_all_alerts():
+    """
+    检查全部启用的预警
+    每天收盘同步后执行；休市日行情和估值不变，直接跳过
+    """
+    logger.info("开始检查预警...")
+    
+    try:
+        import asyncio
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    
+    async def _check():
+        if not await TradingCalendar().is_trading_day():
+            logger.info("今天不是交易日，跳过预警检查")
+            return None
+        
+        async with async_session_maker() as db:
+            return await AlertService(db).check_all_alerts()
+    
+    try:
+        count = loop.run_until_complete(_check())
+        if count is not None:
+            logger.info(f"预警检查完成，触发 {count} 条")
+    except Exception as e:
+        logger.error(f"预警检查失败：{e}")
@@ -1,14 +1,22 @@
 # 数据同步定时任务
 
-from celery import shared_task
+from celery import chain, shared_task
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
 
+from app.core.config import settings
 from app.core.database import async_session_maker
 from app.models.stock import Stock
+from app.services.bar_store import export_bar_store
+from app.services.partition_manager import ensure_upcoming_partitions
+from app.services.price_panel import sync_price_panel
 from app.services.stock_data_sync import StockDataSyncService
+from app.services.sync_engine import run_concurrent_sync
+from app.services.trading_calendar import TradingCalendar
+from app.services.valuation_snapshot import ValuationSnapshotService
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +25,7 @@ logger = logging.getLogger(__name__)
 def sync_stock_list_weekly():
     """
     每周同步股票列表
-    每周一执行
+    每周一执行；休市日交易所不更新上市信息，直接跳过
     """
     logger.info("开始同步股票列表...")
     
@@ -29,6 +37,10 @@ def sync_stock_list_weekly():
         asyncio.set_event_loop(loop)
     
     async def _sync():
+        if not await TradingCalendar().is_trading_day():
+            logger.info("今天不是交易日，跳过股票列表同步")
+            return None
+        
         async with async_session_maker() as db:
             service = StockDataSyncService(db)
             count = await service.sync_stock_list()
@@ -36,16 +48,21 @@ def sync_stock_list_weekly():
     
     try:
         count = loop.run_until_complete(_sync())
-        logger.info(f"股票列表同步完成，共 {count} 只股票")
+        if count is not None:
+            logger.info(f"股票列表同步完成，共 {count} 只股票")
     except Exception as e:
         logger.error(f"股票列表同步失败：{e}")
 
 
-@shared_task(name='tasks.data_sync_tasks.sync_all_daily_data')
-def sync_all_daily_data():
+@shared_task(name='tasks.data_sync_tasks.sync_all_daily_data', time_limit=4 * 3600)
+def sync_all_daily_data(concurrency: int = None):
     """
-    同步所有股票的日线数据
-    每天收盘后执行
+    逐只股票并发同步日线数据（按同步水位增量拉取并回补缺口）
+    
+    受 Tushare 频率限制，全市场需要较长时间，日常同步优先使用 sync_market_daily_data
+    
+    Args:
+        concurrency: 并发数，默认 settings.SYNC_CONCURRENCY
     """
     logger.info("开始同步所有股票日线数据...")
     
@@ -56,44 +73,269 @@ def sync_all_daily_data():
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
     
+    async def _sync_stock(db: AsyncSession, code: str) -> int:
+        service = StockDataSyncService(db)
+        return await service.sync_daily_data(stock_code=code)
+    
     async def _sync():
         async with async_session_maker() as db:
-            # 获取所有股票
-            result = await db.execute(select(Stock))
-            stocks = result.scalars().all()
+            if not await TradingCalendar().is_trading_day():
+                logger.info("今天不是交易日，跳过日线同步")
+                return None
             
-            sync_service = StockDataSyncService(db)
-            total_count = 0
-            success_count = 0
+            # 获取所有未退市股票
+            result = await db.execute(select(Stock.code).where(Stock.status != 'delisted'))
+            codes = result.scalars().all()
+        
+        summary = await run_concurrent_sync(codes, _sync_stock, concurrency=concurrency)
+        
+        if summary.rows:
+            # 逐只同步会回补水位前的缺口（1 月份的缺口可能在上一年），Parquet 和面板从缺口检查窗口开始重写
+            gap_start = (datetime.now() - timedelta(days=settings.SYNC_GAP_LOOKBACK_DAYS)).date()
+            async with async_session_maker() as db:
+                await ValuationSnapshotService(db).refresh()
+                await export_bar_store(db, range(gap_start.year, datetime.now().year + 1))
+                await sync_price_panel(db, start=gap_start)
+        
+        return summary
+    
+    try:
+        summary = loop.run_until_complete(_sync())
+        if summary:
+            logger.info(f"日线数据同步完成：{summary}")
+    except Exception as e:
+        logger.error(f"日线数据同步失败：{e}")
+
+
+# 截面同步失败时抛出异常，由 Celery 延迟重试（upsert 可重复执行）
+MARKET_SYNC_RETRY = dict(autoretry_for=(Exception,), max_retries=3, retry_backoff=300)
+
+
+# 截面同步本身很快，但之后刷新估值快照、导出 Parquet、追加面板会超过默认 5 分钟
+@shared_task(
+    name='tasks.data_sync_tasks.sync_market_daily_data', time_limit=30 * 60, **MARKET_SYNC_RETRY
+)
+def sync_market_daily_data(trade_date: str = None):
+    """
+    按交易日同步全市场日线数据（截面模式）
+    每天收盘后执行，整个市场只需 2 次 Tushare 请求；非交易日直接跳过
+    
+    Args:
+        trade_date: 交易日期 (YYYYMMDD)，默认当天
+    """
+    trade_date = trade_date or datetime.now().strftime('%Y%m%d')
+    logger.info(f"开始同步 {trade_date} 全市场日线数据...")
+    
+    try:
+        import asyncio
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    
+    async def _sync():
+        async with async_session_maker() as db:
+            service = StockDataSyncService(db)
+            count = await service.sync_market_daily(trade_date)
             
-            for stock in stocks:
-                try:
-                    # 同步最近 30 天数据
-                    end_date = datetime.now().strftime('%Y%m%d')
-                    start_date = (datetime.now() - timedelta(days=30)).strftime('%Y%m%d')
-                    
-                    count = await sync_service.sync_daily_data(
-                        stock_code=stock.code,
-                        start_date=start_date,
-                        end_date=end_date
-                    )
-                    
-                    total_count += count
-                    if count > 0:
-                        success_count += 1
-                    
-                    logger.info(f"同步 {stock.code} 完成，{count} 条数据")
-                    
-                except Exception as e:
-                    logger.error(f"同步 {stock.code} 失败：{e}")
+            # 同步后刷新估值快照，导出当年 Parquet 并追加日线面板
+            if count:
+                await ValuationSnapshotService(db).refresh()
+                await export_bar_store(db, [int(trade_date[:4])])
+                day = datetime.strptime(trade_date, '%Y%m%d').date()
+                await sync_price_panel(db, start=day, end=day)
             
-            return total_count, success_count
+            return count
     
     try:
-        total, success = loop.run_until_complete(_sync())
-        logger.info(f"日线数据同步完成，总计 {total} 条，成功 {success} 只股票")
+        count = loop.run_until_complete(_sync())
+    except Exception:
+        logger.exception(f"{trade_date} 全市场日线数据同步失败")
+        raise
+    logger.info(f"{trade_date} 全市场日线数据同步完成，共 {count} 条")
+
+
+def _month_ranges(start_date: str, end_date: str) -> List[Tuple[str, str]]:
+    """把 [start_date, end_date] 按自然月切分（YYYYMMDD）"""
+    start = datetime.strptime(start_date, '%Y%m%d').date()
+    end = datetime.strptime(end_date, '%Y%m%d').date()
+    ranges = []
+    while start <= end:
+        next_month = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        chunk_end = min(end, next_month - timedelta(days=1))
+        ranges.append((start.strftime('%Y%m%d'), chunk_end.strftime('%Y%m%d')))
+        start = next_month
+    return ranges
+
+
+# 单个任务最多回补一个月（约 22 个交易日、44 次 Tushare 请求）及其后处理
+@shared_task(
+    name='tasks.data_sync_tasks.backfill_market_daily_data', time_limit=2 * 3600, **MARKET_SYNC_RETRY
+)
+def backfill_market_daily_data(start_date: str, end_date: str):
+    """
+    按日期循环回补全市场日线数据
+    
+    跨月的区间按月拆成子任务串行执行（chain），每个子任务各自受 time_limit 约束，
+    失败时已完成的月份不受影响
+    
+    Args:
+        start_date: 开始日期 (YYYYMMDD)
+        end_date: 结束日期 (YYYYMMDD)
+    """
+    months = _month_ranges(start_date, end_date)
+    if len(months) > 1:
+        logger.info(f"{start_date} - {end_date} 按月拆分为 {len(months)} 个回补任务")
+        chain(*(backfill_market_daily_data.si(start, end) for start, end in months)).apply_async()
+        return
+    
+    logger.info(f"开始回补 {start_date} - {end_date} 全市场日线数据...")
+    
+    try:
+        import asyncio
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    
+    async def _sync():
+        async with async_session_maker() as db:
+            service = StockDataSyncService(db)
+            count = await service.backfill_market_daily(start_date, end_date)
+            
+            if count:
+                await ValuationSnapshotService(db).refresh()
+                await export_bar_store(db, range(int(start_date[:4]), int(end_date[:4]) + 1))
+                await sync_price_panel(
+                    db,
+                    start=datetime.strptime(start_date, '%Y%m%d').date(),
+                    end=datetime.strptime(end_date, '%Y%m%d').date(),
+                )
+            
+            return count
+    
+    try:
+        count = loop.run_until_complete(_sync())
+    except Exception:
+        # 抛出后本月重试，chain 中后续月份等待本月成功
+        logger.exception(f"{start_date} - {end_date} 全市场日线数据回补失败")
+        raise
+    logger.info(f"全市场日线数据回补完成，共 {count} 条")
+
+
+@shared_task(name='tasks.data_sync_tasks.backfill_daily_indicators')
+def backfill_daily_indicators(stock_code: str = None):
+    """
+    回补日线数据中缺失的 PE/PB/股息率（不重新拉取行情）
+    
+    Args:
+        stock_code: 股票代码（可选，默认全市场）
+    """
+    logger.info(f"开始回补 {stock_code or '全市场'} 每日指标...")
+    
+    try:
+        import asyncio
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    
+    async def _sync():
+        async with async_session_maker() as db:
+            service = StockDataSyncService(db)
+            count = await service.backfill_daily_indicators(stock_code=stock_code)
+            
+            # 修复的是历史日期，重新导出修复区间覆盖的年份，面板按修复区间重写
+            if count:
+                first, last = service.repaired_range
+                await export_bar_store(db, range(first.year, last.year + 1))
+                await sync_price_panel(db, first, last)
+            
+            return count
+    
+    try:
+        count = loop.run_until_complete(_sync())
+        logger.info(f"每日指标回补完成，共修复 {count} 条")
     except Exception as e:
-        logger.error(f"日线数据同步失败：{e}")
+        logger.error(f"每日指标回补失败：{e}")
+
+
+@shared_task(name='tasks.data_sync_tasks.refresh_valuation_snapshot')
+def refresh_valuation_snapshot():
+    """
+    重新计算全市场估值快照（PE/PB/股息率百分位、真钱指数）
+    日线同步任务完成后会自动执行，此任务用于手动重算
+    """
+    logger.info("开始刷新估值快照...")
+    
+    try:
+        import asyncio
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    
+    async def _sync():
+        async with async_session_maker() as db:
+            return await ValuationSnapshotService(db).refresh()
+    
+    try:
+        count = loop.run_until_complete(_sync())
+        logger.info(f"估值快照刷新完成，共 {count} 只股票")
+    except Exception as e:
+        logger.error(f"估值快照刷新失败：{e}")
+
+
+@shared_task(name='tasks.data_sync_tasks.refresh_trade_calendar')
+def refresh_trade_calendar():
+    """
+    刷新本年和下一年的交易日历
+    交易所通常在年底公布次年休市安排，每月执行一次
+    """
+    logger.info("开始刷新交易日历...")
+    
+    try:
+        import asyncio
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    
+    async def _sync():
+        year = datetime.now().year
+        return await TradingCalendar().refresh(year, year + 1)
+    
+    try:
+        count = loop.run_until_complete(_sync())
+        logger.info(f"交易日历刷新完成，共 {count} 条")
+    except Exception as e:
+        logger.error(f"交易日历刷新失败：{e}")
+
+
+@shared_task(name='tasks.data_sync_tasks.ensure_daily_partitions')
+def ensure_daily_partitions():
+    """
+    预建当年和下一年的日线分区
+    跨年前建好分区，新数据不落入默认分区；每月执行一次
+    """
+    logger.info("开始检查日线分区...")
+    
+    try:
+        import asyncio
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    
+    async def _sync():
+        async with async_session_maker() as db:
+            return await ensure_upcoming_partitions(db)
+    
+    try:
+        created = loop.run_until_complete(_sync())
+        logger.info(f"日线分区检查完成，新建 {len(created)} 个分区")
+    except Exception as e:
+        logger.error(f"日线分区检查失败：{e}")
 
 
 @shared_task(name='tasks.data_sync_tasks.sync_single_stock')
@@ -123,6 +365,12 @@ def sync_single_stock(stock_code: str):
             # 同步财务数据
             fina_count = await service.sync_financials(stock_code)
             
+            # 刷新该股票的估值快照
+            result = await db.execute(select(Stock.id).where(Stock.code == stock_code))
+            stock_id = result.scalar_one_or_none()
+            if stock_id:
+                await ValuationSnapshotService(db).refresh([stock_id])
+            
             return daily_count, fina_count
     
     try:
@@ -0,0 +1,48 @@
+# 列式数据序列化
+
+from datetime import date
+from typing import Dict, List, Optional
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# 日线列式响应包含的字段（顺序即 Arrow schema 顺序）
+DAILY_COLUMNS = ('date', 'open', 'high', 'low', 'close', 'pe_ttm', 'pb', 'dividend_yield')
+
+
+def arrow_available() -> bool:
+    """是否安装了 pyarrow"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def columns_to_rows(columns: Dict[str, list], descending: bool = True) -> List[dict]:
+    """列式数据转回逐行对象（默认日期倒序，与 rows 格式一致）"""
+    rows = [dict(zip(columns.keys(), values)) for values in zip(*columns.values())]
+    return rows[::-1] if descending else rows
+
+
+def columns_to_arrow_ipc(columns: Dict[str, List[Optional[float]]]) -> bytes:
+    """
+    将列式日线数据序列化为 Arrow IPC stream
+    
+    Args:
+        columns: 列名 -> 值数组，date 列为 ISO 日期字符串，其余为浮点数（可为 None）
+    
+    Returns:
+        Arrow IPC stream 字节
+    """
+    import pyarrow as pa
+    
+    arrays = [
+        pa.array([date.fromisoformat(d) for d in columns['date']], type=pa.date32())
+    ]
+    arrays += [pa.array(columns[name], type=pa.float64()) for name in DAILY_COLUMNS[1:]]
+    batch = pa.RecordBatch.from_arrays(arrays, names=list(DAILY_COLUMNS))
+    
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
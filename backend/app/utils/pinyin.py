@@ -0,0 +1,21 @@
+# 拼音首字母
+
+from typing import Optional
+
+
+def pinyin_abbr(name: Optional[str]) -> Optional[str]:
+    """
+    计算股票名称的拼音首字母（如 贵州茅台 -> GZMT，*ST 康美 -> STKM）
+    
+    依赖可选的 pypinyin，未安装时返回 None（搜索退化为代码/名称匹配）
+    """
+    if not name:
+        return None
+    
+    try:
+        from pypinyin import Style, lazy_pinyin
+    except ImportError:
+        return None
+    
+    letters = ''.join(lazy_pinyin(name, style=Style.FIRST_LETTER))
+    return ''.join(ch for ch in letters if ch.isalnum()).upper() or None
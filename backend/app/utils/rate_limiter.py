@@ -0,0 +1,44 @@
+# 令牌桶限流器
+
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """令牌桶限流器（asyncio）"""
+    
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_minute: 每分钟补充的令牌数
+            capacity: 桶容量（允许的突发请求数），默认 1 即严格匀速
+        """
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute 必须大于 0")
+        
+        self.rate = rate_per_minute / 60.0  # 每秒补充的令牌数
+        self.capacity = capacity if capacity is not None else 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self) -> None:
+        """按流逝时间补充令牌"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """
+        获取令牌，不足时等待
+        
+        等待者持有锁排队，按先来先得的顺序放行
+        """
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
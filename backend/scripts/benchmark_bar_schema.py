@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+日线表结构基准测试
+
+对比现有结构（UUID 主键 + Numeric）与紧凑结构（(stock_id, date) 主键 + float8）
+的存储大小和读取延迟（需要数据库连接，测试表用完即删）。实测结果见 docs/BAR-SCHEMA-BENCHMARK.md
+
+用法:
+    python scripts/benchmark_bar_schema.py
+    python scripts/benchmark_bar_schema.py --stocks 500 --days 2500 --reads 200
+"""
+
+import asyncio
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from app.core.database import engine
+
+NUMERIC_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'amount', 'pe_ttm', 'pb', 'dividend_yield')
+
+SCHEMAS = {
+    'legacy': """
+        CREATE TABLE bench_bars_legacy (
+            id VARCHAR PRIMARY KEY,
+            stock_id VARCHAR NOT NULL,
+            date DATE NOT NULL,
+            open NUMERIC(12, 4), high NUMERIC(12, 4), low NUMERIC(12, 4), close NUMERIC(12, 4),
+            volume NUMERIC, amount NUMERIC(20, 4),
+            pe_ttm NUMERIC(12, 4), pb NUMERIC(12, 4), dividend_yield NUMERIC(8, 4),
+            CONSTRAINT uq_bench_bars_legacy UNIQUE (stock_id, date)
+        )
+    """,
+    'compact': """
+        CREATE TABLE bench_bars_compact (
+            stock_id VARCHAR NOT NULL,
+            date DATE NOT NULL,
+            open FLOAT8, high FLOAT8, low FLOAT8, close FLOAT8,
+            volume FLOAT8, amount FLOAT8,
+            pe_ttm FLOAT8, pb FLOAT8, dividend_yield FLOAT8,
+            PRIMARY KEY (stock_id, date)
+        )
+    """,
+}
+
+
+def fill_sql(table: str, stocks: int, days: int, with_id: bool) -> str:
+    """用 generate_series 生成 stocks × days 条模拟日线"""
+    id_column = "id, " if with_id else ""
+    id_value = "gen_random_uuid()::text, " if with_id else ""
+    return f"""
+        INSERT INTO {table} ({id_column}stock_id, date, {', '.join(NUMERIC_COLUMNS)})
+        SELECT {id_value}'stock-' || s, DATE '2000-01-03' + d,
+               p * 0.99, p * 1.02, p * 0.98, p,
+               round(random() * 1000000), round(p * 100000, 2),
+               round((10 + random() * 20)::numeric, 4), round((1 + random() * 3)::numeric, 4),
+               round((random() * 5)::numeric, 4)
+        FROM generate_series(1, {stocks}) s,
+             generate_series(0, {days - 1}) d,
+             LATERAL (SELECT round((10 + s % 90 + 5 * sin(d / 50.0))::numeric, 2) AS p) price
+    """
+
+
+async def measure_reads(conn, table: str, stocks: int, reads: int) -> float:
+    """逐只股票读取全部历史（close/pe_ttm/pb）并转为 float，返回平均耗时（毫秒）"""
+    query = text(f"SELECT date, close, pe_ttm, pb FROM {table} WHERE stock_id = :stock_id ORDER BY date")
+    started = time.perf_counter()
+    for _ in range(reads):
+        result = await conn.execute(query, {'stock_id': f'stock-{random.randint(1, stocks)}'})
+        [(row[0], float(row[1]), float(row[2]), float(row[3])) for row in result.all()]
+    return (time.perf_counter() - started) / reads * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='日线表结构基准测试')
+    parser.add_argument('--stocks', type=int, default=500, help='模拟股票数')
+    parser.add_argument('--days', type=int, default=2500, help='每只股票的日线条数（默认 10 年）')
+    parser.add_argument('--reads', type=int, default=200, help='读取次数')
+    args = parser.parse_args()
+    
+    print(f"📊 日线表结构基准测试：{args.stocks} 只股票 × {args.days} 天")
+    
+    autocommit = engine.execution_options(isolation_level='AUTOCOMMIT')
+    async with autocommit.connect() as conn:
+        try:
+            for name, ddl in SCHEMAS.items():
+                table = f"bench_bars_{name}"
+                await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+                await conn.execute(text(ddl))
+                
+                started = time.perf_counter()
+                await conn.execute(text(fill_sql(table, args.stocks, args.days, name == 'legacy')))
+                load_time = time.perf_counter() - started
+                await conn.execute(text(f"VACUUM ANALYZE {table}"))
+                
+                sizes = (await conn.execute(text(
+                    f"SELECT pg_table_size('{table}'), pg_indexes_size('{table}')"
+                ))).one()
+                read_ms = await measure_reads(conn, table, args.stocks, args.reads)
+                
+                print(f"  └─ {name}")
+                print(f"     写入：{load_time:.2f}s")
+                print(f"     表大小：{sizes[0] / 1024 / 1024:.1f} MB，索引大小：{sizes[1] / 1024 / 1024:.1f} MB")
+                print(f"     读取单只股票全部历史：{read_ms:.2f} ms")
+        finally:
+            for name in SCHEMAS:
+                await conn.execute(text(f"DROP TABLE IF EXISTS bench_bars_{name}"))
+    
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+日线数据写入基准测试
+
+对比逐行写入与批量 upsert 两种路径的耗时（需要数据库连接）
+
+用法:
+    python scripts/benchmark_daily_upsert.py
+    python scripts/benchmark_daily_upsert.py --rows 5000
+"""
+
+import asyncio
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import delete
+from app.core.database import async_session_maker, engine, Base
+from app.models.stock import Stock, StockDailyData
+from app.services.stock_data_sync import StockDataSyncService
+
+BENCH_CODE = 'BENCH01'
+
+
+def make_bars(count: int) -> list:
+    """生成模拟的 Tushare 日线数据"""
+    bars = []
+    start = date(2000, 1, 3)
+    price = 10.0
+    for i in range(count):
+        price = max(1.0, price * (1 + random.uniform(-0.05, 0.05)))
+        bars.append({
+            'trade_date': (start + timedelta(days=i)).strftime('%Y%m%d'),
+            'open': round(price * 0.99, 2),
+            'high': round(price * 1.02, 2),
+            'low': round(price * 0.98, 2),
+            'close': round(price, 2),
+            'vol': random.randint(10000, 1000000),
+            'amount': round(price * 100000, 2),
+        })
+    return bars
+
+
+async def run_path(service: StockDataSyncService, stock_id: str, bars: list, bulk: bool) -> tuple:
+    """写入一轮数据，返回 (耗时秒数, 新增条数, 更新条数)"""
+    ind = {'pe_ttm': 15.0, 'pb': 1.5, 'dv_ratio': 2.0}
+    rows = [service._build_daily_row(stock_id, bar, ind) for bar in bars]
+    
+    started = time.perf_counter()
+    if bulk:
+        inserted, updated = await service.upsert_daily_rows(rows)
+    else:
+        inserted, updated = await service._save_daily_rows_per_row(rows)
+    await service.db.commit()
+    return time.perf_counter() - started, inserted, updated
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='日线数据写入基准测试')
+    parser.add_argument('--rows', type=int, default=2500, help='模拟日线条数（默认 10 年）')
+    args = parser.parse_args()
+    
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    bars = make_bars(args.rows)
+    print(f"📊 日线写入基准测试：{args.rows} 条")
+    
+    async with async_session_maker() as db:
+        stock = Stock(code=BENCH_CODE, name='基准测试', market='A 股')
+        db.add(stock)
+        await db.commit()
+        
+        service = StockDataSyncService(db)
+        try:
+            for bulk in (False, True):
+                label = '批量 upsert' if bulk else '逐行写入'
+                await db.execute(delete(StockDailyData).where(StockDailyData.stock_id == stock.id))
+                await db.commit()
+                
+                insert_time, inserted, _ = await run_path(service, stock.id, bars, bulk)
+                update_time, _, updated = await run_path(service, stock.id, bars, bulk)
+                print(f"  └─ {label}")
+                print(f"     插入 {inserted} 条：{insert_time:.3f}s ({inserted / insert_time:.0f} 行/秒)")
+                print(f"     更新 {updated} 条：{update_time:.3f}s ({updated / update_time:.0f} 行/秒)")
+        finally:
+            await db.execute(delete(StockDailyData).where(StockDailyData.stock_id == stock.id))
+            await db.delete(stock)
+            await db.commit()
+    
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -6,19 +6,33 @@
     python scripts/sync_data.py --stock 600519
     python scripts/sync_data.py --all
     python scripts/sync_data.py --init
+    python scripts/sync_data.py --date 20240102
+    python scripts/sync_data.py --backfill 20240101 20241231
+    python scripts/sync_data.py --repair-indicators
+    python scripts/sync_data.py --repair-indicators 600519
+    python scripts/sync_data.py --snapshot
+    python scripts/sync_data.py --bar-store 2023 2024
+    python scripts/sync_data.py --price-panel
 """
 
 import asyncio
 import argparse
 import sys
+from datetime import datetime
 from pathlib import Path
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import async_session_maker, engine, Base
+from app.models.stock import Stock
+from app.services.bar_store import bar_store
+from app.services.price_panel import price_panel, update_price_panel
 from app.services.stock_data_sync import StockDataSyncService
+from app.services.sync_engine import run_concurrent_sync
+from app.services.valuation_snapshot import ValuationSnapshotService
 from app.services.data_sources.tushare_service import tushare_service
 
 
@@ -58,18 +72,97 @@ async def sync_single_stock(code: str):
     print(f"✅ {code} 同步完成")
 
 
-async def sync_all_stocks():
-    """同步所有股票数据"""
+async def sync_market_daily(trade_date: str):
+    """按交易日同步全市场日线数据"""
+    print(f"📊 同步 {trade_date} 全市场日线数据...")
+    async with async_session_maker() as db:
+        service = StockDataSyncService(db)
+        count = await service.sync_market_daily(trade_date)
+    print(f"✅ {trade_date} 同步完成，共 {count} 条")
+
+
+async def backfill_market_daily(start_date: str, end_date: str):
+    """按日期循环回补全市场日线数据"""
+    print(f"📊 回补 {start_date} - {end_date} 全市场日线数据...")
+    async with async_session_maker() as db:
+        service = StockDataSyncService(db)
+        count = await service.backfill_market_daily(start_date, end_date)
+    print(f"✅ 回补完成，共 {count} 条")
+
+
+async def repair_indicators(code: str = None):
+    """回补缺失的 PE/PB/股息率（不重新拉取行情）"""
+    print(f"🔧 回补 {code or '全市场'} 缺失的每日指标...")
+    async with async_session_maker() as db:
+        service = StockDataSyncService(db)
+        count = await service.backfill_daily_indicators(stock_code=code)
+    print(f"✅ 回补完成，共修复 {count} 条")
+
+
+async def refresh_snapshot():
+    """重新计算估值快照"""
+    print("📊 刷新估值快照...")
+    async with async_session_maker() as db:
+        count = await ValuationSnapshotService(db).refresh()
+    print(f"✅ 估值快照刷新完成，共 {count} 只股票")
+
+
+async def export_bars(years: list):
+    """导出日线 Parquet 存储"""
+    years = years or [datetime.now().year]
+    print(f"📦 导出日线 Parquet：{', '.join(map(str, years))}")
+    async with async_session_maker() as db:
+        total = 0
+        for year in years:
+            total += await bar_store.export_year(db, year)
+    print(f"✅ 导出完成，共 {total} 条，目录 {bar_store.root}")
+
+
+async def update_panel():
+    """更新全市场日线面板"""
+    print("🧮 更新日线面板...")
+    async with async_session_maker() as db:
+        count = await update_price_panel(db)
+    print(f"✅ 日线面板更新完成，写入 {count} 条，目录 {price_panel.root}")
+
+
+async def sync_all_stocks(concurrency: int = None):
+    """并发同步所有股票数据（日线 + 财务）"""
     print("📊 同步所有股票数据...")
-    # TODO: 实现批量同步
-    print("⚠️  该功能开发中，请先使用 --stock 参数同步单只股票")
+    
+    async def _sync_stock(db, code: str) -> int:
+        service = StockDataSyncService(db)
+        daily_count = await service.sync_daily_data(code)
+        fina_count = await service.sync_financials(code)
+        return daily_count + fina_count
+    
+    async with async_session_maker() as db:
+        result = await db.execute(select(Stock.code).where(Stock.status != 'delisted'))
+        codes = result.scalars().all()
+    
+    summary = await run_concurrent_sync(codes, _sync_stock, concurrency=concurrency)
+    print(f"✅ 同步完成：{summary}")
+    if summary.failed_codes:
+        print(f"⚠️  失败股票：{', '.join(summary.failed_codes[:50])}")
 
 
 async def main():
     parser = argparse.ArgumentParser(description='股票数据同步脚本')
     parser.add_argument('--stock', type=str, help='股票代码 (如：600519)')
     parser.add_argument('--all', action='store_true', help='同步所有股票')
+    parser.add_argument('--concurrency', type=int, help='--all 的并发数（默认读取 SYNC_CONCURRENCY）')
     parser.add_argument('--init', action='store_true', help='初始化数据库')
+    parser.add_argument('--date', type=str, help='按交易日同步全市场日线 (如：20240102)')
+    parser.add_argument('--backfill', nargs=2, metavar=('START', 'END'),
+                        help='按日期回补全市场日线 (如：20240101 20241231)')
+    parser.add_argument('--repair-indicators', nargs='?', const='', metavar='CODE',
+                        help='回补缺失的 PE/PB/股息率（可指定股票代码，默认全市场）')
+    parser.add_argument('--bar-store', nargs='*', type=int, metavar='YEAR',
+                        help='导出日线 Parquet 存储（默认当年）')
+    parser.add_argument('--price-panel', action='store_true',
+                        help='更新全市场日线面板（股票列表变化时全量重建）')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='重新计算估值快照（--stock/--all/--date/--backfill 后自动执行）')
     
     args = parser.parse_args()
     
@@ -82,9 +175,29 @@ async def main():
             await sync_single_stock(args.stock)
         
         if args.all:
-            await sync_all_stocks()
+            await sync_all_stocks(args.concurrency)
+        
+        if args.date:
+            await sync_market_daily(args.date)
+        
+        if args.backfill:
+            await backfill_market_daily(*args.backfill)
+        
+        if args.repair_indicators is not None:
+            await repair_indicators(args.repair_indicators or None)
+        
+        if any([args.snapshot, args.stock, args.all, args.date, args.backfill]):
+            await refresh_snapshot()
+        
+        if args.bar_store is not None:
+            await export_bars(args.bar_store)
+        
+        if args.price_panel:
+            await update_panel()
         
-        if not any([args.stock, args.all, args.init]):
+        if not any([args.stock, args.all, args.init, args.date, args.backfill,
+                    args.repair_indicators is not None, args.snapshot,
+                    args.bar_store is not None, args.price_panel]):
             parser.print_help()
     
     except Exception as e:
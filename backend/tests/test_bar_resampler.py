@@ -0,0 +1,44 @@
+"""
+日线重采样测试
+"""
+from datetime import date, timedelta
+
+from app.services.bar_resampler import downsample_lttb, resample_ohlc
+from app.utils.columnar import DAILY_COLUMNS
+
+
+def _columns(days: int) -> dict:
+    start = date(2024, 1, 1)  # 周一
+    closes = [float(i) for i in range(days)]
+    columns = {name: list(closes) for name in DAILY_COLUMNS[1:]}
+    columns["date"] = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+    columns["high"] = [c + 1 for c in closes]
+    columns["low"] = [c - 1 for c in closes]
+    columns["pe_ttm"][1] = None
+    return columns
+
+
+def test_resample_ohlc_weekly():
+    """测试周线聚合：开盘取首个、最高/最低取极值、收盘取最后一个，日期为周期最后一天"""
+    result = resample_ohlc(_columns(10), "W")
+    
+    assert result["date"] == ["2024-01-07", "2024-01-10"]
+    assert result["open"] == [0.0, 7.0]
+    assert result["high"] == [7.0, 10.0]
+    assert result["low"] == [-1.0, 6.0]
+    assert result["close"] == [6.0, 9.0]
+    assert resample_ohlc(_columns(10), "M")["date"] == ["2024-01-10"]
+
+
+def test_downsample_lttb_fixed_size_keeps_endpoints_and_peak():
+    """测试 LTTB 输出固定点数、保留首尾和极值点"""
+    columns = _columns(2500)
+    columns["close"][1234] = 1e6
+    
+    result = downsample_lttb(columns, 100)
+    
+    assert len(result["date"]) == 100
+    assert result["date"][0] == columns["date"][0]
+    assert result["date"][-1] == columns["date"][-1]
+    assert 1e6 in result["close"]
+    assert result["date"] == sorted(result["date"])
@@ -0,0 +1,127 @@
+"""
+日线 Parquet 存储测试
+"""
+import asyncio
+from datetime import date
+
+import pytest
+
+from app.services import stock_service
+from app.services.bar_store import VALUE_COLUMNS, BarStore
+from app.services.stock_registry import StockRef
+from app.services.stock_service import StockService
+from app.utils.columnar import arrow_available
+
+
+@pytest.mark.skipif(not arrow_available(), reason="pyarrow 不可用")
+def test_bar_store_write_and_read_stock(tmp_path):
+    """测试写入年份文件后可按代码和日期过滤读回列式日线"""
+    store = BarStore(str(tmp_path))
+    columns = {
+        "code": ["000001", "000001", "600519"],
+        "stock_id": ["s1", "s1", "s2"],
+        "date": [date(2024, 1, 2), date(2024, 1, 3), date(2024, 1, 2)],
+        **{name: [1.0, 2.0, 3.0] for name in VALUE_COLUMNS},
+    }
+    columns["pe_ttm"] = [10.0, None, 30.0]
+    
+    assert store.write_partition("A 股", 2024, columns) == 3
+    assert store.files(start=date(2025, 1, 1)) == []
+    
+    bars = store.read_stock("000001", start=date(2024, 1, 1), end=date(2024, 12, 31))
+    
+    assert bars["date"] == ["2024-01-02", "2024-01-03"]
+    assert bars["close"] == [1.0, 2.0]
+    assert bars["pe_ttm"] == [10.0, None]
+    assert store.read_stock("300750") is None
+    assert store.read(["code"], end=date(2024, 1, 2)).num_rows == 2
+
+
+
+def test_bar_store_covers_requires_every_year(tmp_path):
+    """测试只有区间涉及的年份都已导出时才算覆盖（只导出当年时不能服务整段历史）"""
+    store = BarStore(str(tmp_path))
+    (tmp_path / "cn").mkdir()
+    for year in (2023, 2024):
+        store.path("A 股", year).touch()
+    
+    assert store.covers("A 股", date(2023, 3, 1), date(2024, 6, 30))
+    assert not store.covers("A 股", date(2022, 12, 1), date(2024, 6, 30))
+    assert not store.covers("A 股", date(2024, 1, 1), date(2025, 1, 2))
+    assert not store.covers("港股", date(2024, 1, 1), date(2024, 6, 30))
+
+
+class _Rows:
+    def __init__(self, rows):
+        self._rows = rows
+    
+    def all(self):
+        return self._rows
+
+
+class _DailySession:
+    """日线查询返回一行的会话"""
+    def __init__(self):
+        self.queries = 0
+    
+    async def execute(self, query):
+        self.queries += 1
+        return _Rows([(date(2015, 6, 1), *([1.0] * len(stock_service.DAILY_COLUMNS[1:])))])
+
+
+def test_daily_columns_fall_back_to_sql_when_history_not_exported(tmp_path, monkeypatch):
+    """测试未指定开始日期且只导出了近几年时回退数据库，不返回截断的历史"""
+    store = BarStore(str(tmp_path))
+    (tmp_path / "cn").mkdir()
+    store.path("A 股", date.today().year).touch()
+    served = []
+    
+    async def _resolve(db, code):
+        return StockRef("stock-1", code, "平安银行", "A 股", None, date(2010, 1, 4), "active")
+    
+    monkeypatch.setattr(stock_service.stock_registry, "resolve", _resolve)
+    monkeypatch.setattr(stock_service.settings, "BAR_STORE_SERVE_READS", True)
+    monkeypatch.setattr(stock_service, "arrow_available", lambda: True)
+    monkeypatch.setattr(stock_service, "bar_store", store)
+    monkeypatch.setattr(store, "read_stock", lambda *args: served.append(args) or {"date": []})
+    session = _DailySession()
+    
+    columns = asyncio.run(StockService(session).get_daily_columns("000001"))
+    
+    assert served == []
+    assert session.queries == 1
+    assert columns["date"] == ["2015-06-01"]
+    
+    # 请求区间在已导出年份内时读 Parquet
+    this_year = date.today().replace(month=1, day=1).isoformat()
+    asyncio.run(StockService(session).get_daily_columns("000001", start_date=this_year))
+    assert len(served) == 1 and session.queries == 1
+
+def _columns(codes, stock_ids, dates, pe_ttm):
+    return {
+        "code": codes,
+        "stock_id": stock_ids,
+        "date": dates,
+        **{name: [1.0] * len(dates) for name in VALUE_COLUMNS},
+        "pe_ttm": pe_ttm,
+    }
+
+
+@pytest.mark.skipif(not arrow_available(), reason="pyarrow 不可用")
+def test_bar_store_writers_do_not_clobber_each_other(tmp_path):
+    """测试同一文件的两个写入器各用独立临时文件，先提交的不被后提交的写到一半的文件破坏"""
+    store = BarStore(str(tmp_path))
+    first = store.open_writer("A 股", 2024)
+    second = store.open_writer("A 股", 2024)
+    first.write(_columns(["000001"], ["s1"], [date(2024, 1, 2)], [10.0]))
+    second.write(_columns(["000001", "000001"], ["s1", "s1"], [date(2024, 1, 2), date(2024, 1, 3)], [10.0, 11.0]))
+    
+    assert first.commit() == 1
+    assert store.read(["code"]).num_rows == 1
+    assert second.commit() == 2
+    assert store.read(["code"]).num_rows == 2
+    
+    aborted = store.open_writer("A 股", 2024)
+    aborted.write(_columns(["000001"], ["s1"], [date(2024, 1, 2)], [10.0]))
+    aborted.abort()
+    assert [p.name for p in (tmp_path / "cn").iterdir()] == ["2024.parquet"]
@@ -0,0 +1,107 @@
+"""
+响应缓存测试
+"""
+import asyncio
+import time
+
+from app.core.cache import ResponseCache
+from app.core.config import settings
+
+
+def test_build_key_includes_sorted_params():
+    """测试缓存 key 包含排序后的查询参数并忽略空值"""
+    key = ResponseCache.build_key(
+        "stock:600519", "daily", {"start_date": "2024-01-01", "end_date": None, "a": 1}
+    )
+    assert key == "cache:stock:600519:daily?a=1&start_date=2024-01-01"
+    assert ResponseCache.build_key("stock:600519", "stock") == "cache:stock:600519:stock"
+
+
+def test_get_or_set_single_flight_without_redis(monkeypatch):
+    """测试 Redis 不可用时并发未命中只回源一次"""
+    monkeypatch.setattr(settings, "CACHE_ENABLED", False)
+    cache = ResponseCache()
+    calls = []
+    
+    async def _loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"data": [1, 2, 3]}
+    
+    async def _run():
+        return await asyncio.gather(*(
+            cache.get_or_set("cache:stock:600519:daily", _loader, ttl=60) for _ in range(5)
+        ))
+    
+    results = asyncio.run(_run())
+    assert calls == [1]
+    assert all(result == {"data": [1, 2, 3]} for result in results)
+
+
+class _LockedRedis:
+    """模拟另一进程持锁回源、结果不缓存后释放锁的 Redis"""
+    
+    def __init__(self):
+        self.lock_released_at = time.monotonic() + 0.1
+    
+    async def get(self, key):
+        return None
+    
+    async def set(self, key, value, nx=False, px=None, ex=None):
+        return not nx
+    
+    async def exists(self, key):
+        return int(time.monotonic() < self.lock_released_at)
+
+
+def test_load_once_stops_waiting_when_lock_released(monkeypatch):
+    """测试持锁者释放锁但未写缓存时，等待者立即自行回源而不是等到锁超时"""
+    monkeypatch.setattr(settings, "CACHE_LOCK_TIMEOUT_MS", 5000)
+    cache = ResponseCache()
+    monkeypatch.setattr(cache, "_get_client", lambda: _LockedRedis())
+    
+    async def _loader():
+        return None
+    
+    started = time.monotonic()
+    result = asyncio.run(cache.get_or_set("cache:stock:000000:stock", _loader, ttl=60))
+    assert result is None
+    assert time.monotonic() - started < 1
+
+
+class _KeysRedis:
+    """内存中的 key 集合，支持 scan_iter 前缀匹配和 unlink"""
+    
+    def __init__(self, keys):
+        self.keys = set(keys)
+    
+    async def scan_iter(self, match, count=None):
+        prefix = match.rstrip('*')
+        for key in sorted(self.keys):
+            if key.startswith(prefix):
+                yield key
+    
+    async def unlink(self, *keys):
+        self.keys -= set(keys)
+        return len(keys)
+
+
+def test_purge_skipped_while_unavailable_is_replayed(monkeypatch, caplog):
+    """测试 Redis 不可用时跳过的清除会记录警告，恢复后下一次 purge 一并补做"""
+    monkeypatch.setattr(settings, "CACHE_ENABLED", True)
+    cache = ResponseCache()
+    redis = _KeysRedis([
+        "cache:stock:600519:daily", "cache:stock:000001:stock", "cache:screener:presets:x",
+    ])
+    available = [False]
+    monkeypatch.setattr(cache, "_get_client", lambda: redis if available[0] else None)
+    
+    assert asyncio.run(cache.purge("stock")) == 0
+    assert "跳过清除缓存" in caplog.text
+    assert len(redis.keys) == 3
+    
+    available[0] = True
+    assert asyncio.run(cache.purge("screener")) == 3
+    assert redis.keys == set()
+    assert cache._pending_purges == set()
+
@@ -0,0 +1,23 @@
+"""
+列式日线序列化测试
+"""
+from datetime import date
+
+import pytest
+
+from app.utils.columnar import DAILY_COLUMNS, arrow_available, columns_to_arrow_ipc
+
+
+@pytest.mark.skipif(not arrow_available(), reason="pyarrow 不可用")
+def test_columns_to_arrow_ipc_roundtrip():
+    """测试列式日线数据序列化为 Arrow IPC 后可完整读回"""
+    import pyarrow as pa
+    
+    columns = {name: [10.0, None] for name in DAILY_COLUMNS[1:]}
+    columns["date"] = ["2024-01-02", "2024-01-03"]
+    
+    table = pa.ipc.open_stream(columns_to_arrow_ipc(columns)).read_all()
+    
+    assert table.column_names == list(DAILY_COLUMNS)
+    assert table.column("date").to_pylist() == [date(2024, 1, 2), date(2024, 1, 3)]
+    assert table.column("close").to_pylist() == [10.0, None]
@@ -0,0 +1,87 @@
+"""
+日线热点查询计划回归测试（需要 PostgreSQL，设置 TEST_DATABASE_URL 后运行）
+"""
+import asyncio
+import json
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.database import Base
+from app.models import alert, article, stock, user  # noqa: F401 注册全部模型
+from app.services.stock_service import build_history_query, build_latest_bar_query
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+PRIMARY_KEY = 'stock_daily_data_pkey'
+
+# 模拟数据：200 只股票 × 1000 个自然日，ANALYZE 后规划器按真实统计信息选择计划
+SEED_STOCKS_SQL = """
+INSERT INTO stocks (id, code, name, market)
+SELECT 'stock-' || i, 'T' || lpad(i::text, 6, '0'), 'stock ' || i, 'A'
+FROM generate_series(1, 200) AS i
+"""
+SEED_DAILY_SQL = """
+INSERT INTO stock_daily_data (stock_id, date, close, pe_ttm, pb, dividend_yield, total_mv)
+SELECT 'stock-' || i, d::date, 10 + random(), 15 + random(), 1.5, 2.0, 1000000
+FROM generate_series(current_date - 999, current_date, interval '1 day') AS d,
+     generate_series(1, 200) AS i
+"""
+
+
+def _index_scans(plan: dict) -> list:
+    """递归收集索引扫描节点 (类型, 索引名)"""
+    scans = []
+    if plan.get('Index Name'):
+        scans.append((plan['Node Type'], plan['Index Name']))
+    for child in plan.get('Plans', []):
+        scans.extend(_index_scans(child))
+    return scans
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="未设置 TEST_DATABASE_URL")
+def test_daily_hot_queries_use_covering_primary_key():
+    """测试最新日线和估值历史查询走覆盖主键，且主键包含全部读取的列"""
+    queries = [
+        build_latest_bar_query('stock-7'),
+        build_history_query('stock-7', 'pe_ttm'),
+        build_history_query('stock-7', 'pb'),
+    ]
+    sqls = [
+        str(query.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+        for query in queries
+    ]
+    
+    async def _explain():
+        engine = create_async_engine(TEST_DATABASE_URL)
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(text(SEED_STOCKS_SQL))
+                await conn.execute(text(SEED_DAILY_SQL))
+                await conn.execute(text("ANALYZE stocks, stock_daily_data"))
+                plans = []
+                for sql in sqls:
+                    result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+                    plan = result.scalar()
+                    plans.append(json.loads(plan) if isinstance(plan, str) else plan)
+                result = await conn.execute(text(
+                    f"SELECT pg_get_indexdef('{PRIMARY_KEY}'::regclass)"
+                ))
+                return plans, result.scalar()
+            finally:
+                await transaction.rollback()
+                await engine.dispose()
+    
+    plans, indexdef = asyncio.run(_explain())
+    
+    for plan in plans:
+        scans = _index_scans(plan[0]['Plan'])
+        # 分区表上每个分区各自的主键索引名为 <分区名>_pkey
+        assert scans and all(name.endswith('_pkey') for _, name in scans), scans
+    assert 'UNIQUE INDEX' in indexdef and '(stock_id, date)' in indexdef
+    assert 'INCLUDE (close, pe_ttm, pb, dividend_yield, total_mv)' in indexdef
@@ -0,0 +1,43 @@
+"""
+日线分区管理测试
+"""
+import asyncio
+
+from app.services import partition_manager
+from app.services.partition_manager import ensure_partitions, partition_name
+
+
+class _Session:
+    """记录执行的 SQL，existing 为已存在的分区表名"""
+    
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.statements = []
+    
+    async def execute(self, statement):
+        self.statements.append(str(statement))
+    
+    async def scalar(self, statement):
+        self.statements.append(str(statement))
+        return any(name in str(statement) for name in self.existing)
+
+
+def test_ensure_partitions_moves_default_rows_then_attaches(monkeypatch):
+    """测试新建分区：建独立表、从默认分区搬数据、ATTACH，已存在的分区只确认一次"""
+    monkeypatch.setattr(partition_manager, "_known_years", set())
+    db = _Session(existing=[partition_name(2023)])
+    
+    created = asyncio.run(ensure_partitions(db, [2023, 2024]))
+    
+    assert created == [2024]
+    ddl = [s for s in db.statements if "stock_daily_data_y2024" in s and "to_regclass" not in s]
+    assert ddl[0].startswith("CREATE TABLE stock_daily_data_y2024 (LIKE stock_daily_data")
+    assert "DELETE FROM stock_daily_data_default WHERE date >= '2024-01-01'" in ddl[1]
+    assert "ATTACH PARTITION stock_daily_data_y2024 FOR VALUES FROM ('2024-01-01') TO ('2025-01-01')" in ddl[-1]
+    
+    # 2023 已确认存在，不再查询；2024 在调用方提交后再确认
+    db.statements.clear()
+    db.existing.add(partition_name(2024))
+    assert asyncio.run(ensure_partitions(db, [2023, 2024])) == []
+    assert not any("2023" in s for s in db.statements)
+    assert asyncio.run(ensure_partitions(db, [2023, 2024])) == [] and len(db.statements) == 2
@@ -0,0 +1,43 @@
+"""
+百分位引擎测试
+"""
+import random
+
+import numpy as np
+
+from app.services.indicator_calculator import indicator_calculator
+from app.services.percentile_engine import PercentileEngine
+
+
+def test_percentile_engine_matches_calculator():
+    """测试单只、批量和增量结果与 calculate_percentile 一致"""
+    random.seed(7)
+    history = {
+        code: [random.choice([None, -1.0, random.uniform(5, 50)]) for _ in range(300)]
+        for code in ('600519', '000001', '300750')
+    }
+    engine = PercentileEngine()
+    keys, values = [], []
+    for code, series in history.items():
+        for value in series:
+            if value is not None:
+                keys.append(code)
+                values.append(value)
+    engine.load_many(keys, values)
+    
+    current = {'600519': 20.0, '000001': 35.5, '300750': 4.0}
+    for code, value in current.items():
+        expected = indicator_calculator.calculate_percentile(value, history[code])
+        assert engine.rank(code, value) == expected
+    
+    ranks = engine.rank_many(list(current) + ['UNKNOWN'], list(current.values()) + [10.0])
+    assert ranks[:3].tolist() == [engine.rank(code, v) for code, v in current.items()]
+    assert np.isnan(ranks[3])
+    
+    engine.insert('600519', 19.0)
+    history['600519'].append(19.0)
+    assert engine.rank('600519', 20.0) == indicator_calculator.calculate_percentile(20.0, history['600519'])
+    
+    engine.evict('600519', 19.0)
+    history['600519'].pop()
+    assert engine.rank_many(['600519'], [20.0])[0] == engine.rank('600519', 20.0)
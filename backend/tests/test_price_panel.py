@@ -0,0 +1,88 @@
+"""
+全市场日线面板测试
+"""
+from datetime import date
+
+import numpy as np
+
+from app.services.price_panel import PricePanel
+
+
+def _batch(stock_ids, dates, close):
+    return {
+        "stock_id": stock_ids,
+        "date": dates,
+        "close": close,
+        "pe_ttm": [None] * len(dates),
+        "pb": [1.0] * len(dates),
+        "dividend_yield": [0.0] * len(dates),
+    }
+
+
+def test_price_panel_rebuild_append_and_reopen(tmp_path):
+    """测试全量构建、追加交易日后读取方重新打开可见新数据"""
+    writer_panel = PricePanel(str(tmp_path))
+    writer = writer_panel.rebuild([date(2024, 1, 2), date(2024, 1, 3)], ["a", "b"])
+    writer.write(_batch(["a", "b", "a", "x"], [date(2024, 1, 2)] * 2 + [date(2024, 1, 3)] * 2,
+                        [10.0, 20.0, 11.0, 99.0]))
+    writer.commit()
+    
+    reader = PricePanel(str(tmp_path))
+    assert reader.open()
+    close = reader.matrix("close")
+    assert close.dtype == np.float32
+    assert close[0].tolist() == [10.0, 20.0]
+    assert close[1, 0] == 11.0 and np.isnan(close[1, 1])
+    assert np.isnan(reader.matrix("pe_ttm")).all()
+    
+    writer = writer_panel.update([date(2024, 1, 3), date(2024, 1, 4)], ["a", "b"])
+    writer.write(_batch(["b", "b"], [date(2024, 1, 3), date(2024, 1, 4)], [21.0, 22.0]))
+    writer.commit()
+    
+    assert reader.open()
+    dates, stock_ids, matrix = reader.window("close", days=2, stock_ids=["b", "missing"])
+    assert dates.tolist() == [date(2024, 1, 3), date(2024, 1, 4)]
+    assert stock_ids == ["b"]
+    assert matrix[:, 0].tolist() == [21.0, 22.0]
+
+
+def test_price_panel_update_backfill_and_new_stock(tmp_path):
+    """测试回补早于面板首日的历史、重写已有日期、新增股票列时保留已有数据"""
+    panel = PricePanel(str(tmp_path))
+    writer = panel.rebuild([date(2024, 1, 3), date(2024, 1, 4)], ["a"])
+    writer.write(_batch(["a", "a"], [date(2024, 1, 3), date(2024, 1, 4)], [11.0, 12.0]))
+    writer.commit()
+    
+    writer = panel.update([date(2023, 6, 1), date(2024, 1, 3)], ["a", "c"])
+    assert writer.added_stock_ids == ["c"]
+    writer.write(_batch(["a", "a", "c"], [date(2023, 6, 1), date(2024, 1, 3), date(2024, 1, 4)],
+                        [9.0, 11.5, 30.0]))
+    writer.commit()
+    
+    assert panel.open()
+    assert panel.dates.tolist() == [date(2023, 6, 1), date(2024, 1, 3), date(2024, 1, 4)]
+    assert panel.stock_ids == ["a", "c"]
+    close = panel.matrix("close")
+    assert close[:, 0].tolist() == [9.0, 11.5, 12.0]
+    assert np.isnan(close[:2, 1]).all() and close[2, 1] == 30.0
+
+
+def test_price_panel_keeps_previous_generation_for_readers(tmp_path):
+    """测试写新一代文件后保留上一代，读到旧 meta.json 的读取方仍能映射；再下一代提交时才删除"""
+    panel = PricePanel(str(tmp_path))
+    writer = panel.rebuild([date(2024, 1, 2)], ["a"])
+    writer.write(_batch(["a"], [date(2024, 1, 2)], [10.0]))
+    writer.commit()
+    old_meta = panel.read_meta()
+    
+    # 新增股票列写第 2 代
+    writer = panel.update([date(2024, 1, 3)], ["a", "b"])
+    writer.commit()
+    assert panel._map("close", old_meta, "r")[0, 0] == 10.0
+    
+    # 第 3 代提交后删除第 1 代
+    writer = panel.update([date(2024, 1, 4)], ["a", "b", "c"])
+    writer.commit()
+    generations = sorted({int(path.suffixes[0][1:]) for path in tmp_path.glob("*.f32")})
+    assert generations == [2, 3]
+    assert len(list(tmp_path.glob("*.f32"))) == 8
@@ -0,0 +1,33 @@
+"""
+限流器测试
+"""
+import asyncio
+import time
+import pytest
+
+from app.utils.rate_limiter import TokenBucket
+
+
+def test_token_bucket_limits_rate():
+    """测试令牌桶按速率放行"""
+    # 每秒 20 个令牌，容量 2：前 2 个立即放行，之后每 50ms 放行 1 个
+    bucket = TokenBucket(rate_per_minute=1200, capacity=2)
+    
+    async def _acquire_all():
+        started = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - started
+    
+    elapsed = asyncio.run(_acquire_all())
+    assert elapsed >= 0.18
+
+
+def test_token_bucket_invalid_rate():
+    """测试非法速率"""
+    with pytest.raises(ValueError):
+        TokenBucket(rate_per_minute=0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
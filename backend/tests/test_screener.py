@@ -0,0 +1,148 @@
+"""
+选股器测试
+"""
+from app.schemas.screener import ScreenerRequest
+from app.services.screener_service import screen_snapshot
+from app.services.screener_snapshot import ScreenerSnapshot
+
+
+def _row(code, market='A 股', industry='银行', **values):
+    row = {'code': code, 'name': f'股票{code}', 'market': market, 'industry': industry}
+    for name in ('current_price', 'pe_ttm', 'pb', 'dividend_yield', 'pe_percentile',
+                 'pb_percentile', 'roe', 'revenue_growth', 'profit_growth', 'market_cap'):
+        row[name] = values.get(name)
+    return row
+
+
+def test_screen_snapshot_filters_sorts_and_pages():
+    """测试列式快照上的筛选、排序和分页"""
+    snapshot = ScreenerSnapshot.from_rows([
+        _row('000001', current_price=10, pe_ttm=5, dividend_yield=6, market_cap=2000),
+        _row('600036', current_price=30, pe_ttm=6, dividend_yield=5.5, market_cap=8000),
+        _row('600519', industry='白酒', current_price=1500, pe_ttm=25, dividend_yield=2),
+        _row('601398', current_price=5, pe_ttm=None, dividend_yield=7, market_cap=20000),
+        _row('00700', market='港股', current_price=300, pe_ttm=15, dividend_yield=5.2),
+    ])
+    
+    request = ScreenerRequest(dividend_yield_min=5, pe_max=20, markets=['A 股'],
+                              sort_by='market_cap', sort_order='desc')
+    results, total = screen_snapshot(snapshot, request)
+    
+    # 601398 PE 为空，不满足 pe_max
+    assert total == 2
+    assert [r.code for r in results] == ['600036', '000001']
+    assert float(results[0].pe_ttm) == 6.0
+    
+    request = ScreenerRequest(industries=['银行'], sort_by='pe_ttm', sort_order='asc',
+                              page=2, page_size=2)
+    results, total = screen_snapshot(snapshot, request)
+    
+    # 空值排在最后
+    assert total == 4
+    assert [r.code for r in results] == ['00700', '601398']
+    assert results[1].pe_ttm is None
+
+
+def test_screen_preset_cached_per_data_version(monkeypatch):
+    """测试预设结果按数据版本缓存，版本变化后重新计算"""
+    import asyncio
+    from app.services import screener_service
+    from app.services.screener_service import ScreenerService
+    
+    snapshots = {
+        'v1': ScreenerSnapshot.from_rows([
+            _row('000001', current_price=10, pe_ttm=5, dividend_yield=6),
+        ], version='v1'),
+        'v2': ScreenerSnapshot.from_rows([
+            _row('000001', current_price=10, pe_ttm=5, dividend_yield=6),
+            _row('600036', current_price=30, pe_ttm=6, dividend_yield=8),
+        ], version='v2'),
+    }
+    current = {'version': 'v1', 'screens': 0}
+    
+    async def _get_snapshot(db):
+        current['screens'] += 1
+        return snapshots[current['version']]
+    
+    monkeypatch.setattr(screener_service, 'get_screener_snapshot', _get_snapshot)
+    monkeypatch.setattr(screener_service, '_preset_cache', {})
+    service = ScreenerService(db=None)
+    
+    results, total = asyncio.run(service.screen_preset('high_dividend'))
+    assert total == 1
+    calls = current['screens']
+    
+    # 同一版本直接命中缓存（只检查版本）
+    asyncio.run(service.screen_preset('high_dividend'))
+    assert current['screens'] == calls + 1
+    
+    current['version'] = 'v2'
+    results, total = asyncio.run(service.screen_preset('high_dividend'))
+    assert total == 2
+    assert [r.code for r in results] == ['600036', '000001']
+    assert asyncio.run(service.screen_preset('unknown')) is None
+
+
+def test_screen_preset_version_matches_results_snapshot(monkeypatch):
+    """测试快照在两次读取之间被替换时，缓存的版本与计算结果来自同一个快照"""
+    import asyncio
+    from app.services import screener_service
+    from app.services.screener_service import ScreenerService
+    
+    snapshots = [
+        ScreenerSnapshot.from_rows([
+            _row('000001', current_price=10, pe_ttm=5, dividend_yield=6),
+        ], version='v1'),
+        ScreenerSnapshot.from_rows([
+            _row('000001', current_price=10, pe_ttm=5, dividend_yield=6),
+            _row('600036', current_price=30, pe_ttm=6, dividend_yield=8),
+        ], version='v2'),
+    ]
+    
+    async def _get_snapshot(db):
+        # 每次读取后快照都被替换为更新的版本
+        return snapshots.pop(0) if len(snapshots) > 1 else snapshots[0]
+    
+    monkeypatch.setattr(screener_service, 'get_screener_snapshot', _get_snapshot)
+    monkeypatch.setattr(screener_service, '_preset_cache', {})
+    service = ScreenerService(db=None)
+    
+    _, total = asyncio.run(service.screen_preset('high_dividend'))
+    assert total == 1
+    assert screener_service._preset_cache['high_dividend'][0] == 'v1'
+    
+    _, total = asyncio.run(service.screen_preset('high_dividend'))
+    assert total == 2
+
+
+def test_screen_preset_sql_mode_checks_version_per_interval(monkeypatch):
+    """测试 SQL 模式命中预设缓存时不再每次查询数据版本"""
+    import asyncio
+    from app.core.config import settings
+    from app.services import screener_service, screener_snapshot
+    from app.services.screener_service import ScreenerService
+    
+    version_queries = []
+    
+    async def _get_data_version(db):
+        version_queries.append(1)
+        return 'v1'
+    
+    async def _screen_sql(self, request):
+        return [], 0
+    
+    monkeypatch.setattr(settings, 'SCREENER_MODE', 'sql')
+    monkeypatch.setattr(settings, 'SCREENER_SNAPSHOT_TTL', 60)
+    monkeypatch.setattr(screener_snapshot, 'get_data_version', _get_data_version)
+    monkeypatch.setattr(screener_snapshot, '_version', None)
+    monkeypatch.setattr(ScreenerService, '_screen_sql', _screen_sql)
+    monkeypatch.setattr(screener_service, '_preset_cache', {})
+    service = ScreenerService(db=None)
+    
+    for _ in range(3):
+        asyncio.run(service.screen_preset('high_dividend'))
+    assert len(version_queries) == 1
+    
+    screener_snapshot.invalidate_screener_snapshot()
+    asyncio.run(service.screen_preset('high_dividend'))
+    assert len(version_queries) == 2
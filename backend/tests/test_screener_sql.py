@@ -0,0 +1,85 @@
+"""
+SQL 选股查询计划测试（需要 PostgreSQL，设置 TEST_DATABASE_URL 后运行）
+"""
+import asyncio
+import json
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.database import Base
+from app.models import alert, article, stock, user  # noqa: F401 注册全部模型
+from app.schemas.screener import ScreenerRequest
+from app.services.screener_service import build_screener_query
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+# 模拟数据：200 只股票 × 1000 个自然日日线和 8 期财务，ANALYZE 后规划器按真实统计信息选择计划
+SEED_SQL = (
+    """
+    INSERT INTO stocks (id, code, name, market, status)
+    SELECT 'stock-' || i, 'T' || lpad(i::text, 6, '0'), 'stock ' || i, 'A 股', 'active'
+    FROM generate_series(1, 200) AS i
+    """,
+    """
+    INSERT INTO stock_daily_data (stock_id, date, close, pe_ttm, pb, dividend_yield, total_mv)
+    SELECT 'stock-' || i, d::date, 10 + random(), 5 + 20 * random(), 1.5, 1 + 4 * random(), 1000000
+    FROM generate_series(current_date - 999, current_date, interval '1 day') AS d,
+         generate_series(1, 200) AS i
+    """,
+    """
+    INSERT INTO stock_financials (id, stock_id, report_date, revenue, net_profit, roe)
+    SELECT 'fina-' || i || '-' || q, 'stock-' || i,
+           (date_trunc('quarter', current_date) - q * interval '3 months' - interval '1 day')::date,
+           1000000 + q, 100000 + q, 5 + 20 * random()
+    FROM generate_series(1, 200) AS i, generate_series(0, 7) AS q
+    """,
+)
+
+
+def _scanned_relations(plan: dict, node_type: str) -> list:
+    """递归收集指定类型节点扫描的表"""
+    relations = []
+    if plan.get('Node Type') == node_type:
+        relations.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        relations.extend(_scanned_relations(child, node_type))
+    return relations
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="未设置 TEST_DATABASE_URL")
+def test_screener_query_avoids_daily_seq_scan():
+    """测试选股查询通过索引读取最新日线，不顺序扫描 stock_daily_data"""
+    request = ScreenerRequest(
+        pe_max=20, dividend_yield_min=3, roe_min=10, markets=['A 股'],
+        sort_by='market_cap', sort_order='desc',
+    )
+    sql = str(build_screener_query(request).compile(
+        dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}
+    ))
+    
+    async def _explain():
+        engine = create_async_engine(TEST_DATABASE_URL)
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                await conn.run_sync(Base.metadata.create_all)
+                for sql_text in SEED_SQL:
+                    await conn.execute(text(sql_text))
+                await conn.execute(text("ANALYZE stocks, stock_daily_data, stock_financials"))
+                result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+                return result.scalar()
+            finally:
+                await transaction.rollback()
+                await engine.dispose()
+    
+    plan = asyncio.run(_explain())
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    
+    # 分区表上扫描节点报告的是分区名（stock_daily_data_y2024、stock_daily_data_default 等）
+    seq_scanned = _scanned_relations(plan[0]['Plan'], 'Seq Scan')
+    assert not any(name.startswith('stock_daily_data') for name in seq_scanned), seq_scanned
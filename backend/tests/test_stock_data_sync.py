@@ -0,0 +1,494 @@
+"""
+数据同步服务测试
+"""
+import asyncio
+import pytest
+from datetime import date
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+
+from app.models.stock import StockSyncState
+from app.services import stock_data_sync, sync_engine
+from app.services.data_sources.tushare_service import TushareAPIError
+from app.services.stock_data_sync import StockDataSyncService, build_daily_upsert
+from app.services.stock_registry import StockRef
+
+
+def _row(day: int, close: float) -> dict:
+    return {
+        'stock_id': 'stock-1',
+        'date': date(2024, 1, day),
+        'open': close,
+        'high': close,
+        'low': close,
+        'close': close,
+        'volume': 100,
+        'amount': 1000,
+        'pe_ttm': 10.0,
+        'pb': 1.0,
+        'dividend_yield': 3.0,
+    }
+
+
+def test_build_daily_upsert():
+    """测试日线批量 upsert 语句"""
+    stmt = build_daily_upsert([_row(2, 10.0), _row(3, 10.5)])
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    
+    assert "ON CONFLICT (stock_id, date) DO UPDATE" in sql
+    assert "close = excluded.close" in sql
+    # 指标为空时保留已有值
+    assert "pe_ttm = coalesce(excluded.pe_ttm, stock_daily_data.pe_ttm)" in sql
+    # 主键和冲突键不应被更新
+    assert "id = excluded.id" not in sql
+    assert "RETURNING (xmax = 0)" in sql
+
+
+
+class _FakeSession:
+    """只记录回滚次数的会话"""
+    def __init__(self):
+        self.rollbacks = 0
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *args):
+        return False
+    
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def test_run_concurrent_sync_isolates_errors(monkeypatch):
+    """测试并发同步：单只股票失败不影响其他股票"""
+    sessions = []
+    
+    def _session_maker():
+        session = _FakeSession()
+        sessions.append(session)
+        return session
+    
+    monkeypatch.setattr(sync_engine, "async_session_maker", _session_maker)
+    
+    async def job(db, code):
+        await asyncio.sleep(0)
+        if code == "000002":
+            raise RuntimeError("boom")
+        return 0 if code == "000003" else 10
+    
+    codes = ["000001", "000002", "000003", "000004", "000005"]
+    summary = asyncio.run(sync_engine.run_concurrent_sync(codes, job, concurrency=2))
+    
+    assert len(sessions) == 2
+    assert summary.succeeded == 3
+    assert summary.empty == 1
+    assert summary.failed == 1
+    assert summary.failed_codes == ["000002"]
+    assert summary.rows == 30
+    assert sum(s.rollbacks for s in sessions) == 1
+
+
+class _WeekdayCalendar:
+    """按工作日判断的交易日历"""
+    async def trading_days(self, start, end):
+        return [
+            date.fromordinal(n) for n in range(start.toordinal(), end.toordinal() + 1)
+            if date.fromordinal(n).weekday() < 5
+        ]
+
+
+def _incremental_start(monkeypatch, watermark):
+    """以给定日线水位计算增量开始日期，返回 (开始日期, 缺口检查区间列表)"""
+    service = StockDataSyncService(db=None)
+    service.calendar = _WeekdayCalendar()
+    windows = []
+    
+    async def _get_watermark(stock_id, dataset):
+        return watermark
+    
+    async def _find_daily_gaps(stock_id, start, end):
+        windows.append((start, end))
+        return []
+    
+    monkeypatch.setattr(service, "_get_watermark", _get_watermark)
+    monkeypatch.setattr(service, "_find_daily_gaps", _find_daily_gaps)
+    stock = StockRef("stock-1", "000001", "平安银行", "A 股", None, date(2000, 1, 1), "active")
+    return asyncio.run(service._incremental_start_date(stock, "20240205")), windows
+
+
+def test_incremental_start_skips_checked_suspension(monkeypatch):
+    """测试停牌期间已确认无数据的交易日不再当作缺口，也不重复请求"""
+    watermark = StockSyncState(last_trade_date=date(2024, 1, 10), last_checked_date=date(2024, 1, 31))
+    start, windows = _incremental_start(monkeypatch, watermark)
+    assert start == "20240201"
+    assert windows == []
+
+
+def test_incremental_start_checks_gaps_after_checked_date(monkeypatch):
+    """测试只检查确认日之后、水位之前的缺口（如截面同步漏掉的交易日）"""
+    watermark = StockSyncState(last_trade_date=date(2024, 2, 2), last_checked_date=date(2024, 1, 25))
+    start, windows = _incremental_start(monkeypatch, watermark)
+    assert start == "20240203"
+    assert windows == [(date(2024, 1, 26), date(2024, 2, 2))]
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+    
+    def all(self):
+        return list(self._rows)
+
+
+class _RecordingSession:
+    """记录执行语句的会话，SELECT 依次返回预设结果"""
+    def __init__(self, select_results=()):
+        self.select_results = list(select_results)
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+    
+    async def execute(self, stmt, params=None):
+        self.executed.append((stmt, params))
+        if stmt.is_select:
+            return _Result(self.select_results.pop(0))
+        return _Result([])
+    
+    async def commit(self):
+        self.commits += 1
+    
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+async def _no_purge(namespace):
+    return 0
+
+
+def _bar(trade_date: str, close: float) -> dict:
+    return {
+        'ts_code': '000001.SZ', 'trade_date': trade_date,
+        'open': close, 'high': close, 'low': close, 'close': close, 'vol': 100, 'amount': 1000,
+    }
+
+
+def _sync_daily_service(monkeypatch, indicators):
+    """日线区间同步：Tushare 返回 3 根 K 线，daily_basic 由 indicators 决定，返回 (服务, 写入行)"""
+    written = []
+    service = StockDataSyncService(db=_RecordingSession())
+    stock = StockRef("stock-1", "000001", "平安银行", "A 股", None, date(2000, 1, 1), "active")
+    
+    async def _resolve(db, code):
+        return stock
+    
+    async def _get_daily_data(ts_code, start_date, end_date):
+        return [_bar('20240102', 10.0), _bar('20240103', 10.5), _bar('20240104', 11.0)]
+    
+    async def _get_daily_basic(ts_code=None, start_date=None, end_date=None, trade_date=None):
+        if isinstance(indicators, Exception):
+            raise indicators
+        return indicators
+    
+    async def _upsert_daily_rows(rows):
+        written.extend(rows)
+        return len(rows), 0
+    
+    async def _advance_watermarks(dataset, marks, column=None):
+        pass
+    
+    monkeypatch.setattr(stock_data_sync.stock_registry, "resolve", _resolve)
+    monkeypatch.setattr(stock_data_sync.tushare_service, "get_daily_data", _get_daily_data)
+    monkeypatch.setattr(stock_data_sync.tushare_service, "get_daily_basic", _get_daily_basic)
+    monkeypatch.setattr(stock_data_sync.response_cache, "purge", _no_purge)
+    monkeypatch.setattr(service, "upsert_daily_rows", _upsert_daily_rows)
+    monkeypatch.setattr(service, "_advance_watermarks", _advance_watermarks)
+    return service, written
+
+
+def test_sync_daily_data_joins_range_indicators_by_trade_date(monkeypatch):
+    """测试区间 daily_basic 按 trade_date 合并到对应日线，缺少指标的交易日留空待回补"""
+    indicators = [
+        {'ts_code': '000001.SZ', 'trade_date': '20240104', 'pe_ttm': 6.2, 'pb': 0.7, 'dv_ratio': 4.1, 'total_mv': 3.0},
+        {'ts_code': '000001.SZ', 'trade_date': '20240102', 'pe_ttm': 6.0, 'pb': 0.6, 'dv_ratio': 4.0, 'total_mv': 2.9},
+    ]
+    service, written = _sync_daily_service(monkeypatch, indicators)
+    
+    count = asyncio.run(service.sync_daily_data("000001", start_date="20240101", end_date="20240105"))
+    
+    assert count == 3
+    by_date = {row['date']: row for row in written}
+    assert (by_date[date(2024, 1, 2)]['pe_ttm'], by_date[date(2024, 1, 2)]['pb']) == (6.0, 0.6)
+    assert (by_date[date(2024, 1, 4)]['pe_ttm'], by_date[date(2024, 1, 4)]['pb']) == (6.2, 0.7)
+    assert by_date[date(2024, 1, 4)]['dividend_yield'] == 4.1
+    assert by_date[date(2024, 1, 3)]['pb'] is None
+    assert service.db.commits == 1
+
+
+def test_sync_daily_data_fails_when_daily_basic_unavailable(monkeypatch):
+    """测试 daily_basic 不可用时同步失败并回滚，不写入缺少 PE/PB 的日线"""
+    service, written = _sync_daily_service(monkeypatch, TushareAPIError("daily_basic 权限不足"))
+    
+    with pytest.raises(TushareAPIError):
+        asyncio.run(service.sync_daily_data("000001", start_date="20240101", end_date="20240105"))
+    
+    assert written == []
+    assert service.db.rollbacks == 1
+    assert service.db.commits == 0
+
+
+def test_backfill_daily_indicators_repairs_only_missing_rows(monkeypatch):
+    """测试回补只选取 pb 为空的日线，只更新缺失的 (股票, 日期)，并记录修复区间"""
+    missing = [('stock-1', date(2024, 1, 3)), ('stock-2', date(2024, 1, 3)), ('stock-1', date(2024, 1, 5))]
+    session = _RecordingSession(select_results=[missing])
+    service = StockDataSyncService(db=session)
+    requested = []
+    
+    async def _load_stock_id_map():
+        return {'000001': 'stock-1', '000002': 'stock-2', '000003': 'stock-3'}
+    
+    async def _get_daily_basic(trade_date=None, ts_code=None, start_date=None, end_date=None):
+        requested.append(trade_date)
+        return [
+            {'ts_code': ts_code, 'trade_date': trade_date, 'pe_ttm': 5.0, 'pb': 0.5, 'dv_ratio': 3.0, 'total_mv': 1.0}
+            for ts_code in ('000001.SZ', '000002.SZ', '000003.SZ')
+        ]
+    
+    monkeypatch.setattr(service, "_load_stock_id_map", _load_stock_id_map)
+    monkeypatch.setattr(stock_data_sync.tushare_service, "get_daily_basic", _get_daily_basic)
+    monkeypatch.setattr(stock_data_sync.response_cache, "purge", _no_purge)
+    
+    repaired = asyncio.run(service.backfill_daily_indicators(start_date="20240101", end_date="20240131"))
+    
+    select_stmt = session.executed[0][0]
+    where = str(select_stmt.whereclause.compile(dialect=postgresql.dialect()))
+    assert "stock_daily_data.pb IS NULL" in where
+    # 每个缺失日期请求一次全市场 daily_basic
+    assert requested == ['20240103', '20240105']
+    updated = {
+        (params['b_stock_id'], params['b_date'])
+        for stmt, batch in session.executed[1:] for params in batch
+    }
+    assert updated == set(missing)
+    assert repaired == 3
+    assert service.repaired_range == (date(2024, 1, 3), date(2024, 1, 5))
+    assert session.commits == 1
+
+
+def test_backfill_daily_indicators_without_missing_rows(monkeypatch):
+    """测试没有缺失指标时不请求 daily_basic，修复区间保持为空"""
+    service = StockDataSyncService(db=_RecordingSession(select_results=[[]]))
+    
+    async def _load_stock_id_map():
+        return {'000001': 'stock-1'}
+    
+    async def _get_daily_basic(**kwargs):
+        raise AssertionError("不应请求 daily_basic")
+    
+    monkeypatch.setattr(service, "_load_stock_id_map", _load_stock_id_map)
+    monkeypatch.setattr(stock_data_sync.tushare_service, "get_daily_basic", _get_daily_basic)
+    
+    assert asyncio.run(service.backfill_daily_indicators()) == 0
+    assert service.repaired_range == (None, None)
+
+
+
+def _listing(code: str, name: str, industry: str = '银行') -> dict:
+    return {
+        'ts_code': f'{code}.SZ', 'symbol': code, 'name': name, 'area': '深圳',
+        'industry': industry, 'list_date': '19910403', 'market': '主板',
+    }
+
+
+def _existing(code: str, name: str, industry: str = '银行', status: str = 'active'):
+    return SimpleNamespace(
+        id=f'stock-{code}', code=code, name=name, market='A 股', industry=industry,
+        listed_date=date(1991, 4, 3), status=status, pinyin_abbr='PY',
+    )
+
+
+def _stock_list_service(monkeypatch, feed, existing):
+    """股票列表同步：feed 为 Tushare 返回（异常则抛出），existing 为库中已有股票，返回 (服务, 失效记录)"""
+    session = _RecordingSession(select_results=[existing])
+    service = StockDataSyncService(db=session)
+    invalidated = []
+    
+    async def _get_stock_list():
+        if isinstance(feed, Exception):
+            raise feed
+        return feed
+    
+    async def _purge(namespace):
+        invalidated.append(('cache', namespace))
+        return 0
+    
+    monkeypatch.setattr(stock_data_sync.tushare_service, "get_stock_list", _get_stock_list)
+    monkeypatch.setattr(stock_data_sync, "pinyin_abbr", lambda name: 'PY')
+    monkeypatch.setattr(stock_data_sync.stock_registry, "invalidate", lambda: invalidated.append('registry'))
+    monkeypatch.setattr(stock_data_sync.stock_suggest_index, "invalidate", lambda: invalidated.append('suggest'))
+    monkeypatch.setattr(stock_data_sync.response_cache, "purge", _purge)
+    return service, invalidated
+
+
+def _writes(session):
+    """除加载已有股票的 SELECT 外执行的写语句 [(语句 SQL, executemany 参数或语句内绑定参数)]"""
+    writes = []
+    for stmt, params in session.executed:
+        if stmt.is_select:
+            continue
+        compiled = stmt.compile(dialect=postgresql.dialect())
+        writes.append((str(compiled), params if params is not None else compiled.params))
+    return writes
+
+
+def test_sync_stock_list_computes_insert_update_delist(monkeypatch):
+    """测试股票列表按差异写入：新增、变更、退市各一条语句，并失效注册表/联想索引/缓存"""
+    feed = [_listing('000001', '平安银行'), _listing('000002', '万科A', '全国地产'), _listing('000004', '新股')]
+    existing = [
+        _existing('000001', '平安银行'),
+        _existing('000002', '万科A', '房地产'),
+        _existing('000003', '已退市股'),
+        _existing('000005', '早已退市', status='delisted'),
+    ]
+    service, invalidated = _stock_list_service(monkeypatch, feed, existing)
+    
+    assert asyncio.run(service.sync_stock_list()) == 3
+    
+    (insert_sql, inserted), (update_sql, updated), (delist_sql, delist_params) = _writes(service.db)
+    assert insert_sql.startswith('INSERT INTO stocks')
+    assert [row['code'] for row in inserted] == ['000004']
+    # 只有字段变化的股票才更新，按主键 executemany
+    assert update_sql.startswith('UPDATE stocks')
+    assert updated == [{
+        'id': 'stock-000002', 'code': '000002', 'name': '万科A', 'market': 'A 股', 'industry': '全国地产',
+        'listed_date': date(1991, 4, 3), 'status': 'active', 'pinyin_abbr': 'PY',
+    }]
+    # 只把本次消失的股票标记退市，已退市的不重复更新
+    assert delist_sql.startswith('UPDATE stocks SET status')
+    assert delist_params == {'status': 'delisted', 'code_1': ['000003']}
+    assert service.db.commits == 1
+    assert invalidated == ['registry', 'suggest', ('cache', 'stock')]
+
+
+def test_sync_stock_list_unchanged_feed_writes_nothing(monkeypatch):
+    """测试股票列表未变化时不执行写语句，也不失效缓存"""
+    feed = [_listing('000001', '平安银行'), _listing('000002', '万科A')]
+    existing = [_existing('000001', '平安银行'), _existing('000002', '万科A')]
+    service, invalidated = _stock_list_service(monkeypatch, feed, existing)
+    
+    assert asyncio.run(service.sync_stock_list()) == 2
+    assert _writes(service.db) == []
+    assert invalidated == []
+
+
+@pytest.mark.parametrize("feed", [[], TushareAPIError("stock_basic 请求失败")])
+def test_sync_stock_list_never_delists_on_empty_or_failed_feed(monkeypatch, feed):
+    """测试 Tushare 返回空列表或请求失败时不把已有股票标记为退市"""
+    existing = [_existing('000001', '平安银行'), _existing('000002', '万科A')]
+    service, invalidated = _stock_list_service(monkeypatch, feed, existing)
+    
+    assert asyncio.run(service.sync_stock_list()) == 0
+    assert service.db.executed == []
+    assert service.db.commits == 0
+    assert invalidated == []
+
+
+class _FixedCalendar:
+    """固定交易日集合的交易日历"""
+    def __init__(self, days):
+        self.days = set(days)
+    
+    async def is_trading_day(self, day=None):
+        return day in self.days
+    
+    async def trading_days(self, start, end):
+        return sorted(day for day in self.days if start <= day <= end)
+
+
+def _market_daily_service(monkeypatch, fail_on=()):
+    """全市场截面同步：交易日为 1 月 2、3 日，返回 (服务, 写入行, 请求的交易日)"""
+    service = StockDataSyncService(db=_RecordingSession())
+    service.calendar = _FixedCalendar([date(2024, 1, 2), date(2024, 1, 3)])
+    written = []
+    requested = []
+    
+    async def _get_market_daily(trade_date):
+        requested.append(trade_date)
+        if trade_date in fail_on:
+            raise TushareAPIError("daily 请求失败")
+        return [
+            {**_bar(trade_date, 10.0), 'ts_code': '000001.SZ'},
+            {**_bar(trade_date, 20.0), 'ts_code': '600519.SH'},
+            {**_bar(trade_date, 30.0), 'ts_code': '920001.BJ'},
+        ]
+    
+    async def _get_daily_basic(trade_date=None, **kwargs):
+        return [
+            {'ts_code': '600519.SH', 'trade_date': trade_date, 'pe_ttm': 25.0, 'pb': 8.0, 'dv_ratio': 1.5, 'total_mv': 2.0},
+        ]
+    
+    async def _load_stock_id_map():
+        return {'000001': 'stock-1', '600519': 'stock-2'}
+    
+    async def _upsert_daily_rows(rows):
+        written.extend(rows)
+        return len(rows), 0
+    
+    async def _advance_watermarks(dataset, marks, column=None):
+        pass
+    
+    monkeypatch.setattr(stock_data_sync.tushare_service, "get_market_daily", _get_market_daily)
+    monkeypatch.setattr(stock_data_sync.tushare_service, "get_daily_basic", _get_daily_basic)
+    monkeypatch.setattr(stock_data_sync.response_cache, "purge", _no_purge)
+    monkeypatch.setattr(service, "_load_stock_id_map", _load_stock_id_map)
+    monkeypatch.setattr(service, "upsert_daily_rows", _upsert_daily_rows)
+    monkeypatch.setattr(service, "_advance_watermarks", _advance_watermarks)
+    return service, written, requested
+
+
+def test_sync_market_daily_joins_indicators_by_ts_code(monkeypatch):
+    """测试截面同步按 ts_code 合并每日指标，跳过股票列表中不存在的代码"""
+    service, written, _ = _market_daily_service(monkeypatch)
+    
+    assert asyncio.run(service.sync_market_daily('20240102')) == 2
+    
+    by_stock = {row['stock_id']: row for row in written}
+    assert set(by_stock) == {'stock-1', 'stock-2'}
+    assert (by_stock['stock-2']['pe_ttm'], by_stock['stock-2']['pb']) == (25.0, 8.0)
+    assert by_stock['stock-1']['pb'] is None
+    assert service.db.commits == 1
+
+
+def test_sync_market_daily_skips_non_trading_day(monkeypatch):
+    """测试非交易日不请求 Tushare"""
+    service, written, requested = _market_daily_service(monkeypatch)
+    
+    assert asyncio.run(service.sync_market_daily('20240106')) == 0
+    assert requested == [] and written == []
+
+
+def test_sync_market_daily_raises_on_failure(monkeypatch):
+    """测试截面同步失败时回滚并抛出，定时任务不会把失败的交易日报告为成功"""
+    service, written, _ = _market_daily_service(monkeypatch, fail_on=('20240102',))
+    
+    with pytest.raises(TushareAPIError):
+        asyncio.run(service.sync_market_daily('20240102'))
+    assert service.db.rollbacks == 1
+    assert service.db.commits == 0
+
+
+def test_backfill_market_daily_syncs_each_trading_day(monkeypatch):
+    """测试回补按交易日历逐日同步（跳过周末），任一交易日失败时抛出"""
+    service, written, requested = _market_daily_service(monkeypatch)
+    
+    assert asyncio.run(service.backfill_market_daily('20240101', '20240107')) == 4
+    assert requested == ['20240102', '20240103']
+    
+    service, written, requested = _market_daily_service(monkeypatch, fail_on=('20240103',))
+    with pytest.raises(TushareAPIError):
+        asyncio.run(service.backfill_market_daily('20240101', '20240107'))
+    assert requested == ['20240102', '20240103']
+    assert service.db.commits == 1
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,57 @@
+"""
+批量指标测试
+"""
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.stock_registry import stock_registry
+from app.services.stock_service import StockService
+
+
+def test_indicators_batch_uses_constant_queries():
+    """测试批量指标的查询次数与股票数量无关，快照缺失的股票走集合查询"""
+    codes = [f"{600000 + i}" for i in range(50)]
+    refs = [(f"id-{code}", code, f"股票{code}", "A 股", None, None, "active") for code in codes]
+    snapshots = [
+        SimpleNamespace(
+            stock_id=f"id-{code}", close=10, pe_ttm=15, pb=2, dividend_yield=3,
+            pe_percentile=40, pb_percentile=50, dividend_yield_percentile=60, true_money_index=1.2,
+        )
+        for code in codes[:45]
+    ]
+    computed = [
+        SimpleNamespace(**{**vars(snapshots[0]), "stock_id": f"id-{code}"}) for code in codes[45:49]
+    ]
+    queries = []
+    
+    class _Result:
+        def __init__(self, rows):
+            self._rows = rows
+        
+        def all(self):
+            return self._rows
+        
+        def scalars(self):
+            return self
+        
+        def one(self):
+            return self._rows
+    
+    class _Session:
+        async def execute(self, query):
+            # 注册表的股票列表版本检查不计入数据查询
+            if 'max(' in str(query.compile(dialect=postgresql.dialect())):
+                return _Result((None, len(codes)))
+            queries.append(query)
+            return _Result([refs, snapshots, computed][len(queries) - 1])
+    
+    stock_registry.invalidate()
+    indicators = asyncio.run(StockService(_Session()).get_indicators_batch(codes + ["999999"]))
+    stock_registry.invalidate()
+    
+    assert len(queries) == 3
+    assert len(indicators) == 49  # 最后一只既无快照也无日线
+    assert indicators["600000"].pe_percentile == 40
+    assert indicators["600046"].name == "股票600046"
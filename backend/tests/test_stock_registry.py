@@ -0,0 +1,83 @@
+"""
+股票代码注册表测试
+"""
+import asyncio
+import time
+
+from app.services.stock_registry import StockRef, StockRegistry
+
+
+def _ref(code):
+    return StockRef(id=f"id-{code}", code=code, name=code, market='A 股',
+                    industry=None, listed_date=None, status='active')
+
+
+def test_stock_registry_lru_and_ttl(monkeypatch):
+    """测试容量淘汰和过期"""
+    registry = StockRegistry(maxsize=2, ttl=10)
+    registry.put(_ref('600519'))
+    registry.put(_ref('000001'))
+    assert registry.get('600519').id == 'id-600519'
+    
+    # 600519 刚被访问，淘汰最久未使用的 000001
+    registry.put(_ref('300750'))
+    assert registry.get('000001') is None
+    assert len(registry) == 2
+    
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 11)
+    assert registry.get('600519') is None
+
+
+class _Result:
+    def __init__(self, row):
+        self._row = row
+    
+    def one(self):
+        return self._row
+    
+    def one_or_none(self):
+        return self._row
+
+
+class _Session:
+    """股票列表版本查询返回 version，其余查询返回贵州茅台"""
+    def __init__(self):
+        self.version = (None, 1)
+        self.queries = []
+    
+    async def execute(self, query):
+        if 'max(' in str(query):
+            return _Result(self.version)
+        self.queries.append(query)
+        return _Result(('id-600519', '600519', '贵州茅台', 'A 股', '白酒', None, 'active'))
+
+
+def test_stock_registry_resolve_queries_once():
+    """测试解析未命中时查询数据库，之后命中缓存"""
+    registry = StockRegistry(maxsize=10, ttl=60)
+    db = _Session()
+    
+    first = asyncio.run(registry.resolve(db, '600519'))
+    second = asyncio.run(registry.resolve(db, '600519'))
+    assert first == second
+    assert first.industry == '白酒'
+    assert len(db.queries) == 1
+    
+    registry.invalidate()
+    asyncio.run(registry.resolve(db, '600519'))
+    assert len(db.queries) == 2
+
+
+def test_stock_registry_clears_on_version_change():
+    """测试其他进程修改股票列表（版本变化）后，到检查间隔时清空缓存"""
+    registry = StockRegistry(maxsize=10, ttl=600, version_check=0)
+    db = _Session()
+    
+    asyncio.run(registry.resolve(db, '600519'))
+    asyncio.run(registry.resolve(db, '600519'))
+    assert len(db.queries) == 1
+    
+    db.version = (None, 2)
+    asyncio.run(registry.resolve(db, '600519'))
+    assert len(db.queries) == 2
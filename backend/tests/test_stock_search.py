@@ -0,0 +1,25 @@
+"""
+股票搜索测试
+"""
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.stock_service import build_stock_search_query, decode_cursor, encode_cursor
+
+
+def test_cursor_roundtrip_and_invalid():
+    """测试分页游标编码解码，格式错误时抛出 ValueError"""
+    assert decode_cursor(encode_cursor(2, "600519")) == (2, "600519")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_search_query_ranks_and_seeks_after_cursor():
+    """测试搜索按相关度排序，键集分页从游标位置之后继续"""
+    query, _ = build_stock_search_query("gzmt", market="A 股", after=(2, "600519"))
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    
+    assert "ORDER BY CASE" in sql
+    assert "stocks.pinyin_abbr LIKE 'GZMT' || '%%'" in sql
+    assert "> (2, '600519')" in sql
+    assert "OFFSET" not in sql
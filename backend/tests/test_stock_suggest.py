@@ -0,0 +1,31 @@
+"""
+股票搜索联想测试
+"""
+from app.services.stock_suggest import StockSuggestIndex
+
+
+def _index():
+    index = StockSuggestIndex()
+    index.build([
+        ("600519", "贵州茅台", "A 股", "GZMT"),
+        ("600000", "浦发银行", "A 股", "PFYH"),
+        ("000858", "五粮液", "A 股", "WLY"),
+        ("600036", "招商银行", "A 股", "ZSYH"),
+    ])
+    return index
+
+
+def test_suggest_ranks_exact_code_then_prefixes():
+    """测试代码精确匹配优先，其次代码前缀，按代码排序，限制条数"""
+    index = _index()
+    assert [s["code"] for s in index.search("600", limit=2)] == ["600000", "600036"]
+    assert index.search("600519")[0]["name"] == "贵州茅台"
+    assert index.search("nothing") == []
+
+
+def test_suggest_matches_pinyin_and_name_prefix():
+    """测试拼音首字母（不区分大小写）和名称前缀匹配"""
+    index = _index()
+    assert [s["code"] for s in index.search("gz")] == ["600519"]
+    assert [s["code"] for s in index.search("招商")] == ["600036"]
+    assert [s["code"] for s in index.search("zs")] == ["600036"]
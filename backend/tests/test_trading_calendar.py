@@ -0,0 +1,220 @@
+"""
+交易日历测试
+"""
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.stock import TradeCalendar
+from app.services import trading_calendar
+from app.services.alert_service import AlertService
+from app.services.stock_data_sync import StockDataSyncService
+from app.tasks import alert_tasks, data_sync_tasks
+from app.services.trading_calendar import TradingCalendar, clear_calendar_cache
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+
+def test_trading_calendar_uses_stored_days(monkeypatch):
+    """测试按数据库日历判断交易日，并缓存在进程内"""
+    clear_calendar_cache()
+    loads = []
+    
+    async def _load_year(self, year):
+        loads.append(year)
+        # 2024-02-09 ~ 2024-02-16 春节休市
+        return frozenset({date(2024, 2, 8), date(2024, 2, 19), date(2024, 2, 20)})
+    
+    monkeypatch.setattr(TradingCalendar, '_load_year', _load_year)
+    calendar = TradingCalendar()
+    
+    async def _run():
+        return (
+            await calendar.is_trading_day(date(2024, 2, 12)),
+            await calendar.trading_days(date(2024, 2, 8), date(2024, 2, 19)),
+            await calendar.previous_trading_day(date(2024, 2, 18)),
+        )
+    
+    is_open, days, previous = asyncio.run(_run())
+    assert is_open is False
+    assert days == [date(2024, 2, 8), date(2024, 2, 19)]
+    assert previous == date(2024, 2, 8)
+    assert loads == [2024]
+    clear_calendar_cache()
+
+
+def test_trading_calendar_falls_back_to_weekdays(monkeypatch):
+    """测试日历不可用时按工作日判断，兜底结果短时缓存，到期后重试加载"""
+    clear_calendar_cache()
+    loads = []
+    now = [1000.0]
+    
+    async def _load_year(self, year):
+        loads.append(year)
+        return None
+    
+    async def _refresh(self, start_year, end_year=None):
+        raise RuntimeError("trade_cal unavailable")
+    
+    monkeypatch.setattr(TradingCalendar, '_load_year', _load_year)
+    monkeypatch.setattr(TradingCalendar, 'refresh', _refresh)
+    monkeypatch.setattr(trading_calendar.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(trading_calendar.settings, 'TRADE_CALENDAR_FALLBACK_TTL', 300)
+    calendar = TradingCalendar()
+    
+    assert asyncio.run(calendar.is_trading_day(date(2024, 2, 12))) is True
+    assert asyncio.run(calendar.is_trading_day(date(2024, 2, 17))) is False
+    assert asyncio.run(calendar.trading_days(date(2024, 2, 12), date(2024, 2, 18)))[-1] == date(2024, 2, 16)
+    assert loads == [2024]
+    assert not trading_calendar._open_days_cache
+    
+    now[0] += 301
+    assert asyncio.run(calendar.is_trading_day(date(2024, 2, 12))) is True
+    assert loads == [2024, 2024]
+    clear_calendar_cache()
+
+
+def test_scheduled_jobs_skip_closed_days(monkeypatch):
+    """测试股票列表和预警定时任务在休市日直接跳过，不访问数据库和 Tushare"""
+    calls = []
+    
+    async def _closed(self, day=None):
+        return False
+    
+    def _session_maker():
+        calls.append('session')
+        raise AssertionError("休市日不应打开数据库会话")
+    
+    async def _sync_stock_list(self):
+        calls.append('sync_stock_list')
+    
+    async def _check_all_alerts(self):
+        calls.append('check_all_alerts')
+    
+    monkeypatch.setattr(TradingCalendar, 'is_trading_day', _closed)
+    monkeypatch.setattr(data_sync_tasks, 'async_session_maker', _session_maker)
+    monkeypatch.setattr(alert_tasks, 'async_session_maker', _session_maker)
+    monkeypatch.setattr(StockDataSyncService, 'sync_stock_list', _sync_stock_list)
+    monkeypatch.setattr(AlertService, 'check_all_alerts', _check_all_alerts)
+    
+    data_sync_tasks.sync_stock_list_weekly()
+    alert_tasks.check_all_alerts()
+    
+    assert calls == []
+
+
+def _trade_cal(year: int, closed: set) -> list:
+    """模拟 Tushare trade_cal 返回的整年日历"""
+    day, items = date(year, 1, 1), []
+    while day.year == year:
+        is_open = int(day.weekday() < 5 and day not in closed)
+        items.append({'cal_date': day.strftime('%Y%m%d'), 'is_open': is_open})
+        day += timedelta(days=1)
+    return items
+
+
+class _FakeDatabase:
+    """模拟日历表：执行插入后才能读到 stored 中的行，并记录会话和提交次数"""
+    
+    def __init__(self, stored: list):
+        self.stored = stored
+        self.rows = []
+        self.sessions = 0
+        self.commits = 0
+    
+    def session(self):
+        self.sessions += 1
+        return _FakeSession(self)
+
+
+class _FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+    
+    def all(self):
+        return list(self._rows)
+
+
+class _FakeSession:
+    def __init__(self, database: _FakeDatabase):
+        self.database = database
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+    
+    async def execute(self, stmt):
+        if stmt.is_insert:
+            self.database.rows = self.database.stored
+        return _FakeResult(self.database.rows)
+    
+    async def commit(self):
+        self.database.commits += 1
+
+
+def test_trading_calendar_refreshes_from_tushare_in_own_session(monkeypatch):
+    """测试数据库无日历时从 Tushare 拉取、在独立会话中落库后读回"""
+    clear_calendar_cache()
+    items = _trade_cal(2024, {date(2024, 2, 12)})
+    database = _FakeDatabase([
+        (datetime.strptime(item['cal_date'], '%Y%m%d').date(), bool(item['is_open']))
+        for item in items
+    ])
+    requests = []
+    
+    async def _get_trade_cal(start_date, end_date, exchange='SSE'):
+        requests.append((start_date, end_date, exchange))
+        return items
+    
+    monkeypatch.setattr(trading_calendar, 'async_session_maker', database.session)
+    monkeypatch.setattr(trading_calendar.tushare_service, 'get_trade_cal', _get_trade_cal)
+    calendar = TradingCalendar()
+    
+    assert asyncio.run(calendar.is_trading_day(date(2024, 2, 12))) is False
+    assert asyncio.run(calendar.is_trading_day(date(2024, 2, 13))) is True
+    assert requests == [('20240101', '20241231', 'SSE')]
+    # 读取（空）-> 落库 -> 读回，各用独立会话；之后命中进程内缓存
+    assert (database.sessions, database.commits) == (3, 1)
+    clear_calendar_cache()
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="未设置 TEST_DATABASE_URL")
+def test_trading_calendar_refresh_and_load_from_database(monkeypatch):
+    """测试 refresh 落库（重复刷新按日期更新）后从数据库加载整年日历"""
+    clear_calendar_cache()
+    closed = {date(2024, 2, 12)}
+    
+    async def _get_trade_cal(start_date, end_date, exchange='SSE'):
+        return _trade_cal(2024, closed)
+    
+    async def _run():
+        engine = create_async_engine(TEST_DATABASE_URL)
+        monkeypatch.setattr(trading_calendar, 'async_session_maker', async_sessionmaker(engine))
+        monkeypatch.setattr(trading_calendar.tushare_service, 'get_trade_cal', _get_trade_cal)
+        async with engine.begin() as conn:
+            await conn.run_sync(TradeCalendar.__table__.create, checkfirst=True)
+            await conn.execute(delete(TradeCalendar).where(TradeCalendar.exchange == 'TEST'))
+        try:
+            calendar = TradingCalendar(exchange='TEST')
+            written = await calendar.refresh(2024)
+            closed.add(date(2024, 2, 13))
+            await calendar.refresh(2024)
+            clear_calendar_cache()
+            return written, await calendar._load_year(2024), await calendar._load_year(2025)
+        finally:
+            async with engine.begin() as conn:
+                await conn.execute(delete(TradeCalendar).where(TradeCalendar.exchange == 'TEST'))
+            await engine.dispose()
+    
+    written, days, missing = asyncio.run(_run())
+    assert written == 366
+    assert date(2024, 2, 12) not in days and date(2024, 2, 13) not in days
+    assert date(2024, 2, 14) in days
+    assert missing is None
+    clear_calendar_cache()
@@ -0,0 +1,49 @@
+"""
+Tushare 数据服务测试
+"""
+import asyncio
+
+from app.services.data_sources.tushare_service import TushareService
+
+
+def test_clients_are_keyed_by_event_loop():
+    """测试每个事件循环使用自己的连接池，切换循环不会丢弃未关闭的连接池，并在各自循环内关闭"""
+    service = TushareService()
+    first, second = asyncio.new_event_loop(), asyncio.new_event_loop()
+    
+    async def _client():
+        return service._get_client()
+    
+    try:
+        a = first.run_until_complete(_client())
+        b = second.run_until_complete(_client())
+        assert a is not b
+        assert first.run_until_complete(_client()) is a
+        
+        second.run_until_complete(service.close())
+        assert b.is_closed and not a.is_closed
+        
+        service.close_all()
+        assert a.is_closed
+    finally:
+        first.close()
+        second.close()
+
+
+def test_closed_loop_entries_are_discarded():
+    """测试已关闭事件循环的连接池条目在下次创建时清理"""
+    service = TushareService()
+    
+    async def _client():
+        return service._get_client()
+    
+    async def _client_and_close():
+        client = service._get_client()
+        await service.close()
+        return client
+    
+    asyncio.run(_client_and_close())
+    asyncio.run(_client())
+    asyncio.run(_client())
+    assert len(service._clients) == 1
+    service.close_all()
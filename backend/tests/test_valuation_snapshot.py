@@ -0,0 +1,23 @@
+"""
+估值快照测试
+"""
+from sqlalchemy.dialects import postgresql
+
+from app.services.valuation_snapshot import build_snapshot_select
+
+
+def test_build_snapshot_select():
+    """测试快照查询在一条 SQL 中计算最新估值和百分位"""
+    query = build_snapshot_select(window_days=3650)
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    
+    assert [column.name for column in query.selected_columns] == [
+        'stock_id', 'trade_date', 'close', 'pe_ttm', 'pb', 'dividend_yield',
+        'pe_percentile', 'pb_percentile', 'dividend_yield_percentile',
+        'total_mv', 'roe', 'revenue_growth', 'profit_growth', 'true_money_index',
+    ]
+    assert sql.startswith('WITH latest AS')
+    assert 'DISTINCT ON (stock_daily_data.stock_id)' in sql
+    assert 'count(*) FILTER (WHERE history.pe_ttm >' in sql
+    assert 'history.pe_ttm < latest.pe_ttm' in sql
+    assert 'DISTINCT ON (stock_financials.stock_id)' in sql